@@ -0,0 +1,364 @@
+import http.client
+import json
+import queue
+import re
+import shlex
+import ssl
+import threading
+import urllib.parse
+from quantity_utils import parse_quantity
+
+# Recursos suportados pelo backend de API: nome usado no oc -> (prefixo da API, recurso, possui namespace)
+API_RESOURCES = {
+    "pods": ("/api/v1", "pods", True),
+    "hpa": ("/apis/autoscaling/v1", "horizontalpodautoscalers", True),
+    "replicasets": ("/apis/apps/v1", "replicasets", True),
+    "replicationcontrollers": ("/api/v1", "replicationcontrollers", True),
+    "deploymentconfigs": ("/apis/apps.openshift.io/v1", "deploymentconfigs", True),
+    "statefulsets": ("/apis/apps/v1", "statefulsets", True),
+    "nodes": ("/api/v1", "nodes", False),
+}
+
+RESOURCE_ALIASES = {
+    "pod": "pods", "po": "pods",
+    "horizontalpodautoscalers": "hpa", "horizontalpodautoscaler": "hpa",
+    "replicaset": "replicasets", "rs": "replicasets",
+    "replicationcontroller": "replicationcontrollers", "rc": "replicationcontrollers",
+    "deploymentconfig": "deploymentconfigs", "dc": "deploymentconfigs",
+    "statefulset": "statefulsets", "sts": "statefulsets",
+    "node": "nodes", "no": "nodes",
+}
+
+# Flags do oc que recebem um valor e o parâmetro correspondente na API
+VALUE_FLAGS = {
+    "-n": "namespace", "--namespace": "namespace",
+    "-o": "output", "--output": "output",
+    "-c": "container", "--container": "container",
+    "-l": "labelSelector", "--selector": "labelSelector",
+    "--field-selector": "fieldSelector",
+    "--since": "since", "--since-time": "sinceTime", "--tail": "tailLines",
+    "--raw": "raw",
+}
+
+BOOLEAN_FLAGS = {
+    "--no-headers": "noHeaders", "--use-protocol-buffers": None,
+    "-p": "previous", "--previous": "previous",
+    "-A": "allNamespaces", "--all-namespaces": "allNamespaces",
+    "--timestamps": "timestamps",
+}
+
+DURATION_RE = re.compile(r"(\d+)(h|m|s)")
+DURATION_UNITS = {"h": 3600, "m": 60, "s": 1}
+
+api_clients = {}
+api_clients_lock = threading.Lock()
+
+class ApiClient:
+    """
+    Cliente HTTP para a API do Kubernetes/OpenShift que reaproveita conexões keep-alive entre as chamadas
+    """
+    def __init__(self, server, token, verify_tls=False, pool_size=8):
+        parsed = urllib.parse.urlsplit(server)
+        self.server = server
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.token = token
+        self.pool_size = pool_size
+        self.pool = queue.LifoQueue()
+        self.ssl_context = ssl.create_default_context()
+        if not verify_tls:
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+
+    def get_connection(self, timeout):
+        try:
+            connection = self.pool.get_nowait()
+        except queue.Empty:
+            if self.scheme == "https":
+                connection = http.client.HTTPSConnection(self.host, self.port, context=self.ssl_context)
+            else:
+                connection = http.client.HTTPConnection(self.host, self.port)
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection
+
+    def release_connection(self, connection):
+        if self.pool.qsize() < self.pool_size:
+            self.pool.put(connection)
+        else:
+            connection.close()
+
+    def open(self, path, params=None, timeout=None):
+        """
+        Envia um GET e retorna (conexão, resposta). Refaz a chamada uma vez caso a conexão
+        reaproveitada tenha sido fechada pelo servidor
+        """
+        if params:
+            path = f"{path}?{urllib.parse.urlencode(params)}"
+        headers = {"Authorization": f"Bearer {self.token}", "Accept": "application/json"}
+        for attempt in range(2):
+            connection = self.get_connection(timeout)
+            reused = connection.sock is not None
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise RuntimeError(f"API request '{path}' failed: connection closed by the server")
+            except OSError as e:
+                connection.close()
+                raise RuntimeError(f"API request '{path}' failed with error: {str(e)}")
+
+            if response.status >= 400:
+                body = response.read().decode("utf-8", errors="replace")
+                self.release_connection(connection)
+                raise RuntimeError(f"API request '{path}' failed with status {response.status}: {body}")
+            return connection, response
+
+    def get(self, path, params=None, timeout=None):
+        connection, response = self.open(path, params=params, timeout=timeout)
+        try:
+            body = response.read()
+        except OSError as e:
+            connection.close()
+            raise RuntimeError(f"API request '{path}' failed with error: {str(e)}")
+        self.release_connection(connection)
+        return body
+
+    def get_json(self, path, params=None, timeout=None):
+        return json.loads(self.get(path, params=params, timeout=timeout))
+
+    def stream(self, path, params=None, timeout=None, chunk_size=64 * 1024):
+        connection, response = self.open(path, params=params, timeout=timeout)
+        finished = False
+        try:
+            while True:
+                chunk = response.read1(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            # read1 não marca a resposta como concluída ao atingir o Content-Length
+            response.close()
+            finished = True
+        except OSError as e:
+            raise RuntimeError(f"API request '{path}' failed with error: {str(e)}")
+        finally:
+            if finished:
+                self.release_connection(connection)
+            else:
+                connection.close()
+
+def register_api_client(cluster, server, token, verify_tls=False):
+    with api_clients_lock:
+        client = api_clients.get(cluster)
+        if client and client.token == token and client.server == server:
+            return client
+        client = api_clients[cluster] = ApiClient(server, token, verify_tls=verify_tls)
+        return client
+
+def unregister_api_client(cluster):
+    """
+    Remove o cliente do cluster (ex: no logout do usuário) e fecha as conexões ociosas dele
+    """
+    with api_clients_lock:
+        client = api_clients.pop(cluster, None)
+    while client is not None:
+        try:
+            connection = client.pool.get_nowait()
+        except queue.Empty:
+            return
+        connection.close()
+
+def get_api_client(cluster):
+    with api_clients_lock:
+        return api_clients.get(cluster)
+
+def parse_duration(value):
+    """
+    Converte durações no formato do oc (ex: 15m, 1h30m, 10s) para segundos
+    """
+    parts = DURATION_RE.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    return sum(int(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+def parse_oc_command(command):
+    """
+    Interpreta um comando 'oc' suportado pelo backend de API. Retorna None quando o comando
+    não é suportado e deve ser executado pelo binário oc
+    """
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None
+    if not tokens or tokens[0] != "oc":
+        return None
+
+    positional = []
+    options = {}
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token.startswith("-"):
+            flag, has_value, value = token.partition("=")
+            if flag in VALUE_FLAGS:
+                if not has_value:
+                    i += 1
+                    if i >= len(tokens):
+                        return None
+                    value = tokens[i]
+                options[VALUE_FLAGS[flag]] = value
+            elif flag in BOOLEAN_FLAGS and not has_value:
+                if BOOLEAN_FLAGS[flag]:
+                    options[BOOLEAN_FLAGS[flag]] = True
+            else:
+                return None
+        else:
+            positional.append(token)
+        i += 1
+
+    if positional == ["get"] and "raw" in options:
+        return {"verb": "raw", "path": options["raw"], "options": options}
+    if positional[:1] == ["get"] and len(positional) in (2, 3) and options.get("output") == "json":
+        resource = RESOURCE_ALIASES.get(positional[1], positional[1])
+        if resource not in API_RESOURCES:
+            return None
+        return {"verb": "get", "resource": resource, "name": positional[2] if len(positional) == 3 else None, "options": options}
+    if positional[:2] == ["adm", "top"] and len(positional) == 3 and options.get("noHeaders") and "output" not in options:
+        resource = RESOURCE_ALIASES.get(positional[2], positional[2])
+        if resource in ("pods", "nodes"):
+            return {"verb": "top", "resource": resource, "options": options}
+        return None
+    if positional[:1] == ["logs"] and len(positional) == 2 and "output" not in options:
+        return {"verb": "logs", "name": positional[1], "options": options}
+    return None
+
+def build_resource_path(resource, namespace=None, name=None, all_namespaces=False):
+    prefix, api_resource, namespaced = API_RESOURCES[resource]
+    path = prefix
+    if namespaced and not all_namespaces:
+        path += f"/namespaces/{urllib.parse.quote(namespace or 'default', safe='')}"
+    path += f"/{api_resource}"
+    if name:
+        path += f"/{urllib.parse.quote(name, safe='')}"
+    return path
+
+def build_list_params(options):
+    params = {}
+    for key in ("labelSelector", "fieldSelector"):
+        if key in options:
+            params[key] = options[key]
+    return params
+
+def build_logs_params(options):
+    params = {}
+    if "container" in options:
+        params["container"] = options["container"]
+    if options.get("previous"):
+        params["previous"] = "true"
+    if options.get("timestamps"):
+        params["timestamps"] = "true"
+    if "tailLines" in options:
+        params["tailLines"] = options["tailLines"]
+    if "sinceTime" in options:
+        params["sinceTime"] = options["sinceTime"]
+    if "since" in options:
+        since_seconds = parse_duration(options["since"])
+        if since_seconds is None:
+            return None
+        params["sinceSeconds"] = since_seconds
+    return params
+
+def sum_container_usage(item):
+    cpu = memory = 0.0
+    for container in item.get("containers", []):
+        cpu += parse_quantity(container["usage"].get("cpu")) or 0
+        memory += parse_quantity(container["usage"].get("memory")) or 0
+    return cpu, memory
+
+def format_top_pods(client, request, timeout):
+    """
+    Monta a saída no formato do 'oc adm top pods --no-headers' a partir da API de métricas
+    """
+    options = request["options"]
+    path = "/apis/metrics.k8s.io/v1beta1"
+    if not options.get("allNamespaces"):
+        path += f"/namespaces/{options.get('namespace', 'default')}"
+    metrics = client.get_json(f"{path}/pods", params=build_list_params(options), timeout=timeout)
+
+    lines = []
+    for item in metrics["items"]:
+        cpu, memory = sum_container_usage(item)
+        columns = [item["metadata"]["name"], f"{round(cpu * 1000)}m", f"{round(memory / 2 ** 20)}Mi"]
+        if options.get("allNamespaces"):
+            columns.insert(0, item["metadata"]["namespace"])
+        lines.append("   ".join(columns))
+    return "\n".join(lines) + "\n" if lines else ""
+
+def format_top_nodes(client, request, timeout):
+    """
+    Monta a saída no formato do 'oc adm top nodes --no-headers', com percentuais sobre o allocatable do node
+    """
+    nodes = client.get_json("/api/v1/nodes", timeout=timeout)
+    allocatable = {node["metadata"]["name"]: node["status"].get("allocatable", {}) for node in nodes["items"]}
+    metrics = client.get_json("/apis/metrics.k8s.io/v1beta1/nodes", timeout=timeout)
+
+    lines = []
+    for item in metrics["items"]:
+        node_name = item["metadata"]["name"]
+        cpu = parse_quantity(item["usage"].get("cpu")) or 0
+        memory = parse_quantity(item["usage"].get("memory")) or 0
+        cpu_allocatable = parse_quantity(allocatable.get(node_name, {}).get("cpu")) or 0
+        memory_allocatable = parse_quantity(allocatable.get(node_name, {}).get("memory")) or 0
+        cpu_percent = round(cpu * 100 / cpu_allocatable) if cpu_allocatable else 0
+        memory_percent = round(memory * 100 / memory_allocatable) if memory_allocatable else 0
+        lines.append(f"{node_name}   {round(cpu * 1000)}m   {cpu_percent}%   {round(memory / 2 ** 20)}Mi   {memory_percent}%")
+    return "\n".join(lines) + "\n" if lines else ""
+
+def run_api_command(cluster, command, timeout=None):
+    """
+    Executa o comando pela API quando há um cliente registrado para o cluster e o comando é suportado.
+    Retorna None para que o chamador use o binário oc como alternativa
+    """
+    client = get_api_client(cluster)
+    request = parse_oc_command(command) if client else None
+    if request is None:
+        return None
+
+    options = request["options"]
+    if request["verb"] == "raw":
+        return client.get(request["path"], timeout=timeout).decode("utf-8")
+    if request["verb"] == "get":
+        path = build_resource_path(request["resource"], options.get("namespace"), request["name"], options.get("allNamespaces"))
+        return client.get(path, params=build_list_params(options), timeout=timeout).decode("utf-8")
+    if request["verb"] == "top":
+        if request["resource"] == "pods":
+            return format_top_pods(client, request, timeout)
+        return format_top_nodes(client, request, timeout)
+    if request["verb"] == "logs":
+        chunks = stream_api_command(cluster, command, timeout=timeout)
+        # Opções que a API não aceita (ex: --since=1d) ficam com o binário oc
+        return None if chunks is None else b"".join(chunks).decode("utf-8", errors="replace")
+    return None
+
+def stream_api_command(cluster, command, timeout=None, chunk_size=64 * 1024):
+    """
+    Versão em streaming de run_api_command para 'oc logs' e 'oc get --raw' (ex: watches).
+    Retorna None quando o comando não é suportado
+    """
+    client = get_api_client(cluster)
+    request = parse_oc_command(command) if client else None
+    if request is None or request["verb"] not in ("logs", "raw"):
+        return None
+    if request["verb"] == "raw":
+        return client.stream(request["path"], timeout=timeout, chunk_size=chunk_size)
+    options = request["options"]
+    params = build_logs_params(options)
+    if params is None:
+        return None
+    path = build_resource_path("pods", options.get("namespace"), request["name"]) + "/log"
+    return client.stream(path, params=params, timeout=timeout, chunk_size=chunk_size)
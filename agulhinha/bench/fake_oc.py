@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Substituto do binário oc para o benchmark: responde aos comandos usados pela ferramenta com um cluster
+sintético. O cluster é definido por variáveis de ambiente:
+
+BENCH_NAMESPACES   namespaces do cluster (ns-000, ns-001, ...)
+BENCH_PODS         pods por namespace
+BENCH_NODES        nodes do cluster
+BENCH_LOG_LINES    linhas de log por container
+BENCH_LATENCY      atraso, em segundos, de cada chamada
+BENCH_CALL_LOG     arquivo onde cada chamada é registrada (uma linha por chamada)
+"""
+import json
+import os
+import sys
+import time
+import urllib.parse
+
+NAMESPACES = int(os.environ.get("BENCH_NAMESPACES", "2"))
+PODS = int(os.environ.get("BENCH_PODS", "10"))
+NODES = int(os.environ.get("BENCH_NODES", "3"))
+LOG_LINES = int(os.environ.get("BENCH_LOG_LINES", "100"))
+LATENCY = float(os.environ.get("BENCH_LATENCY", "0"))
+CALL_LOG = os.environ.get("BENCH_CALL_LOG")
+
+# Flags com valor que podem aparecer antes ou depois do subcomando
+VALUE_FLAGS = {"-n", "--namespace", "-o", "--output", "-c", "--container", "--raw", "--since", "--since-time", "--tail",
+               "--username", "--password", "--kubeconfig", "--context", "--request-timeout"}
+
+def cluster_name():
+    return os.path.basename(os.environ.get("KUBECONFIG", "bench.kubeconfig")).rsplit(".", 1)[0]
+
+def namespace_names():
+    return [f"ns-{n:03d}" for n in range(NAMESPACES)]
+
+def node_name(index):
+    return f"node-{index % NODES:03d}"
+
+def pod(namespace, index):
+    return {
+        "metadata": {
+            "name": f"app-{index:05d}", "namespace": namespace, "uid": f"{namespace}-{index}", "resourceVersion": "1",
+            "creationTimestamp": "2024-01-01T00:00:00Z", "labels": {"app": "app"},
+            "ownerReferences": [{"kind": "ReplicaSet", "name": "app-rs", "controller": True}],
+        },
+        "spec": {"nodeName": node_name(index), "containers": [{
+            "name": "main", "image": "registry/app:1.0",
+            "resources": {"requests": {"cpu": "100m", "memory": "128Mi"}, "limits": {"cpu": "500m", "memory": "512Mi"}},
+        }]},
+        "status": {"phase": "Running", "containerStatuses": [{"name": "main", "restartCount": index % 3}]},
+    }
+
+def pod_metrics(namespace, index):
+    return {"metadata": {"name": f"app-{index:05d}", "namespace": namespace},
+            "containers": [{"name": "main", "usage": {"cpu": f"{10 + index % 400}m", "memory": f"{100 + index % 300}Mi"}}]}
+
+def parse_args(args):
+    positional, options = [], {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith("-"):
+            flag, has_value, value = arg.partition("=")
+            if flag in VALUE_FLAGS and not has_value:
+                i += 1
+                value = args[i] if i < len(args) else ""
+            options[flag] = value if (has_value or flag in VALUE_FLAGS) else True
+        else:
+            positional.append(arg)
+        i += 1
+    return positional, options
+
+def paginate(items, query):
+    limit = int(query.get("limit", [len(items) or 1])[0])
+    start = int(query.get("continue", ["0"])[0])
+    end = min(len(items), start + limit)
+    return {"metadata": {"resourceVersion": "1", "continue": str(end) if end < len(items) else ""}, "items": items[start:end]}
+
+def get_raw(path):
+    path, _, query_string = path.partition("?")
+    query = urllib.parse.parse_qs(query_string)
+    parts = path.strip("/").split("/")
+    if "watch" in query:
+        # Watches terminam imediatamente, sem eventos
+        return ""
+    if path == "/api/v1/nodes":
+        return json.dumps({"items": [{"metadata": {"name": node_name(i)}, "status": {"allocatable": {"cpu": "16", "memory": "64Gi"}}}
+                                     for i in range(NODES)]})
+    if path == "/api/v1/pods":
+        return json.dumps(paginate([pod(ns, i) for ns in namespace_names() for i in range(PODS)], query))
+    if parts[:3] == ["api", "v1", "namespaces"] and parts[4:] == ["pods"]:
+        return json.dumps(paginate([pod(parts[3], i) for i in range(PODS)], query))
+    if path == "/apis/metrics.k8s.io/v1beta1/pods":
+        return json.dumps({"items": [pod_metrics(ns, i) for ns in namespace_names() for i in range(PODS)]})
+    if parts[:4] == ["apis", "metrics.k8s.io", "v1beta1", "namespaces"] and parts[5:] == ["pods"]:
+        return json.dumps({"items": [pod_metrics(parts[4], i) for i in range(PODS)]})
+    if parts[-1] in ("horizontalpodautoscalers", "replicasets", "replicationcontrollers"):
+        return json.dumps(get_resource(parts[-1], parts[-2] if "namespaces" in parts else None))
+    raise LookupError(path)
+
+def get_resource(resource, namespace):
+    if resource in ("hpa", "horizontalpodautoscalers"):
+        return {"metadata": {"resourceVersion": "1"}, "items": [{
+            "metadata": {"name": "app", "namespace": namespace, "resourceVersion": "1"},
+            "spec": {"scaleTargetRef": {"kind": "Deployment", "name": "app"}, "minReplicas": 2, "maxReplicas": 10,
+                     "targetCPUUtilizationPercentage": 70},
+            "status": {"currentReplicas": PODS, "currentCPUUtilizationPercentage": 50},
+        }]}
+    if resource in ("rs", "replicaset", "replicasets"):
+        return {"metadata": {"resourceVersion": "1"}, "items": [{
+            "metadata": {"name": "app-rs", "namespace": namespace, "resourceVersion": "1",
+                         "ownerReferences": [{"kind": "Deployment", "name": "app", "controller": True}]},
+        }]}
+    return {"metadata": {"resourceVersion": "1"}, "items": []}
+
+def write_logs(options):
+    lines = LOG_LINES
+    if "--tail" in options:
+        lines = min(lines, int(options["--tail"]))
+    out = sys.stdout
+    for k in range(lines):
+        message = "ERRO falha ao processar requisicao" if k % 50 == 0 else "INFO requisicao processada com sucesso"
+        out.write(f"2024-01-01T00:00:{k % 60:02d}Z {message} id={k}\n")
+
+def main(args):
+    if CALL_LOG:
+        with open(CALL_LOG, "a") as call_log:
+            call_log.write(f"{cluster_name()} {' '.join(args)}\n")
+    if LATENCY:
+        time.sleep(LATENCY)
+
+    positional, options = parse_args(args)
+    if positional[:2] == ["config", "current-context"]:
+        print(cluster_name())
+    elif positional[:1] in (["config"], ["login"]):
+        print("ok")
+    elif positional[:1] == ["whoami"]:
+        if "-t" in options:
+            print("sha256~bench")
+        elif "--show-server" in options:
+            print("https://127.0.0.1:6443")
+        else:
+            print("bench")
+    elif positional == ["get"] and "--raw" in options:
+        print(get_raw(options["--raw"]))
+    elif positional[:1] == ["get"] and len(positional) >= 2:
+        print(json.dumps(get_resource(positional[1], options.get("-n") or options.get("--namespace"))))
+    elif positional[:3] == ["adm", "top", "nodes"]:
+        for i in range(NODES):
+            print(f"{node_name(i)}   {2000 + i}m   {12 + i % 80}%   {16000 + i}Mi   {25 + i % 70}%")
+    elif positional[:1] == ["logs"]:
+        write_logs(options)
+    elif positional[:1] == ["exec"]:
+        print("exec ok")
+    else:
+        print(f"comando nao suportado pelo fake oc: {' '.join(args)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except LookupError as e:
+        print(f"Error from server (NotFound): {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,154 @@
+"""
+Benchmark do relatório (process_pods + process_nodes) e da coleta de logs (collect_logs_from_pods)
+contra clusters sintéticos servidos pelo fake_oc.py.
+
+Cada etapa roda em um processo separado para medir o pico de memória (RSS) de forma isolada.
+Para cada etapa são registrados o tempo total, o número de subprocessos oc (total e por verbo),
+as chamadas por pod e o pico de RSS do processo da ferramenta (sem contar os subprocessos oc).
+
+Exemplo:
+    python bench/run_bench.py --clusters 2 --namespaces 5 --pods 200 --log-lines 1000 --latency 0.05 --json resultado.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+STAGES = ("report", "logs")
+
+def cluster_names(args):
+    return [f"bench-{c:02d}" for c in range(args.clusters)]
+
+def namespace_names(args):
+    return [f"ns-{n:03d}" for n in range(args.namespaces)]
+
+def prepare_environment(args, work_dir):
+    """
+    Coloca um executável 'oc' que chama o fake_oc.py no início do PATH e define o cluster sintético
+    """
+    bin_dir = os.path.join(work_dir, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    oc_path = os.path.join(bin_dir, "oc")
+    with open(oc_path, "w") as oc_file:
+        oc_file.write(f"#!/bin/sh\nexec {shlex.quote(sys.executable)} {shlex.quote(os.path.join(BENCH_DIR, 'fake_oc.py'))} \"$@\"\n")
+    os.chmod(oc_path, 0o755)
+
+    env = os.environ.copy()
+    env.update({
+        "PATH": bin_dir + os.pathsep + env.get("PATH", ""),
+        "AGULHINHA_KUBECONFIG_DIR": os.path.join(work_dir, "kube"),
+        "BENCH_NAMESPACES": str(args.namespaces),
+        "BENCH_PODS": str(args.pods),
+        "BENCH_NODES": str(args.nodes),
+        "BENCH_LOG_LINES": str(args.log_lines),
+        "BENCH_LATENCY": str(args.latency),
+        "BENCH_CALL_LOG": os.path.join(work_dir, "calls.log"),
+    })
+    return env
+
+def run_stage(stage, args, work_dir):
+    """
+    Executa a etapa no processo atual e retorna tempo e pico de RSS (em KiB)
+    """
+    from main import generate_pods_report, collect_logs_from_pods
+
+    clusters = cluster_names(args)
+    namespaces = namespace_names(args)
+    started = time.perf_counter()
+    # A saída da ferramenta é descartada para não interferir na medição nem no resultado em JSON
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if stage == "report":
+            generate_pods_report(",".join(clusters), ";".join([",".join(namespaces)] * len(clusters)),
+                                 ";".join([",".join(["app"] * len(namespaces))] * len(clusters)), "bench", "bench",
+                                 max_workers=args.max_workers, csv_file=os.path.join(work_dir, "pods_status.csv"),
+                                 pod_workers=args.pod_workers)
+        else:
+            for cluster in clusters:
+                for namespace in namespaces:
+                    collect_logs_from_pods(cluster, namespace, "app", "bench", "bench", output_dir=work_dir,
+                                           max_workers=args.log_workers)
+    wall_time = time.perf_counter() - started
+    return {
+        "wall_time": wall_time,
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+def command_verb(call):
+    # Cada linha do registro é '<cluster> <argumentos do oc>'
+    words = [word for word in call.split()[1:] if not word.startswith("-")]
+    if words[:2] == ["adm", "top"]:
+        return "top"
+    return words[0] if words else "?"
+
+def measure_stage(stage, args, work_dir, env):
+    call_log = env["BENCH_CALL_LOG"]
+    if os.path.exists(call_log):
+        os.remove(call_log)
+
+    command = [sys.executable, os.path.abspath(__file__), "--stage", stage, "--work-dir", work_dir] + sys.argv[1:]
+    result = subprocess.run(command, env=env, stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+
+    with open(call_log) as calls_file:
+        calls = calls_file.read().splitlines()
+    total_pods = args.clusters * args.namespaces * args.pods
+    stats.update({
+        "stage": stage,
+        "pods": total_pods,
+        "subprocesses": len(calls),
+        "calls_by_verb": dict(Counter(command_verb(call) for call in calls)),
+        "calls_per_pod": len(calls) / total_pods if total_pods else 0,
+        "pods_per_second": total_pods / stats["wall_time"] if stats["wall_time"] else 0,
+    })
+    return stats
+
+def print_results(results):
+    print(f"{'etapa':<8} {'pods':>7} {'tempo (s)':>10} {'pods/s':>9} {'oc':>7} {'oc/pod':>7} {'RSS (MiB)':>10}")
+    for stats in results:
+        print(f"{stats['stage']:<8} {stats['pods']:>7} {stats['wall_time']:>10.2f} {stats['pods_per_second']:>9.1f} "
+              f"{stats['subprocesses']:>7} {stats['calls_per_pod']:>7.2f} {stats['peak_rss_kib'] / 1024:>10.1f}")
+    for stats in results:
+        verbs = ", ".join(f"{verb}={count}" for verb, count in sorted(stats["calls_by_verb"].items()))
+        print(f"  {stats['stage']}: {verbs}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do relatório e da coleta de logs com um oc sintético.")
+    parser.add_argument("--clusters", type=int, default=1, help="Número de clusters sintéticos")
+    parser.add_argument("--namespaces", type=int, default=2, help="Namespaces por cluster")
+    parser.add_argument("--pods", type=int, default=50, help="Pods por namespace")
+    parser.add_argument("--nodes", type=int, default=3, help="Nodes por cluster")
+    parser.add_argument("--log-lines", type=int, default=200, help="Linhas de log por container")
+    parser.add_argument("--latency", type=float, default=0.0, help="Atraso, em segundos, de cada chamada ao oc")
+    parser.add_argument("--max-workers", type=int, default=8, help="Clusters processados em paralelo")
+    parser.add_argument("--pod-workers", type=int, default=8, help="Pods processados em paralelo em cada namespace")
+    parser.add_argument("--log-workers", type=int, default=4, help="Logs lidos em paralelo na coleta")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Etapas executadas, separadas por vírgulas (report,logs)")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo JSON para comparação entre versões")
+    parser.add_argument("--stage", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        # Processo filho: executa uma única etapa e devolve as medidas na última linha da saída
+        print(json.dumps(run_stage(args.stage, args, args.work_dir)))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory(prefix="agulhinha-bench-") as work_dir:
+        env = prepare_environment(args, work_dir)
+        results = [measure_stage(stage, args, work_dir, env) for stage in args.stages.split(",")]
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"parameters": {key: value for key, value in vars(args).items() if key not in ("stage", "work_dir", "json")},
+                       "results": results}, json_file, indent=2)
@@ -1,4 +1,63 @@
-from command_utils import run_command
+import hashlib
+import hmac
+import os
+import threading
+import time
+from command_utils import run_command, use_api_backend, get_kubeconfig_path, refresh_kubeconfig, ClusterLogin
+from api_client import register_api_client, unregister_api_client
+
+# Tempo, em segundos, durante o qual um login verificado é reaproveitado sem executar o oc
+LOGIN_CACHE_TTL = 300
+# Validade assumida para o token após o login (tokens do OpenShift expiram em 24h por padrão)
+DEFAULT_TOKEN_LIFETIME = 24 * 3600
+# Intervalo entre as verificações feitas em segundo plano
+CREDENTIAL_REFRESH_INTERVAL = 60
+# Tempo, em segundos, sem uso após o qual o login é descartado do cache
+CREDENTIAL_IDLE_TIMEOUT = 1800
+
+# Salt das senhas guardadas no cache, que guarda só o hash para conferir a senha das próximas requisições
+PASSWORD_SALT = os.urandom(16)
+
+def hash_password(password):
+    return hashlib.sha256(PASSWORD_SALT + (password or "").encode("utf-8")).digest()
+
+class CachedCredential:
+    """
+    Login verificado de um usuário em um cluster
+    """
+    def __init__(self, cluster_name, username, password_hash, token, expires_at, verified_at, server=None):
+        self.cluster_name = cluster_name
+        self.username = username
+        self.password_hash = password_hash
+        self.token = token
+        self.expires_at = expires_at
+        self.verified_at = verified_at
+        self.last_used = verified_at
+        self.server = server
+
+    def is_fresh(self, now):
+        return now - self.verified_at < LOGIN_CACHE_TTL and now < self.expires_at
+
+    def is_idle(self, now):
+        return now - self.last_used > CREDENTIAL_IDLE_TIMEOUT
+
+    def matches(self, password):
+        return hmac.compare_digest(self.password_hash, hash_password(password))
+
+credentials_cache = {}
+credentials_lock = threading.Lock()
+login_locks = {}
+refresher_thread = None
+# Na interface web, cada usuário usa o próprio kubeconfig em cada cluster (ativado por enable_user_kubeconfigs)
+user_kubeconfigs = False
+
+def enable_user_kubeconfigs():
+    global user_kubeconfigs
+    user_kubeconfigs = True
+
+def get_login_lock(key):
+    with credentials_lock:
+        return login_locks.setdefault(key, threading.Lock())
 
 def is_logged_in(cluster_name):
     """
@@ -7,37 +66,159 @@ def is_logged_in(cluster_name):
     """
     try:
         # Verifica se o contexto atual corresponde ao cluster
-        current_context = run_command("oc config current-context").strip()
-        if cluster_name != current_context:
+        current_context = run_command("oc config current-context", cluster=cluster_name).strip()
+        if str(cluster_name) != current_context:
             return False
 
         # Tenta executar 'oc whoami' para verificar se o token é válido
-        run_command("oc whoami")
+        run_command("oc whoami", cluster=cluster_name)
         return True
     except RuntimeError:
         return False
 
-def login_to_cluster(cluster_name, username, password):
+def verify_and_login(cluster_name, username, password, previous=None):
     """
-    Tenta fazer login no cluster usando o padrão de URL baseado no nome do cluster
+    Verifica o login no cluster, faz um novo login se necessário e retorna a credencial atualizada.
+    'previous' é a credencial do cache cuja senha já foi conferida
     """
     cluster_url = f"https://api.{cluster_name}.producao.ibm.cloud:6443"
+    now = time.time()
+    # O kubeconfig de um usuário só é reaproveitado depois que a senha foi conferida por um 'oc login'
+    trust_context = previous is not None or not isinstance(cluster_name, ClusterLogin)
 
-    try:
-        if not is_logged_in(cluster_name):
-            print(f"Conectando ao cluster {cluster_name}...")
-            login_command = f"oc login --insecure-skip-tls-verify=true {cluster_url} --username {username} --password {password}"
-            run_command(login_command)
+    logged_in = trust_context and is_logged_in(cluster_name)
+    if not logged_in and trust_context and refresh_kubeconfig(cluster_name):
+        # O login do contexto pode ter sido renovado (ex: novo token ou SSO) depois da cópia do kubeconfig
+        logged_in = is_logged_in(cluster_name)
+    if not logged_in:
+        if not username or not password:
+            # Sem credenciais, só é possível usar um contexto já autenticado (ex: por token ou SSO)
+            raise RuntimeError(f"O contexto '{cluster_name}' não está autenticado e não foram informados usuário e senha")
+        print(f"Conectando ao cluster {cluster_name}...")
+        login_command = f"oc login --insecure-skip-tls-verify=true {cluster_url} --username {username} --password {password}"
+        run_command(login_command, cluster=cluster_name)
+
+        # Obtém o contexto atual após o login
+        current_context = run_command("oc config current-context", cluster=cluster_name).strip()
 
-            # Obtém o contexto atual após o login
-            current_context = run_command("oc config current-context").strip()
+        # Renomeia o contexto para o nome do cluster
+        rename_command = f"oc config rename-context '{current_context}' '{cluster_name}'"
+        run_command(rename_command, cluster=cluster_name)
 
-            # Renomeia o contexto para o nome do cluster
-            rename_command = f"oc config rename-context '{current_context}' '{cluster_name}'"
-            run_command(rename_command)
+        print(f"O contexto foi renomeado para '{cluster_name}'.")
+        expires_at = now + DEFAULT_TOKEN_LIFETIME
+    else:
+        print(f"Já conectado ao cluster {cluster_name}.")
+        expires_at = previous.expires_at if previous and previous.expires_at > now else now + DEFAULT_TOKEN_LIFETIME
 
-            print(f"O contexto foi renomeado para '{cluster_name}'.")
-        else:
-            print(f"Já conectado ao cluster {cluster_name}.")
+    # O token e o servidor só são usados pelo backend da API
+    token = server = None
+    if use_api_backend(cluster_name):
+        token = run_command("oc whoami -t", cluster=cluster_name).strip()
+        server = previous.server if previous and previous.token == token else None
+        if server is None:
+            server = run_command("oc whoami --show-server", cluster=cluster_name).strip()
+
+    return CachedCredential(cluster_name, username, hash_password(password), token, expires_at, time.time(), server=server)
+
+def remove_credential(key):
+    """
+    Descarta o login do cache. Com kubeconfigs por usuário, apaga também o kubeconfig (e o token) do usuário
+    """
+    with credentials_lock:
+        credential = credentials_cache.pop(key, None)
+    if credential is None:
+        return
+    if credential.token:
+        unregister_api_client(credential.cluster_name)
+    if isinstance(credential.cluster_name, ClusterLogin):
+        try:
+            os.remove(get_kubeconfig_path(credential.cluster_name))
+        except FileNotFoundError:
+            pass
+
+def forget_credentials(username):
+    """
+    Descarta os logins do usuário em todos os clusters (ex: no logout da interface web)
+    """
+    for key in [key for key in list(credentials_cache) if key[1] == username]:
+        with get_login_lock(key):
+            remove_credential(key)
+
+def keep_login_alive(cluster_name):
+    """
+    Marca como em uso os logins do cluster usados por tarefas de longa duração (ex: monitor de conectividade),
+    que não passam por login_to_cluster
+    """
+    now = time.time()
+    for key, credential in list(credentials_cache.items()):
+        if key[0] == cluster_name:
+            credential.last_used = now
+
+def refresh_credential(key):
+    """
+    Revalida uma credencial do cache. Sem a senha, um login que não é mais válido é descartado e refeito
+    na próxima requisição do usuário
+    """
+    with get_login_lock(key):
+        credential = credentials_cache.get(key)
+        if credential is None:
+            return
+        if credential.is_idle(time.time()):
+            remove_credential(key)
+            return
+        if not is_logged_in(credential.cluster_name):
+            print(f"O login no cluster {credential.cluster_name} expirou e será refeito na próxima requisição.")
+            remove_credential(key)
+            return
+        credential.verified_at = time.time()
+
+def refresh_credentials_loop():
+    while True:
+        time.sleep(CREDENTIAL_REFRESH_INTERVAL)
+        # Renova antes de o TTL vencer, para que as requisições não precisem verificar o login
+        now = time.time()
+        deadline = now + CREDENTIAL_REFRESH_INTERVAL
+        for key, credential in list(credentials_cache.items()):
+            if credential.is_idle(now) or not credential.is_fresh(deadline):
+                refresh_credential(key)
+
+def start_credential_refresher():
+    global refresher_thread
+    with credentials_lock:
+        if refresher_thread is None:
+            refresher_thread = threading.Thread(target=refresh_credentials_loop, name="credential-refresher", daemon=True)
+            refresher_thread.start()
+
+def register_credential_api_client(credential):
+    if use_api_backend(credential.cluster_name) and credential.server:
+        register_api_client(credential.cluster_name, credential.server, credential.token)
+
+def login_to_cluster(cluster_name, username, password):
+    """
+    Tenta fazer login no cluster usando o padrão de URL baseado no nome do cluster.
+    Logins verificados ficam em cache por LOGIN_CACHE_TTL segundos e são renovados em segundo plano.
+    Retorna o cluster a ser usado nos comandos: com enable_user_kubeconfigs, um ClusterLogin do usuário
+    """
+    if user_kubeconfigs:
+        cluster_name = ClusterLogin(cluster_name, username)
+    key = (cluster_name, username)
+    credential = credentials_cache.get(key)
+    if credential and credential.matches(password) and credential.is_fresh(time.time()):
+        credential.last_used = time.time()
+        register_credential_api_client(credential)
+        return cluster_name
+
+    try:
+        with get_login_lock(key):
+            # Outra thread pode ter feito o login enquanto esperávamos o lock
+            credential = credentials_cache.get(key)
+            if not (credential and credential.matches(password) and credential.is_fresh(time.time())):
+                previous = credential if credential and credential.matches(password) else None
+                credential = verify_and_login(cluster_name, username, password, previous=previous)
+                credentials_cache[key] = credential
+        register_credential_api_client(credential)
+        start_credential_refresher()
     except RuntimeError as e:
         print(f"Erro ao tentar se conectar ao cluster {cluster_name}: {str(e)}")
+    return cluster_name
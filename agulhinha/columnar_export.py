@@ -0,0 +1,124 @@
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Parquet quando o pyarrow está instalado; senão NDJSON compactado com gzip
+EXPORT_FORMAT = "parquet" if pa is not None else "ndjson"
+# Registros acumulados antes de gravar um row group no Parquet
+EXPORT_BATCH_SIZE = 10000
+
+# Colunas e tipos das tabelas exportadas: CPU em millicores, memória em bytes e datas em UTC.
+# Os registros tipados são montados por process_pod e process_nodes com os valores já calculados, sem passar pelo texto do CSV
+POD_COLUMNS = [
+    ("snapshot_time", "timestamp"), ("cluster", "string"), ("namespace", "string"), ("pod_name", "string"),
+    ("status", "string"), ("creation_time", "timestamp"), ("recent_change", "bool"), ("error_count", "int"),
+    ("cpu_usage_millicores", "int"), ("memory_usage_bytes", "int"),
+    ("cpu_request_millicores", "int"), ("memory_request_bytes", "int"),
+    ("cpu_limit_millicores", "int"), ("memory_limit_bytes", "int"), ("tag", "string"),
+    ("cpu_usage_vs_limit_percent", "float"), ("memory_usage_vs_limit_percent", "float"),
+    ("hpa_enabled", "bool"), ("hpa_min_replicas", "int"), ("hpa_max_replicas", "int"), ("hpa_current_replicas", "int"),
+    ("hpa_cpu_target_percent", "int"), ("hpa_cpu_current_percent", "int"), ("restart_count", "int"),
+    ("cpu_usage_vs_request_percent", "float"), ("memory_usage_vs_request_percent", "float"),
+]
+NODE_COLUMNS = [
+    ("snapshot_time", "timestamp"), ("cluster", "string"), ("node_name", "string"),
+    ("cpu_usage_millicores", "int"), ("cpu_percent", "int"), ("memory_usage_bytes", "int"), ("memory_percent", "int"),
+    ("cpu_allocatable_millicores", "int"), ("memory_allocatable_bytes", "int"), ("pods", "int"),
+    ("cpu_requests_millicores", "int"), ("cpu_requests_vs_allocatable_percent", "float"),
+    ("memory_requests_bytes", "int"), ("memory_requests_vs_allocatable_percent", "float"),
+    ("cpu_limits_millicores", "int"), ("cpu_limits_vs_allocatable_percent", "float"),
+    ("memory_limits_bytes", "int"), ("memory_limits_vs_allocatable_percent", "float"),
+    ("top_cpu_pods", "string"), ("top_memory_pods", "string"),
+]
+
+def arrow_schema(columns):
+    types = {"timestamp": pa.timestamp("s", tz="UTC"), "string": pa.string(), "bool": pa.bool_(),
+             "int": pa.int64(), "float": pa.float64()}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+class TableWriter:
+    """
+    Grava os registros de uma tabela em um arquivo da partição date=AAAA-MM-DD. O arquivo é gravado com
+    um nome temporário iniciado por '_' (ignorado por leitores de datasets) e renomeado ao ser concluído
+    """
+    def __init__(self, output_dir, table, columns, snapshot_time):
+        extension = "parquet" if EXPORT_FORMAT == "parquet" else "ndjson.gz"
+        partition_dir = os.path.join(output_dir, table, f"date={snapshot_time:%Y-%m-%d}")
+        os.makedirs(partition_dir, exist_ok=True)
+        file_name = f"report-{snapshot_time:%H%M%S}-{uuid.uuid4().hex[:8]}.{extension}"
+        self.path = os.path.join(partition_dir, file_name)
+        self.temp_path = os.path.join(partition_dir, f"_{file_name}")
+        self.columns = columns
+        self.records = []
+        if EXPORT_FORMAT == "parquet":
+            self.schema = arrow_schema(columns)
+            self.file = pq.ParquetWriter(self.temp_path, self.schema)
+        else:
+            self.file = gzip.open(self.temp_path, "wt", encoding="utf-8")
+
+    def write(self, record):
+        if EXPORT_FORMAT == "parquet":
+            self.records.append(record)
+            if len(self.records) >= EXPORT_BATCH_SIZE:
+                self.flush()
+        else:
+            # No NDJSON as datas são gravadas em ISO 8601
+            self.file.write(json.dumps({
+                name: value.isoformat() if isinstance(value, datetime) else value for name, value in record.items()
+            }) + "\n")
+
+    def flush(self):
+        if EXPORT_FORMAT == "parquet" and self.records:
+            self.file.write_table(pa.Table.from_pylist(self.records, schema=self.schema))
+            self.records = []
+
+    def close(self, complete):
+        if complete:
+            self.flush()
+        self.file.close()
+        if complete:
+            os.replace(self.temp_path, self.path)
+        else:
+            os.remove(self.temp_path)
+
+class ColumnarReportWriter:
+    """
+    Recebe os registros tipados do relatório e os grava em duas tabelas, pods e nodes,
+    em output_dir/<tabela>/date=AAAA-MM-DD/. Cada execução acrescenta um arquivo à partição do dia,
+    formando um dataset que pode ser consultado por período (ex: pyarrow.dataset, DuckDB, Spark)
+    """
+    def __init__(self, output_dir):
+        self.snapshot_time = datetime.now(timezone.utc).replace(microsecond=0)
+        self.tables = {
+            "pods": TableWriter(output_dir, "pods", POD_COLUMNS, self.snapshot_time),
+            "nodes": TableWriter(output_dir, "nodes", NODE_COLUMNS, self.snapshot_time),
+        }
+        self.complete = False
+        self.paths = []
+
+    def writerecord(self, table, row, record):
+        # A linha formatada do CSV é ignorada: apenas o registro tipado é gravado
+        table_writer = self.tables[table]
+        values = dict(record, snapshot_time=self.snapshot_time)
+        table_writer.write({name: values.get(name) for name, _ in table_writer.columns})
+
+    def flush(self):
+        pass
+
+    def finish(self, final_report):
+        # O relatório final em texto não é exportado: status, reinicializações e uso do HPA já estão nas colunas
+        self.complete = True
+
+    def close(self):
+        for table_writer in self.tables.values():
+            table_writer.close(self.complete)
+        if self.complete:
+            self.paths = [table_writer.path for table_writer in self.tables.values()]
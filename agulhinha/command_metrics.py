@@ -0,0 +1,132 @@
+import threading
+import time
+
+# Limites superiores, em segundos, das faixas do histograma de latência dos comandos
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+# Verbos agrupados no histograma; os demais comandos entram como "other"
+COMMAND_VERBS = ("get", "logs", "top", "exec", "login", "whoami", "config")
+
+def command_verb(command):
+    """
+    Identifica o verbo de um comando oc (ex: 'oc adm top pods -n ns' -> 'top')
+    """
+    words = [word for word in command.split() if not word.startswith("-")]
+    if words[:1] == ["oc"]:
+        words = words[1:]
+    if words[:2] == ["adm", "top"]:
+        return "top"
+    return words[0] if words and words[0] in COMMAND_VERBS else "other"
+
+class CommandStats:
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.stdout_bytes = 0
+        self.total_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, seconds, stdout_bytes, failed):
+        self.count += 1
+        self.failures += 1 if failed else 0
+        self.stdout_bytes += stdout_bytes
+        self.total_seconds += seconds
+        for i, upper_bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper_bound:
+                self.buckets[i] += 1
+                break
+
+    def quantile(self, q):
+        """
+        Estimativa do quantil pelo limite superior da faixa do histograma em que ele cai
+        """
+        target = q * self.count
+        seen = 0
+        for upper_bound, bucket_count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += bucket_count
+            if bucket_count and seen >= target:
+                return upper_bound
+        return 0.0
+
+class CommandMetrics:
+    """
+    Contadores de todos os comandos enviados aos clusters: latência por verbo (histograma), chamadas,
+    falhas e bytes de saída por verbo e por cluster
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.by_verb = {}
+        self.by_cluster = {}
+
+    def record(self, command, cluster, seconds, stdout_bytes, failed):
+        verb = command_verb(command)
+        with self.lock:
+            self.by_verb.setdefault(verb, CommandStats()).add(seconds, stdout_bytes, failed)
+            self.by_cluster.setdefault(str(cluster or "local"), CommandStats()).add(seconds, stdout_bytes, failed)
+
+    def format_report(self):
+        """
+        Resumo em texto para o fim da execução pela linha de comando
+        """
+        with self.lock:
+            lines = ["Comandos por verbo:",
+                     f"  {'verbo':<8} {'chamadas':>9} {'falhas':>7} {'tempo (s)':>10} {'medio (s)':>10} {'p50<=':>7} {'p95<=':>7} {'stdout (KiB)':>13}"]
+            for verb, stats in sorted(self.by_verb.items(), key=lambda item: -item[1].total_seconds):
+                lines.append(f"  {verb:<8} {stats.count:>9} {stats.failures:>7} {stats.total_seconds:>10.2f} "
+                             f"{stats.total_seconds / stats.count:>10.3f} {stats.quantile(0.5):>7g} {stats.quantile(0.95):>7g} "
+                             f"{stats.stdout_bytes / 1024:>13.1f}")
+            lines.append("Comandos por cluster:")
+            for cluster, stats in sorted(self.by_cluster.items()):
+                lines.append(f"  {cluster}: {stats.count} chamadas, {stats.failures} falhas, "
+                             f"{stats.total_seconds:.2f}s, {stats.stdout_bytes / 1024:.1f} KiB")
+        return "\n".join(lines) + "\n"
+
+    def format_prometheus(self):
+        """
+        Métricas no formato texto do Prometheus, para o endpoint /metrics da interface web
+        """
+        lines = []
+        with self.lock:
+            lines.append("# HELP agulhinha_command_duration_seconds Latencia dos comandos enviados aos clusters por verbo")
+            lines.append("# TYPE agulhinha_command_duration_seconds histogram")
+            for verb, stats in sorted(self.by_verb.items()):
+                cumulative = 0
+                for upper_bound, bucket_count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += bucket_count
+                    le = "+Inf" if upper_bound == float("inf") else f"{upper_bound:g}"
+                    lines.append(f'agulhinha_command_duration_seconds_bucket{{verb="{verb}",le="{le}"}} {cumulative}')
+                lines.append(f'agulhinha_command_duration_seconds_sum{{verb="{verb}"}} {stats.total_seconds:.6f}')
+                lines.append(f'agulhinha_command_duration_seconds_count{{verb="{verb}"}} {stats.count}')
+            for name, help_text, field in (
+                    ("agulhinha_command_failures_total", "Comandos que falharam por verbo", "failures"),
+                    ("agulhinha_command_stdout_bytes_total", "Bytes de saida dos comandos por verbo", "stdout_bytes")):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for verb, stats in sorted(self.by_verb.items()):
+                    lines.append(f'{name}{{verb="{verb}"}} {getattr(stats, field)}')
+            for name, help_text, field in (
+                    ("agulhinha_cluster_commands_total", "Comandos enviados por cluster", "count"),
+                    ("agulhinha_cluster_command_failures_total", "Comandos que falharam por cluster", "failures"),
+                    ("agulhinha_cluster_stdout_bytes_total", "Bytes de saida dos comandos por cluster", "stdout_bytes")):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for cluster, stats in sorted(self.by_cluster.items()):
+                    lines.append(f'{name}{{cluster="{cluster}"}} {getattr(stats, field)}')
+        return "\n".join(lines) + "\n"
+
+# Instrumentação opcional: None enquanto não for ativada por enable_command_metrics
+command_metrics = None
+
+def enable_command_metrics():
+    global command_metrics
+    if command_metrics is None:
+        command_metrics = CommandMetrics()
+    return command_metrics
+
+def record_command(command, cluster, started, stdout, failed):
+    """
+    Registra um comando concluído; stdout é o texto da saída ou o número de bytes já lidos
+    """
+    if command_metrics is not None:
+        stdout_bytes = len(stdout.encode("utf-8")) if isinstance(stdout, str) else stdout
+        command_metrics.record(command, cluster, time.monotonic() - started, stdout_bytes, failed)
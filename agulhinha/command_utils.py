@@ -1,7 +1,272 @@
+import os
+import signal
 import subprocess
+import tempfile
+import threading
+import time
+import urllib.parse
+from api_client import run_api_command, stream_api_command
+from command_metrics import record_command
 
-def run_command(command):
-    result = subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-    if result.returncode != 0:
-        raise RuntimeError(f"Command '{command}' failed with error: {result.stderr}")
-    return result.stdout
+# Tamanho dos blocos lidos da saída de comandos em streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Diretório com um kubeconfig isolado por cluster, permitindo executar clusters em paralelo
+KUBECONFIG_DIR = os.environ.get("AGULHINHA_KUBECONFIG_DIR", os.path.join(os.path.expanduser("~"), ".kube", "agulhinha"))
+
+# Tempo máximo, em segundos, para copiar o contexto do kubeconfig do usuário para o kubeconfig do cluster
+KUBECONFIG_SEED_TIMEOUT = 30
+
+# Número máximo de comandos por segundo enviados a cada cluster (None desativa o limite)
+DEFAULT_RATE_LIMIT = 20
+
+class RateLimiter:
+    """
+    Token bucket simples: permite rajadas de até 'burst' comandos e depois 'rate' comandos por segundo
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+class ClusterLogin(str):
+    """
+    Nome de um cluster acessado com o login de um usuário (ex: na interface web, onde vários usuários usam o mesmo
+    cluster). Aparece como o nome do cluster em relatórios e mensagens, mas os comandos usam o kubeconfig do usuário
+    e os caches por cluster (clientes da API, sessões de exec, inventário) ficam separados por usuário
+    """
+    def __new__(cls, cluster_name, username):
+        cluster_login = super().__new__(cls, cluster_name)
+        cluster_login.username = username
+        return cluster_login
+
+    def __eq__(self, other):
+        if not isinstance(other, str):
+            return NotImplemented
+        return str.__eq__(self, other) and getattr(other, "username", None) == self.username
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash((str(self), self.username))
+
+# Backend usado para executar os comandos: "oc" (subprocess) ou "api" (REST com conexões persistentes)
+COMMAND_BACKENDS = ("oc", "api")
+command_backend = "oc"
+
+def configure_backend(backend):
+    """
+    Seleciona o backend dos comandos. No backend "api", comandos não suportados continuam usando o oc
+    """
+    global command_backend
+    if backend not in COMMAND_BACKENDS:
+        raise ValueError(f"Backend invalido: {backend}")
+    command_backend = backend
+
+def use_api_backend(cluster):
+    return command_backend == "api" and cluster is not None
+
+rate_limit = DEFAULT_RATE_LIMIT
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+def configure_rate_limit(requests_per_second):
+    """
+    Define o limite de comandos por segundo por cluster (None ou 0 desativa)
+    """
+    global rate_limit
+    with rate_limiters_lock:
+        rate_limit = requests_per_second or None
+        rate_limiters.clear()
+
+def wait_rate_limit(cluster):
+    if cluster is None or rate_limit is None:
+        return
+    # O limite é do cluster, compartilhado entre os usuários
+    cluster = str(cluster)
+    with rate_limiters_lock:
+        limiter = rate_limiters.get(cluster)
+        if limiter is None:
+            limiter = rate_limiters[cluster] = RateLimiter(rate_limit)
+    limiter.acquire()
+
+def get_kubeconfig_path(cluster):
+    username = getattr(cluster, "username", None)
+    if username is not None:
+        return os.path.join(KUBECONFIG_DIR, f"{cluster}@{urllib.parse.quote(username, safe='')}.kubeconfig")
+    return os.path.join(KUBECONFIG_DIR, f"{cluster}.kubeconfig")
+
+kubeconfig_seed_lock = threading.Lock()
+
+def seed_kubeconfig(cluster, kubeconfig, refresh=False):
+    """
+    Cria o kubeconfig do cluster a partir do contexto de mesmo nome no kubeconfig do usuário (ex: ~/.kube/config),
+    reaproveitando logins feitos por token ou SSO. Sem esse contexto, o arquivo é criado pelo 'oc login'.
+    Com refresh, copia o contexto de novo sobre o arquivo existente. Retorna True se o arquivo foi alterado
+    """
+    with kubeconfig_seed_lock:
+        if os.path.exists(kubeconfig) and not refresh:
+            return False
+        try:
+            # Roda com o ambiente atual, ou seja, com o kubeconfig do usuário
+            result = subprocess.run(["oc", "config", "view", "--minify", "--flatten", f"--context={cluster}"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+                                    timeout=KUBECONFIG_SEED_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        if result.returncode != 0:
+            return False
+        if os.path.exists(kubeconfig):
+            with open(kubeconfig) as current_file:
+                if current_file.read() == result.stdout:
+                    return False
+        # mkstemp cria o arquivo legível apenas pelo usuário, já que ele contém o token
+        fd, temp_path = tempfile.mkstemp(dir=KUBECONFIG_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as temp_file:
+            temp_file.write(result.stdout)
+        os.replace(temp_path, kubeconfig)
+        return True
+
+def refresh_kubeconfig(cluster):
+    """
+    Copia novamente o contexto do cluster do kubeconfig do usuário, para aproveitar um token ou SSO renovado
+    depois da primeira cópia. Não se aplica ao kubeconfig de um usuário da interface web
+    """
+    if cluster is None or isinstance(cluster, ClusterLogin):
+        return False
+    os.makedirs(KUBECONFIG_DIR, exist_ok=True)
+    return seed_kubeconfig(cluster, get_kubeconfig_path(cluster), refresh=True)
+
+def get_command_env(cluster):
+    """
+    Retorna o ambiente do comando com o KUBECONFIG do cluster, ou None para usar o ambiente atual
+    """
+    if cluster is None:
+        return None
+    os.makedirs(KUBECONFIG_DIR, exist_ok=True)
+    kubeconfig = get_kubeconfig_path(cluster)
+    # O kubeconfig de um usuário só é criado pelo login dele, nunca a partir do contexto de quem executa a ferramenta
+    if not isinstance(cluster, ClusterLogin) and not os.path.exists(kubeconfig):
+        seed_kubeconfig(cluster, kubeconfig)
+    env = os.environ.copy()
+    env["KUBECONFIG"] = kubeconfig
+    return env
+
+def kill_process_group(process):
+    """
+    Encerra o shell e os processos filhos (ex: oc), que ficam no mesmo grupo de processos
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def run_command(command, cluster=None, timeout=None):
+    wait_rate_limit(cluster)
+    started = time.monotonic()
+    try:
+        output = execute_command(command, cluster, timeout)
+    except Exception:
+        record_command(command, cluster, started, 0, True)
+        raise
+    record_command(command, cluster, started, output, False)
+    return output
+
+def execute_command(command, cluster=None, timeout=None):
+    if use_api_backend(cluster):
+        output = run_api_command(cluster, command, timeout=timeout)
+        if output is not None:
+            return output
+    # O comando roda em um grupo de processos próprio para que o timeout encerre também o oc, e não só o shell
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                               env=get_command_env(cluster), start_new_session=True)
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_process_group(process)
+        process.communicate()
+        raise RuntimeError(f"Command '{command}' timed out after {timeout} seconds")
+    if process.returncode != 0:
+        raise RuntimeError(f"Command '{command}' failed with error: {stderr}")
+    return stdout
+
+def stream_command(command, cluster=None, timeout=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Executa o comando e devolve a saída padrão em blocos de bytes, sem acumular a saída inteira em memória.
+    A latência registrada nas métricas vai até o fim da leitura
+    """
+    wait_rate_limit(cluster)
+    started = time.monotonic()
+    stdout_bytes = 0
+    try:
+        for chunk in execute_stream_command(command, cluster, timeout, chunk_size):
+            stdout_bytes += len(chunk)
+            yield chunk
+    except GeneratorExit:
+        # Leitura interrompida por quem consome o gerador: não é uma falha do comando
+        record_command(command, cluster, started, stdout_bytes, False)
+        raise
+    except Exception:
+        record_command(command, cluster, started, stdout_bytes, True)
+        raise
+    record_command(command, cluster, started, stdout_bytes, False)
+
+def execute_stream_command(command, cluster=None, timeout=None, chunk_size=STREAM_CHUNK_SIZE):
+    if use_api_backend(cluster):
+        chunks = stream_api_command(cluster, command, timeout=timeout, chunk_size=chunk_size)
+        if chunks is not None:
+            yield from chunks
+            return
+    # O stderr vai para um arquivo temporário para não travar o processo caso o pipe encha
+    with tempfile.TemporaryFile() as stderr_f:
+        process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=stderr_f, env=get_command_env(cluster),
+                                   start_new_session=True)
+        timed_out = threading.Event()
+        timer = None
+        if timeout:
+            def kill_on_timeout():
+                timed_out.set()
+                kill_process_group(process)
+            timer = threading.Timer(timeout, kill_on_timeout)
+            timer.daemon = True
+            timer.start()
+
+        finished = False
+        try:
+            while True:
+                chunk = process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            finished = True
+        finally:
+            if timer:
+                timer.cancel()
+            process.stdout.close()
+            if not finished:
+                # Leitura interrompida por quem consome o gerador
+                kill_process_group(process)
+            returncode = process.wait()
+
+        if timed_out.is_set():
+            raise RuntimeError(f"Command '{command}' timed out after {timeout} seconds")
+        if returncode != 0:
+            stderr_f.seek(0)
+            stderr = stderr_f.read().decode("utf-8", errors="replace")
+            raise RuntimeError(f"Command '{command}' failed with error: {stderr}")
@@ -0,0 +1,154 @@
+import math
+import re
+import shlex
+from concurrent.futures import ThreadPoolExecutor
+from exec_sessions import run_exec_command
+from pod_listing import list_pods, pod_matches
+
+# Número padrão de testes (oc exec) executados em paralelo
+DEFAULT_PROBE_WORKERS = 16
+# Tempo máximo, em segundos, de cada requisição do curl
+DEFAULT_PROBE_TIMEOUT = 10
+# Tempo extra dado ao oc exec além do timeout do curl (conexão com a API e início do processo no container)
+PROBE_EXEC_OVERHEAD = 15
+# Códigos HTTP a partir deste são contados como falha (ex: um 503 em todas as réplicas)
+DEFAULT_FAIL_STATUS = 400
+
+# Saída do curl com o código HTTP e os tempos acumulados desde o início da requisição
+CURL_WRITE_OUT = "PROBE %{http_code} %{time_namelookup} %{time_connect} %{time_appconnect} %{time_starttransfer} %{time_total}"
+PROBE_OUTPUT_RE = re.compile(r"PROBE (\d{3}) ([0-9.]+) ([0-9.]+) ([0-9.]+) ([0-9.]+) ([0-9.]+)")
+CURL_ERROR_RE = re.compile(r"curl: \((\d+)\) ([^\n]*)")
+
+def build_probe_command(url, timeout=DEFAULT_PROBE_TIMEOUT):
+    """
+    Comando curl executado dentro do container: descarta o corpo e imprime apenas os tempos
+    """
+    return f"curl -sS -o /dev/null --max-time {timeout} -w {shlex.quote(CURL_WRITE_OUT)} {shlex.quote(url)}"
+
+def parse_probe_output(output):
+    """
+    Converte a saída do CURL_WRITE_OUT nas fases da requisição, em segundos: DNS, conexão TCP,
+    handshake TLS, espera pelo primeiro byte (TTFB) e total
+    """
+    match = PROBE_OUTPUT_RE.search(output)
+    if not match:
+        return None
+    http_code = int(match.group(1))
+    namelookup, connect, appconnect, starttransfer, total = (float(value) for value in match.groups()[1:])
+    # time_appconnect é zero em requisições sem TLS
+    connected = appconnect or connect
+    return {
+        "http_code": http_code,
+        "dns": namelookup,
+        "connect": max(connect - namelookup, 0.0),
+        "tls": max(appconnect - connect, 0.0) if appconnect else 0.0,
+        "ttfb": max(starttransfer - connected, 0.0),
+        "total": total,
+    }
+
+def parse_probe_error(message):
+    """
+    Extrai o código e a mensagem de erro do curl (ex: 'curl: (7) Failed to connect') do erro do oc exec
+    """
+    match = CURL_ERROR_RE.search(message)
+    if match:
+        return f"curl ({match.group(1)}): {match.group(2).strip()}"
+    return message.strip().splitlines()[-1] if message.strip() else "erro desconhecido"
+
+def probe_url(cluster, namespace, pod_name, url, timeout=DEFAULT_PROBE_TIMEOUT, container=None, fail_status=DEFAULT_FAIL_STATUS):
+    """
+    Executa uma requisição a partir do pod e retorna o código HTTP e os tempos de cada fase,
+    ou o erro quando o exec ou o curl falham. Respostas com código HTTP a partir de fail_status
+    (ou sem código) também são falhas, mas mantêm o código e os tempos
+    """
+    try:
+        output = run_exec_command(cluster, namespace, pod_name, build_probe_command(url, timeout), container=container,
+                                  timeout=timeout + PROBE_EXEC_OVERHEAD)
+    except RuntimeError as e:
+        return {"pod": pod_name, "url": url, "ok": False, "error": parse_probe_error(str(e))}
+    timings = parse_probe_output(output)
+    if timings is None:
+        return {"pod": pod_name, "url": url, "ok": False, "error": f"saida inesperada do curl: {output.strip()[:200]}"}
+    if timings["http_code"] == 0 or timings["http_code"] >= fail_status:
+        return dict(timings, pod=pod_name, url=url, ok=False, error=f"HTTP {timings['http_code']:03d}")
+    return dict(timings, pod=pod_name, url=url, ok=True, error=None)
+
+def percentile(values, q):
+    """
+    Percentil pelo método do ranking mais próximo (q entre 0 e 100); None para uma lista vazia
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q * len(ordered) / 100), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarize_probes(results):
+    """
+    Resumo de uma URL: falhas (das quais http_errors são respostas com código HTTP de erro) e percentis do tempo total,
+    além da média de cada fase das requisições bem-sucedidas
+    """
+    succeeded = [result for result in results if result["ok"]]
+    totals = [result["total"] for result in succeeded]
+    summary = {
+        "count": len(results),
+        "failures": len(results) - len(succeeded),
+        "http_errors": sum(1 for result in results if not result["ok"] and "http_code" in result),
+        "p50": percentile(totals, 50),
+        "p95": percentile(totals, 95),
+        "p99": percentile(totals, 99),
+    }
+    for phase in ("dns", "connect", "tls", "ttfb", "total"):
+        summary[f"avg_{phase}"] = sum(result[phase] for result in succeeded) / len(succeeded) if succeeded else None
+    return summary
+
+def run_probe_matrix(cluster, namespace, pattern, urls, max_workers=DEFAULT_PROBE_WORKERS, timeout=DEFAULT_PROBE_TIMEOUT,
+                     container=None, inventory=None, fail_status=DEFAULT_FAIL_STATUS):
+    """
+    Testa cada URL a partir de cada pod que corresponde ao padrão, com no máximo max_workers execs em paralelo.
+    Retorna a matriz pods x URLs e o resumo de cada URL
+    """
+    if inventory:
+        pods = [pod["metadata"]["name"] for pod in inventory.get(cluster, namespace).list("pods") if pod_matches(pod, pattern)]
+    else:
+        pods = [pod["metadata"]["name"] for pod in list_pods(cluster, namespace, pattern)]
+
+    probes = [(pod_name, url) for pod_name in pods for url in urls]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(probes) or 1)), thread_name_prefix="probe") as executor:
+        results = list(executor.map(lambda probe: probe_url(cluster, namespace, probe[0], probe[1], timeout=timeout,
+                                                            container=container, fail_status=fail_status), probes))
+
+    matrix = {(result["pod"], result["url"]): result for result in results}
+    return {
+        "cluster": cluster,
+        "namespace": namespace,
+        "pods": pods,
+        "urls": list(urls),
+        "matrix": matrix,
+        "summary": {url: summarize_probes([matrix[(pod_name, url)] for pod_name in pods]) for url in urls},
+    }
+
+def format_seconds(value):
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+def format_probe_cell(result):
+    if not result["ok"]:
+        return f"FALHA {result['error']}"
+    return f"{result['http_code']} {format_seconds(result['total'])}"
+
+def format_probe_matrix(probe_matrix):
+    """
+    Matriz em texto para a linha de comando: uma linha por pod e um resumo por URL
+    """
+    lines = [f"Matriz de conectividade {probe_matrix['cluster']}/{probe_matrix['namespace']}"]
+    for pod_name in probe_matrix["pods"]:
+        lines.append(f"{pod_name}:")
+        for url in probe_matrix["urls"]:
+            lines.append(f"  {url} -> {format_probe_cell(probe_matrix['matrix'][(pod_name, url)])}")
+    lines.append("Resumo por URL:")
+    for url, summary in probe_matrix["summary"].items():
+        lines.append(f"  {url}: {summary['failures']}/{summary['count']} falhas ({summary['http_errors']} HTTP), p50 {format_seconds(summary['p50'])}, "
+                     f"p95 {format_seconds(summary['p95'])}, p99 {format_seconds(summary['p99'])} | medias: "
+                     f"dns {format_seconds(summary['avg_dns'])}, connect {format_seconds(summary['avg_connect'])}, "
+                     f"tls {format_seconds(summary['avg_tls'])}, ttfb {format_seconds(summary['avg_ttfb'])}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,181 @@
+import array
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from connectivity import probe_url, percentile, DEFAULT_PROBE_TIMEOUT, DEFAULT_PROBE_WORKERS
+from cluster_utils import keep_login_alive
+
+# Intervalo, em segundos, entre o início de duas rodadas de testes
+DEFAULT_MONITOR_INTERVAL = 5
+# Resultados guardados por par pod/URL (uma hora com o intervalo padrão)
+DEFAULT_MONITOR_HISTORY = 720
+# Janelas, em segundos, dos percentis e da taxa de erro (None usa todo o histórico guardado)
+MONITOR_WINDOWS = (60, 300, None)
+
+class ProbeHistory:
+    """
+    Buffer circular de tamanho fixo com o instante e a latência total de cada teste, em arrays de doubles.
+    Falhas são guardadas como NaN, então a memória não cresce com o tempo de execução
+    """
+    def __init__(self, capacity=DEFAULT_MONITOR_HISTORY):
+        self.capacity = capacity
+        self.timestamps = array.array("d", [0.0]) * capacity
+        self.latencies = array.array("d", [0.0]) * capacity
+        self.next_index = 0
+        self.count = 0
+
+    def add(self, timestamp, latency):
+        """
+        Registra um teste; latency é None quando o teste falhou
+        """
+        self.timestamps[self.next_index] = timestamp
+        self.latencies[self.next_index] = math.nan if latency is None else latency
+        self.next_index = (self.next_index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def stats(self, since=None):
+        """
+        Testes, falhas, taxa de erro e percentis da latência dos testes feitos a partir de 'since'
+        """
+        latencies = []
+        failures = 0
+        for i in range(self.count):
+            if since is not None and self.timestamps[i] < since:
+                continue
+            if math.isnan(self.latencies[i]):
+                failures += 1
+            else:
+                latencies.append(self.latencies[i])
+        count = len(latencies) + failures
+        return {
+            "count": count,
+            "failures": failures,
+            "error_rate": failures / count if count else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        }
+
+class MonitorTarget:
+    def __init__(self, cluster, namespace, pod_name, url, container=None, history_size=DEFAULT_MONITOR_HISTORY, owner=None):
+        self.id = str(uuid.uuid4())
+        self.owner = owner
+        self.cluster = cluster
+        self.namespace = namespace
+        self.pod_name = pod_name
+        self.url = url
+        self.container = container
+        self.history = ProbeHistory(history_size)
+        self.last_result = None
+
+class ConnectivityMonitor:
+    """
+    Testa periodicamente os pares pod/URL cadastrados (com probe_url, pelas sessões de exec quando ativadas)
+    e mantém o histórico recente de cada par
+    """
+    def __init__(self, interval=DEFAULT_MONITOR_INTERVAL, history_size=DEFAULT_MONITOR_HISTORY, timeout=DEFAULT_PROBE_TIMEOUT,
+                 max_workers=DEFAULT_PROBE_WORKERS):
+        self.interval = interval
+        self.history_size = history_size
+        self.timeout = timeout
+        self.targets = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="monitor")
+        self.thread = None
+
+    def add_target(self, cluster, namespace, pod_name, url, container=None, owner=None):
+        """
+        Cadastra um par pod/URL. Com owner, o par só é listado e removido pelo mesmo usuário
+        """
+        target = MonitorTarget(cluster, namespace, pod_name, url, container=container, history_size=self.history_size, owner=owner)
+        with self.lock:
+            self.targets[target.id] = target
+        return target
+
+    def remove_target(self, target_id, owner=None):
+        """
+        Remove o par; retorna False quando ele não existe ou pertence a outro usuário
+        """
+        with self.lock:
+            target = self.targets.get(target_id)
+            if target is None or (owner is not None and target.owner != owner):
+                return False
+            del self.targets[target_id]
+            return True
+
+    def remove_user_targets(self, username):
+        """
+        Remove os pares cadastrados pelo usuário (ex: no logout da interface web)
+        """
+        with self.lock:
+            for target_id in [target.id for target in self.targets.values() if target.owner == username]:
+                del self.targets[target_id]
+
+    def probe_all(self):
+        """
+        Executa uma rodada de testes em paralelo e registra os resultados no histórico de cada par
+        """
+        with self.lock:
+            targets = list(self.targets.values())
+        # Os pares cadastrados mantêm ativo o login usado pelos testes
+        for cluster in {target.cluster for target in targets}:
+            keep_login_alive(cluster)
+        started = time.time()
+        results = self.executor.map(self.probe_target, targets)
+        for target, result in zip(targets, results):
+            with self.lock:
+                target.history.add(started, result["total"] if result["ok"] else None)
+                target.last_result = result
+
+    def probe_target(self, target):
+        # Um erro inesperado em um par é registrado como falha do teste, sem perder a rodada dos demais pares
+        try:
+            return probe_url(target.cluster, target.namespace, target.pod_name, target.url, timeout=self.timeout,
+                             container=target.container)
+        except Exception as e:
+            return {"pod": target.pod_name, "url": target.url, "ok": False, "error": f"erro inesperado: {e!r}"}
+
+    def run_loop(self):
+        next_round = time.monotonic()
+        while not self.stopped.wait(max(0, next_round - time.monotonic())):
+            next_round = time.monotonic() + self.interval
+            # Uma rodada com erro inesperado não pode encerrar a thread e congelar o histórico
+            try:
+                self.probe_all()
+            except Exception as e:
+                print(f"Erro na rodada do monitor de conectividade: {e!r}")
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run_loop, name="connectivity-monitor", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.executor.shutdown(wait=False)
+
+    def status(self, owner=None):
+        """
+        Último resultado e estatísticas de cada janela de MONITOR_WINDOWS para cada par cadastrado
+        (com owner, apenas os pares do usuário)
+        """
+        now = time.time()
+        rows = []
+        with self.lock:
+            for target in self.targets.values():
+                if owner is not None and target.owner != owner:
+                    continue
+                rows.append({
+                    "id": target.id,
+                    "cluster": target.cluster,
+                    "namespace": target.namespace,
+                    "pod": target.pod_name,
+                    "url": target.url,
+                    "container": target.container,
+                    "last_result": target.last_result,
+                    "windows": [(window, target.history.stats(None if window is None else now - window)) for window in MONITOR_WINDOWS],
+                })
+        return rows
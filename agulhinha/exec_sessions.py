@@ -0,0 +1,239 @@
+import atexit
+import os
+import re
+import selectors
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+from command_utils import run_command, wait_rate_limit, get_command_env, kill_process_group, STREAM_CHUNK_SIZE
+from command_metrics import record_command
+
+# Tempo, em segundos, que uma sessão ociosa fica aberta antes de ser encerrada
+DEFAULT_SESSION_IDLE_TIMEOUT = 60
+# Sessões ociosas mantidas por pod (as demais são encerradas ao serem devolvidas)
+DEFAULT_SESSIONS_PER_POD = 4
+# Tempo máximo, em segundos, para recolher a saída de uma sessão que terminou
+SESSION_CLOSE_TIMEOUT = 5
+
+class ExecSessionClosed(RuntimeError):
+    """
+    O shell da sessão terminou (pod reiniciado, exec recusado, conexão com a API perdida)
+    """
+
+class ExecSession:
+    """
+    Um 'oc exec -i ... -- sh' mantido aberto: cada comando é enviado ao shell pela entrada padrão e o fim da
+    saída é reconhecido por um marcador impresso logo depois, junto com o código de saída do comando
+    """
+    def __init__(self, cluster, namespace, pod_name, container=None):
+        self.cluster = cluster
+        self.key = (cluster, namespace, pod_name, container)
+        container_option = ["-c", container] if container else []
+        self.command = ["oc", "exec", "-i", "-n", namespace, pod_name] + container_option
+        self.description = " ".join(self.command)
+        wait_rate_limit(cluster)
+        try:
+            self.process = subprocess.Popen(self.command + ["--", "sh"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=subprocess.PIPE, env=get_command_env(cluster), start_new_session=True)
+        except OSError as e:
+            # Sem o binário oc (ou sem permissão para executá-lo), como o RuntimeError do run_command
+            raise ExecSessionClosed(f"Command '{self.description} -- sh' failed with error: {e}")
+        self.last_used = time.monotonic()
+        self.commands_run = 0
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        if self.process.poll() is None:
+            kill_process_group(self.process)
+        for pipe in (self.process.stdin, self.process.stdout, self.process.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        self.process.wait()
+
+    def run(self, command, timeout=None):
+        """
+        Executa o comando no shell da sessão e retorna a saída padrão, como run_command.
+        Um código de saída diferente de zero gera RuntimeError com a saída de erro; a sessão continua utilizável
+        """
+        started = time.monotonic()
+        description = f"{self.description} -- {command}"
+        try:
+            returncode, stdout, stderr = self.execute(command, timeout)
+        except Exception:
+            record_command(description, self.cluster, started, 0, True)
+            raise
+        self.last_used = time.monotonic()
+        self.commands_run += 1
+        record_command(description, self.cluster, started, stdout, returncode != 0)
+        if returncode != 0:
+            raise RuntimeError(f"Command '{description}' failed with error: {stderr}")
+        return stdout
+
+    def execute(self, command, timeout):
+        marker = f"__agulhinha_{uuid.uuid4().hex}__"
+        # O comando roda em um subshell (um 'exit' não encerra a sessão) e sem ler a entrada do shell,
+        # que traz os próximos comandos
+        script = (f"( {command}\n) </dev/null\n"
+                  f"printf '\\n{marker} %s\\n' \"$?\"\n"
+                  f"printf '\\n{marker}\\n' >&2\n")
+        try:
+            self.process.stdin.write(script.encode("utf-8"))
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            raise ExecSessionClosed(self.closed_error())
+
+        stdout_re = re.compile(rb"\n" + marker.encode() + rb" (\d+)\n")
+        stderr_re = re.compile(rb"\n" + marker.encode() + rb"\n")
+        streams = {self.process.stdout.fileno(): (bytearray(), stdout_re), self.process.stderr.fileno(): (bytearray(), stderr_re)}
+        matches = {}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with selectors.DefaultSelector() as selector:
+            for fd in streams:
+                selector.register(fd, selectors.EVENT_READ)
+            while len(matches) < len(streams):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    # Não há como interromper só o comando: a sessão é descartada
+                    self.close()
+                    raise RuntimeError(f"Command '{self.description} -- {command}' timed out after {timeout} seconds")
+                for selector_key, _ in selector.select(remaining):
+                    data = os.read(selector_key.fd, STREAM_CHUNK_SIZE)
+                    if not data:
+                        raise ExecSessionClosed(self.closed_error(streams))
+                    buffer, marker_re = streams[selector_key.fd]
+                    buffer += data
+                    match = marker_re.search(buffer)
+                    if match:
+                        matches[selector_key.fd] = match
+                        selector.unregister(selector_key.fd)
+
+        stdout_buffer = streams[self.process.stdout.fileno()][0]
+        stderr_buffer = streams[self.process.stderr.fileno()][0]
+        stdout_match = matches[self.process.stdout.fileno()]
+        stderr_match = matches[self.process.stderr.fileno()]
+        return (int(stdout_match.group(1)),
+                stdout_buffer[:stdout_match.start()].decode("utf-8", errors="replace"),
+                stderr_buffer[:stderr_match.start()].decode("utf-8", errors="replace"))
+
+    def closed_error(self, streams=None):
+        """
+        Mensagem de erro de uma sessão encerrada, com o que o oc escreveu na saída de erro
+        """
+        stderr = bytearray(streams[self.process.stderr.fileno()][0]) if streams else bytearray()
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=SESSION_CLOSE_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired):
+            kill_process_group(self.process)
+        try:
+            stderr += self.process.stderr.read()
+        except (OSError, ValueError):
+            pass
+        self.close()
+        return f"Command '{self.description} -- sh' failed with error: {stderr.decode('utf-8', errors='replace')}"
+
+class ExecSessionPool:
+    """
+    Sessões de exec reaproveitadas entre comandos no mesmo pod. Cada sessão executa um comando por vez;
+    uma thread encerra as sessões ociosas há mais de idle_timeout segundos
+    """
+    def __init__(self, idle_timeout=DEFAULT_SESSION_IDLE_TIMEOUT, sessions_per_pod=DEFAULT_SESSIONS_PER_POD):
+        self.idle_timeout = idle_timeout
+        self.sessions_per_pod = sessions_per_pod
+        self.idle_sessions = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.reaper = threading.Thread(target=self.reap_loop, name="exec-session-reaper", daemon=True)
+        self.reaper.start()
+
+    def acquire(self, cluster, namespace, pod_name, container=None):
+        key = (cluster, namespace, pod_name, container)
+        with self.lock:
+            sessions = self.idle_sessions.get(key, [])
+            while sessions:
+                session = sessions.pop()
+                if session.alive():
+                    return session
+                session.close()
+        return ExecSession(cluster, namespace, pod_name, container)
+
+    def release(self, session):
+        if not session.alive():
+            session.close()
+            return
+        with self.lock:
+            sessions = self.idle_sessions.setdefault(session.key, [])
+            if not self.stopped.is_set() and len(sessions) < self.sessions_per_pod:
+                sessions.append(session)
+                return
+        session.close()
+
+    def run(self, cluster, namespace, pod_name, command, container=None, timeout=None):
+        """
+        Executa o comando em uma sessão do pod. Se uma sessão reaproveitada tiver terminado enquanto estava
+        ociosa, o comando é repetido uma vez em uma sessão nova
+        """
+        session = self.acquire(cluster, namespace, pod_name, container)
+        try:
+            return session.run(command, timeout=timeout)
+        except ExecSessionClosed:
+            if not session.commands_run:
+                raise
+        finally:
+            self.release(session)
+        session = ExecSession(cluster, namespace, pod_name, container)
+        try:
+            return session.run(command, timeout=timeout)
+        finally:
+            self.release(session)
+
+    def reap_idle(self):
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            for key, sessions in list(self.idle_sessions.items()):
+                expired += [session for session in sessions if now - session.last_used > self.idle_timeout]
+                sessions[:] = [session for session in sessions if now - session.last_used <= self.idle_timeout]
+                if not sessions:
+                    del self.idle_sessions[key]
+        for session in expired:
+            session.close()
+
+    def reap_loop(self):
+        while not self.stopped.wait(max(1, self.idle_timeout / 2)):
+            self.reap_idle()
+
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            sessions = [session for sessions in self.idle_sessions.values() for session in sessions]
+            self.idle_sessions.clear()
+        for session in sessions:
+            session.close()
+
+# Sessões persistentes opcionais: None enquanto não forem ativadas por enable_exec_sessions
+exec_session_pool = None
+
+def enable_exec_sessions(idle_timeout=DEFAULT_SESSION_IDLE_TIMEOUT):
+    global exec_session_pool
+    if exec_session_pool is None:
+        exec_session_pool = ExecSessionPool(idle_timeout=idle_timeout)
+        # Os shells rodam em grupos de processos próprios e não terminariam junto com a ferramenta
+        atexit.register(exec_session_pool.close)
+    return exec_session_pool
+
+def run_exec_command(cluster, namespace, pod_name, command, container=None, timeout=None):
+    """
+    Executa um comando de shell no pod: por uma sessão persistente, quando ativadas, ou por um novo 'oc exec'
+    """
+    if exec_session_pool is not None:
+        return exec_session_pool.run(cluster, namespace, pod_name, command, container=container, timeout=timeout)
+    container_option = f" -c {shlex.quote(container)}" if container else ""
+    return run_command(f"oc exec -n {shlex.quote(namespace)} {shlex.quote(pod_name)}{container_option} -- {command}",
+                       cluster=cluster, timeout=timeout)
@@ -0,0 +1,201 @@
+import json
+import shlex
+import threading
+import time
+import urllib.parse
+from api_client import build_resource_path
+from command_utils import run_command, stream_command
+from pod_listing import project_pod
+
+# Recursos mantidos em cache pelo inventário de cada namespace
+INVENTORY_RESOURCES = ("pods", "hpa", "replicasets", "replicationcontrollers")
+# Redução aplicada aos objetos antes de guardá-los no cache
+RESOURCE_PROJECTIONS = {"pods": project_pod}
+# Duração máxima de cada watch antes de reconectar a partir do último resourceVersion
+WATCH_TIMEOUT_SECONDS = 300
+# Espera antes de tentar novamente após uma falha na listagem ou no watch (dobra a cada falha seguida)
+WATCH_RETRY_DELAY = 5
+# Espera máxima entre as tentativas
+WATCH_MAX_RETRY_DELAY = 300
+# Falhas seguidas após as quais o cache deixa de ser considerado atualizado
+WATCH_MAX_FAILURES = 3
+# Intervalo de verificação das falhas enquanto aguarda a listagem inicial
+SYNC_POLL_INTERVAL = 0.5
+# Tempo máximo de espera pela listagem inicial
+DEFAULT_SYNC_TIMEOUT = 120
+
+def iter_lines(chunks):
+    """
+    Agrupa blocos de bytes em linhas completas (os eventos de watch são separados por quebra de linha)
+    """
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+class ResourceWatcher(threading.Thread):
+    """
+    Mantém em memória a lista de um recurso do namespace: uma listagem inicial seguida de um watch
+    retomado a partir do último resourceVersion. Refaz a listagem quando o resourceVersion expira (410)
+    """
+    def __init__(self, cluster, namespace, resource):
+        super().__init__(name=f"watch-{cluster}-{namespace}-{resource}", daemon=True)
+        self.cluster = cluster
+        self.namespace = namespace
+        self.resource = resource
+        self.path = build_resource_path(resource, namespace)
+        self.project = RESOURCE_PROJECTIONS.get(resource, lambda item: item)
+        self.items = {}
+        self.resource_version = None
+        self.lock = threading.Lock()
+        self.synced = threading.Event()
+        self.stopped = threading.Event()
+        self.failures = 0
+        self.last_error = None
+
+    def relist(self):
+        resource_list = json.loads(run_command(f"oc get --raw {shlex.quote(self.path)}", cluster=self.cluster))
+        with self.lock:
+            self.items = {item["metadata"]["name"]: self.project(item) for item in resource_list["items"]}
+            self.resource_version = resource_list["metadata"]["resourceVersion"]
+        self.failures = 0
+        self.synced.set()
+
+    def apply_event(self, event):
+        event_type = event["type"]
+        resource = event["object"]
+        if event_type == "ERROR":
+            if resource.get("code") == 410:
+                # resourceVersion expirou no servidor: força uma nova listagem
+                with self.lock:
+                    self.resource_version = None
+            raise RuntimeError(f"Watch de {self.resource} em {self.cluster}/{self.namespace} falhou: {resource.get('message')}")
+
+        with self.lock:
+            if event_type in ("ADDED", "MODIFIED"):
+                self.items[resource["metadata"]["name"]] = self.project(resource)
+            elif event_type == "DELETED":
+                self.items.pop(resource["metadata"]["name"], None)
+            self.resource_version = resource["metadata"]["resourceVersion"]
+
+    def watch(self):
+        params = urllib.parse.urlencode({
+            "watch": 1, "allowWatchBookmarks": "true",
+            "resourceVersion": self.resource_version, "timeoutSeconds": WATCH_TIMEOUT_SECONDS,
+        })
+        for line in iter_lines(stream_command(f"oc get --raw {shlex.quote(self.path + '?' + params)}", cluster=self.cluster)):
+            if self.stopped.is_set():
+                return
+            self.apply_event(json.loads(line))
+            self.failures = 0
+        self.failures = 0
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self.relist()
+                self.watch()
+            except (RuntimeError, ValueError, KeyError) as e:
+                print(f"Erro no inventario de {self.resource} em {self.cluster}/{self.namespace}: {str(e)}")
+                self.failures += 1
+                self.last_error = str(e)
+                if self.failures >= WATCH_MAX_FAILURES:
+                    # Sem listagem nem watch há várias tentativas: o cache pode estar desatualizado
+                    self.synced.clear()
+                self.stopped.wait(min(WATCH_RETRY_DELAY * 2 ** (self.failures - 1), WATCH_MAX_RETRY_DELAY))
+
+    def is_failing(self):
+        """
+        Indica se a listagem inicial falhou ou se a listagem e o watch falham seguidamente
+        """
+        return self.failures > 0 and not self.synced.is_set()
+
+    def stop(self):
+        self.stopped.set()
+
+    def list(self):
+        with self.lock:
+            return [self.items[name] for name in sorted(self.items)]
+
+class NamespaceInventory:
+    """
+    Cache dos pods, HPAs, ReplicaSets e ReplicationControllers de um namespace
+    """
+    def __init__(self, cluster, namespace):
+        self.cluster = cluster
+        self.namespace = namespace
+        self.watchers = {resource: ResourceWatcher(cluster, namespace, resource) for resource in INVENTORY_RESOURCES}
+
+    def start(self):
+        for watcher in self.watchers.values():
+            watcher.start()
+
+    def stop(self):
+        for watcher in self.watchers.values():
+            watcher.stop()
+
+    def wait_synced(self, timeout=DEFAULT_SYNC_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        for resource, watcher in self.watchers.items():
+            while not watcher.synced.wait(SYNC_POLL_INTERVAL):
+                if watcher.is_failing():
+                    raise RuntimeError(f"Inventario de {resource} em {self.cluster}/{self.namespace} falhou: {watcher.last_error}")
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(f"Inventario de {resource} em {self.cluster}/{self.namespace} nao sincronizou em {timeout} segundos")
+
+    def is_failing(self):
+        return any(watcher.is_failing() for watcher in self.watchers.values())
+
+    def list(self, resource):
+        return self.watchers[resource].list()
+
+class InventoryManager:
+    """
+    Coletor de longa duração: cria o inventário de cada namespace no primeiro uso e o mantém
+    atualizado por watches, para que os relatórios leiam do cache em vez de listar o cluster
+    """
+    def __init__(self):
+        self.inventories = {}
+        self.lock = threading.Lock()
+
+    def get(self, cluster, namespace, timeout=DEFAULT_SYNC_TIMEOUT):
+        key = (cluster, namespace)
+        with self.lock:
+            inventory = self.inventories.get(key)
+            if inventory is not None and inventory.is_failing():
+                # Watches falhando seguidamente: descarta o cache em vez de servir objetos desatualizados
+                self.inventories.pop(key).stop()
+                inventory = None
+            if inventory is None:
+                inventory = self.inventories[key] = NamespaceInventory(cluster, namespace)
+                inventory.start()
+        try:
+            inventory.wait_synced(timeout or DEFAULT_SYNC_TIMEOUT)
+        except RuntimeError:
+            # Um inventário que não sincroniza não fica em cache (nem com threads tentando para sempre)
+            with self.lock:
+                if self.inventories.get(key) is inventory:
+                    del self.inventories[key]
+            inventory.stop()
+            raise
+        return inventory
+
+    def forget_user(self, username):
+        """
+        Encerra os inventários criados com o login do usuário (ex: no logout da interface web)
+        """
+        with self.lock:
+            for key in [key for key in self.inventories if getattr(key[0], "username", None) == username]:
+                self.inventories.pop(key).stop()
+
+    def stop(self):
+        with self.lock:
+            for inventory in self.inventories.values():
+                inventory.stop()
+            self.inventories.clear()
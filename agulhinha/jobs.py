@@ -0,0 +1,115 @@
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Número padrão de jobs executados ao mesmo tempo
+DEFAULT_JOB_WORKERS = 2
+# Tempo, em segundos, que um job concluído e seu resultado ficam disponíveis para download
+JOB_RETENTION = 3600
+
+class JobProgress:
+    """
+    Contadores de progresso de um job (clusters, namespaces e pods totais e concluídos),
+    atualizados pelas threads que executam o relatório ou a coleta de logs
+    """
+    FIELDS = ("clusters_total", "clusters_done", "namespaces_total", "namespaces_done", "pods_total", "pods_done")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {field: 0 for field in self.FIELDS}
+
+    def add(self, field, amount=1):
+        with self.lock:
+            self.counters[field] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+class Job:
+    def __init__(self, kind, owner, key, filename, content_type):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.owner = owner
+        self.key = key
+        self.filename = filename
+        self.content_type = content_type
+        self.status = "queued"
+        self.error = None
+        self.result_path = None
+        self.progress = JobProgress()
+        self.work_dir = tempfile.mkdtemp(prefix=f"agulhinha-{kind}-")
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def is_finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "progress": self.progress.snapshot(),
+            "download": f"/jobs/{self.id}/download" if self.status == "done" else None,
+        }
+
+class JobManager:
+    """
+    Fila de jobs em segundo plano com limite de concorrência. Pedidos idênticos de um mesmo
+    usuário enquanto o job anterior ainda está em andamento são atendidos pelo mesmo job
+    """
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self.jobs = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def submit(self, kind, owner, params, func, filename, content_type):
+        """
+        Enfileira func(job) e retorna o job. func recebe o job (com work_dir e progress)
+        e deve retornar o caminho do arquivo de resultado
+        """
+        key = (owner, kind, params)
+        with self.lock:
+            self.cleanup()
+            job = self.in_flight.get(key)
+            if job is not None:
+                return job
+            job = Job(kind, owner, key, filename, content_type)
+            self.jobs[job.id] = job
+            self.in_flight[key] = job
+        self.executor.submit(self.run_job, job, func)
+        return job
+
+    def run_job(self, job, func):
+        job.status = "running"
+        try:
+            job.result_path = func(job)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self.lock:
+                self.in_flight.pop(job.key, None)
+
+    def get(self, job_id, owner):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def cleanup(self):
+        # Chamado com o lock adquirido: remove jobs concluídos há mais de JOB_RETENTION segundos
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.is_finished() and now - job.finished_at > JOB_RETENTION:
+                shutil.rmtree(job.work_dir, ignore_errors=True)
+                del self.jobs[job_id]
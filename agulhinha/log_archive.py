@@ -0,0 +1,128 @@
+import io
+import tarfile
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from command_utils import stream_command
+from log_utils import build_logs_command
+
+# Parte de cada log mantida em memória; o restante vai para um arquivo temporário em disco.
+# O tar exige o tamanho da entrada antes do conteúdo, então cada log é lido inteiro antes de ser gravado
+LOG_SPOOL_MEMORY = 1024 * 1024
+# Logs que podem estar lidos (ou em leitura) à frente do que já foi gravado, por worker
+LOGS_AHEAD_PER_WORKER = 2
+# Número padrão de logs lidos em paralelo
+DEFAULT_LOG_WORKERS = 4
+# Tempo máximo, em segundos, para ler o log de um container antes de desistir dele
+DEFAULT_LOG_TIMEOUT = 300
+
+def fetch_log(cluster, command, cancelled, timeout=None):
+    """
+    Lê a saída do comando em streaming para um arquivo temporário (em memória até LOG_SPOOL_MEMORY bytes).
+    A leitura não depende da escrita do arquivo, então o timeout conta apenas o tempo de leitura do log.
+    Retorna (arquivo, mensagem de erro ou None)
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=LOG_SPOOL_MEMORY)
+    chunks = stream_command(command, cluster=cluster, timeout=timeout)
+    error = None
+    try:
+        for chunk in chunks:
+            if cancelled.is_set():
+                break
+            spool.write(chunk)
+    except RuntimeError as e:
+        error = str(e)
+    finally:
+        # Encerra o oc caso a leitura tenha sido interrompida
+        chunks.close()
+    return spool, error
+
+def add_tar_entry(tar, name, fileobj, size):
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    tar.addfile(info, fileobj)
+
+def write_log_entry(tar, name, spool, error):
+    """
+    Grava o log como uma única entrada 'name'. Falhas na leitura são gravadas em 'name.error.txt',
+    depois do trecho do log que chegou a ser lido
+    """
+    with spool:
+        size = spool.tell()
+        spool.seek(0)
+        if size or not error:
+            add_tar_entry(tar, name, spool, size)
+    if error:
+        message = error.encode("utf-8")
+        add_tar_entry(tar, f"{name}.error.txt", io.BytesIO(message), len(message))
+
+def close_spool(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result()[0].close()
+
+def write_logs_archive(fileobj, cluster, log_sources, max_workers=DEFAULT_LOG_WORKERS, timeout=DEFAULT_LOG_TIMEOUT, progress=None):
+    """
+    Gera um .tar.gz em streaming em fileobj com os logs de log_sources, uma lista de
+    (pod, [(nome no arquivo, comando oc logs), ...]). Os logs são lidos em paralelo, mas gravados na ordem
+    da lista; no máximo LOGS_AHEAD_PER_WORKER logs por worker ficam lidos à frente da escrita, com até
+    LOG_SPOOL_MEMORY bytes de cada um em memória. Um log que excede o timeout é gravado até onde foi lido,
+    seguido de um arquivo .error.txt
+    """
+    cancelled = threading.Event()
+    max_workers = max(1, max_workers)
+    pending = iter([(name, command) for _, pod_entries in log_sources for name, command in pod_entries])
+    fetches = deque()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="log-fetch")
+
+    def submit_next():
+        entry = next(pending, None)
+        if entry:
+            fetches.append((entry[0], executor.submit(fetch_log, cluster, entry[1], cancelled, timeout)))
+
+    try:
+        for _ in range(max_workers * LOGS_AHEAD_PER_WORKER):
+            submit_next()
+
+        # O modo "w|gz" escreve o arquivo sequencialmente, sem precisar de seek
+        with tarfile.open(fileobj=fileobj, mode="w|gz") as tar:
+            for _, pod_entries in log_sources:
+                for _ in pod_entries:
+                    name, fetch = fetches.popleft()
+                    submit_next()
+                    write_log_entry(tar, name, *fetch.result())
+                if progress:
+                    progress.add("pods_done")
+    finally:
+        # Em caso de erro na escrita (ex: cliente desconectou) interrompe as leituras pendentes
+        cancelled.set()
+        for _, fetch in fetches:
+            fetch.add_done_callback(close_spool)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def build_pod_log_sources(namespace, pods, since=None, tail=None, previous=False, container=None, all_containers=False):
+    """
+    Monta as entradas do arquivo no layout <pod>/<container>.log (ou .previous.log com --previous).
+    Por padrão usa o primeiro container do pod; container escolhe um container específico e
+    all_containers inclui todos
+    """
+    suffix = ".previous.log" if previous else ".log"
+    log_sources = []
+    for pod in pods:
+        pod_name = pod["metadata"]["name"]
+        container_names = [pod_container["name"] for pod_container in pod["spec"]["containers"]]
+        if container:
+            selected = [container]
+        elif all_containers:
+            selected = container_names
+        else:
+            selected = container_names[:1]
+        log_sources.append((pod_name, [
+            (f"{pod_name}/{container_name}{suffix}",
+             build_logs_command(namespace, pod_name, since=since, tail=tail, container=container_name, previous=previous))
+            for container_name in selected
+        ]))
+    return log_sources
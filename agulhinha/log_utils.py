@@ -0,0 +1,150 @@
+import re
+import shlex
+from command_utils import stream_command
+
+# Padrões contados como erro nos logs dos pods
+DEFAULT_ERROR_PATTERNS = ["ERRO", "Exception", "OOMKilled"]
+# Horário no início das linhas do 'oc logs --timestamps' (RFC3339 em UTC, com fração de segundos opcional)
+LOG_TIMESTAMP_RE = re.compile(r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d{1,9}))?Z")
+
+def build_logs_command(namespace, pod_name, since=None, tail=None, since_time=None, container=None, previous=False,
+                       timestamps=False):
+    """
+    Monta o comando 'oc logs' com a janela de tempo (--since ou --since-time) e/ou de linhas (--tail) opcionais,
+    para um container específico (-c), para a execução anterior do container (--previous) e/ou com o horário
+    de cada linha (--timestamps).
+    Os valores vêm de formulários da interface web e são escapados, já que o comando roda em um shell
+    """
+    command = f"oc logs -n {shlex.quote(namespace)} {shlex.quote(pod_name)}"
+    if container:
+        command += f" -c {shlex.quote(container)}"
+    if previous:
+        command += " --previous"
+    if timestamps:
+        command += " --timestamps"
+    if since_time:
+        command += f" --since-time={shlex.quote(since_time)}"
+    elif since:
+        command += f" --since={shlex.quote(since)}"
+    if tail is not None:
+        command += f" --tail={shlex.quote(str(tail))}"
+    return command
+
+def is_self_overlapping(encoded):
+    """
+    Indica se o padrão pode se sobrepor a si mesmo (ex: 'aa' ou 'abab'), quando a última ocorrência encontrada
+    por rfind pode não ser a última ocorrência da contagem sem sobreposição
+    """
+    return any(encoded[:size] == encoded[-size:] for size in range(1, len(encoded)))
+
+def last_match_end(buffer, encoded, self_overlapping):
+    """
+    Posição logo após a última ocorrência contada por buffer.count (ocorrências sem sobreposição, da esquerda para a direita)
+    """
+    if not self_overlapping:
+        return buffer.rfind(encoded) + len(encoded)
+    end = position = buffer.find(encoded)
+    while position != -1:
+        end = position + len(encoded)
+        position = buffer.find(encoded, end)
+    return end
+
+def count_patterns_in_stream(chunks, patterns):
+    """
+    Conta as ocorrências de cada padrão em uma sequência de blocos de bytes, com o mesmo resultado de bytes.count
+    sobre o conteúdo inteiro, independente de onde os blocos foram divididos
+    """
+    encoded_patterns = [(pattern, pattern.encode("utf-8")) for pattern in dict.fromkeys(patterns)]
+    self_overlapping = {pattern: is_self_overlapping(encoded) for pattern, encoded in encoded_patterns}
+    counts = {pattern: 0 for pattern in patterns}
+    # Para cada padrão, guarda o final do conteúdo ainda não consumido por uma ocorrência,
+    # curto demais para conter uma ocorrência completa
+    carries = {pattern: b"" for pattern in patterns}
+    total_size = 0
+
+    for chunk in chunks:
+        total_size += len(chunk)
+        for pattern, encoded in encoded_patterns:
+            if not encoded:
+                continue
+            buffer = carries[pattern] + chunk
+            found = buffer.count(encoded)
+            counts[pattern] += found
+            keep_from = len(buffer) - len(encoded) + 1
+            if found:
+                keep_from = max(keep_from, last_match_end(buffer, encoded, self_overlapping[pattern]))
+            carries[pattern] = buffer[max(keep_from, 0):]
+
+    for pattern, encoded in encoded_patterns:
+        if not encoded:
+            # Como bytes.count, o padrão vazio é encontrado antes e depois de cada byte
+            counts[pattern] = total_size + 1
+    return counts
+
+def count_log_errors(cluster, namespace, pod_name, patterns=None, since=None, tail=None, timeout=None, since_time=None):
+    """
+    Lê os logs do pod em streaming e retorna a contagem de cada padrão de erro, mantendo o uso
+    de memória constante independente do tamanho do log
+    """
+    patterns = patterns or DEFAULT_ERROR_PATTERNS
+    command = build_logs_command(namespace, pod_name, since=since, tail=tail, since_time=since_time)
+    return count_patterns_in_stream(stream_command(command, cluster=cluster, timeout=timeout), patterns)
+
+def normalize_log_timestamp(timestamp):
+    """
+    Completa a fração de segundos do horário do --timestamps (RFC3339 com até 9 dígitos, ex: 2024-01-01T00:00:00.5Z)
+    para 9 dígitos, de forma que a comparação entre textos siga a ordem cronológica. Retorna None se o formato não for reconhecido
+    """
+    match = LOG_TIMESTAMP_RE.fullmatch(timestamp)
+    if not match:
+        return None
+    return f"{match.group(1)}.{(match.group(2) or '').ljust(9, '0')}Z"
+
+def strip_log_timestamps(chunks, after=None, consumed=None):
+    """
+    Remove o horário do início de cada linha da saída do 'oc logs --timestamps', descartando as linhas com horário
+    igual ou anterior a 'after'. O horário da última linha entregue fica em consumed["timestamp"]
+    """
+    after = normalize_log_timestamp(after) if after else None
+    for line in iter_log_lines(chunks):
+        timestamp, separator, content = line.partition(b" ")
+        normalized = normalize_log_timestamp(timestamp.decode("ascii", "replace")) if separator else None
+        if normalized is None:
+            # Linha sem horário (não deveria ocorrer com --timestamps): contada como está
+            yield line
+            continue
+        if after and normalized <= after:
+            continue
+        if consumed is not None:
+            consumed["timestamp"] = normalized
+        yield content
+
+def iter_log_lines(chunks):
+    """
+    Agrupa blocos de bytes em linhas, mantendo a quebra de linha no final de cada uma
+    """
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+    if buffer:
+        yield buffer
+
+def count_new_log_errors(cluster, namespace, pod_name, checkpoint=None, patterns=None, since=None, tail=None, timeout=None):
+    """
+    Conta os padrões de erro nas linhas de log escritas após o checkpoint (horário da última linha já contada)
+    e retorna as contagens e o novo checkpoint. Sem checkpoint, usa a janela de since/tail
+    """
+    patterns = patterns or DEFAULT_ERROR_PATTERNS
+    since_time = None
+    if checkpoint:
+        # O --since-time só tem precisão de segundos: as linhas do mesmo segundo já contadas são descartadas pelo horário
+        since_time = checkpoint[:19] + "Z"
+        since = tail = None
+    consumed = {"timestamp": checkpoint}
+    command = build_logs_command(namespace, pod_name, since=since, tail=tail, since_time=since_time, timestamps=True)
+    chunks = stream_command(command, cluster=cluster, timeout=timeout)
+    counts = count_patterns_in_stream(strip_log_timestamps(chunks, after=checkpoint, consumed=consumed), patterns)
+    return counts, consumed["timestamp"]
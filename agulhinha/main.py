@@ -1,44 +1,158 @@
 import argparse
-import json
-import csv
+import io
 import os
-import tarfile
-from pod_processor import process_pods
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pod_processor import process_pods, DEFAULT_POD_WORKERS
+from pod_listing import list_pods, pod_matches, is_label_selector, matches_label_selector
 from node_processor import process_nodes
-from report_utils import append_final_report_to_csv
+from report_utils import REPORT_HEADER, QueueRowWriter, ReportStreamWriter
+from columnar_export import ColumnarReportWriter, EXPORT_FORMAT
 from cluster_utils import login_to_cluster
-from command_utils import run_command
+from command_utils import configure_rate_limit, configure_backend, COMMAND_BACKENDS, DEFAULT_RATE_LIMIT
+from log_utils import DEFAULT_ERROR_PATTERNS
+from state_store import StateStore
+from command_metrics import enable_command_metrics
+from exec_sessions import run_exec_command, enable_exec_sessions, DEFAULT_SESSION_IDLE_TIMEOUT
+from connectivity import run_probe_matrix, format_probe_matrix, DEFAULT_PROBE_WORKERS, DEFAULT_PROBE_TIMEOUT, DEFAULT_FAIL_STATUS
+from log_archive import write_logs_archive, build_pod_log_sources, DEFAULT_LOG_WORKERS, DEFAULT_LOG_TIMEOUT
 
-def generate_pods_report(clusters_arg, namespaces_arg, patterns_arg, username, password):
+# Número padrão de clusters processados em paralelo
+DEFAULT_CLUSTER_WORKERS = 8
+
+# Separador dos padrões de um mesmo cluster: a vírgula faz parte dos label selectors (ex: app=a,tier!=b)
+PATTERN_SEPARATOR = "|"
+
+def split_pattern_set(patterns_arg):
+    """
+    Separa os padrões de um cluster (um por namespace) por '|'. Sem '|', padrões de nome ainda podem ser
+    separados por vírgulas, mas um label selector é mantido inteiro
+    """
+    if PATTERN_SEPARATOR in patterns_arg or is_label_selector(patterns_arg):
+        return patterns_arg.split(PATTERN_SEPARATOR)
+    return patterns_arg.split(',')
+
+def split_report_args(clusters_arg, namespaces_arg, patterns_arg):
+    """
+    Separa os argumentos do relatório em uma lista de clusters e, para cada cluster, a lista de namespaces
+    e a lista de padrões correspondentes
+    """
     clusters = clusters_arg.split(',')
-    namespaces = namespaces_arg.split(';')
-    patterns = patterns_arg.split(';')
+    namespaces = [ns_arg.split(',') for ns_arg in namespaces_arg.split(';')]
+    patterns = [split_pattern_set(pattern_arg) for pattern_arg in patterns_arg.split(';')]
 
     if len(clusters) != len(namespaces) or len(namespaces) != len(patterns):
         raise ValueError("Erro: O número de clusters, namespaces e padrões de pods deve ser igual.")
+    for cluster_name, ns_list, pattern_list in zip(clusters, namespaces, patterns):
+        if len(ns_list) != len(pattern_list):
+            raise ValueError(f"Erro: O cluster {cluster_name} tem {len(ns_list)} namespaces e {len(pattern_list)} padrões de pods "
+                             f"(separe os padrões de um cluster com '{PATTERN_SEPARATOR}').")
+        for pattern in pattern_list:
+            if is_label_selector(pattern):
+                # Um label selector mal formado é recusado aqui, e não no meio do relatório
+                matches_label_selector({}, pattern)
+    return clusters, namespaces, patterns
+
+def process_cluster(cluster_name, ns_list, pattern_list, username, password, row_writer, **pod_options):
+    """
+    Processa os pods e nodes de um cluster. As linhas do CSV vão para row_writer à medida que cada pod
+    é concluído; o relatório final do cluster é acumulado e entregue ao row_writer no fim
+    """
+    final_report_buffer = io.StringIO()
+    try:
+        # Login no cluster com o mesmo username e password para todos os clusters
+        cluster_name = login_to_cluster(cluster_name, username, password)
 
-    csv_file = "pods_status.csv"
-    final_report_file_name = "final_report.tmp"
+        progress = pod_options.get("progress")
+        for j, ns in enumerate(ns_list):
+            process_pods(cluster_name, ns, pattern_list[j], row_writer, final_report_buffer, **pod_options)
+            if progress:
+                progress.add("namespaces_done")
 
-    with open(csv_file, mode="w", newline='') as csv_f, open(final_report_file_name, mode="w") as final_report_f:
-        csv_writer = csv.writer(csv_f, delimiter=';')
-        csv_writer.writerow(["Cluster", "Namespace", "Pod Name", "Status", "Creation Time", "Recent Change", "Error Count",
-                             "CPU Usage", "Memory Usage", "CPU Request", "Memory Request", "CPU Limit", "Memory Limit", "Tag",
-                             "CPU Usage vs Limit", "Memory Usage vs Limit", "HPA Enabled", "HPA Min Replicas",
-                             "HPA Max Replicas", "HPA Current Replicas", "HPA CPU Target", "HPA CPU Current", "Restart Count"])
+        process_nodes(cluster_name, row_writer, final_report_buffer, timeout=pod_options.get("command_timeout"))
+        if progress:
+            progress.add("clusters_done")
+    except Exception as e:
+        row_writer.fail(e)
+        return
+    row_writer.finish(final_report_buffer.getvalue())
 
+def run_pods_report(report_writer, clusters_arg, namespaces_arg, patterns_arg, username, password,
+                    max_workers=DEFAULT_CLUSTER_WORKERS, **pod_options):
+    """
+    Processa os clusters em paralelo e entrega as linhas de pods e nodes ao report_writer (writerecord, flush e finish)
+    na ordem dos clusters informada, assim que cada pod é processado. As opções extras (error_patterns, log_since,
+    log_tail, pod_workers, command_timeout, state_store, inventory, progress) são repassadas para process_pods
+    """
+    clusters, namespaces, patterns = split_report_args(clusters_arg, namespaces_arg, patterns_arg)
+
+    progress = pod_options.get("progress")
+    if progress:
+        progress.add("clusters_total", len(clusters))
+        progress.add("namespaces_total", sum(len(ns_list) for ns_list in namespaces))
+
+    cancelled = threading.Event()
+    row_writers = [QueueRowWriter(cancelled) for _ in clusters]
+    # Cada cluster usa seu próprio kubeconfig, então podem ser processados em paralelo
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(clusters))), thread_name_prefix="cluster")
+    try:
         for i, cluster_name in enumerate(clusters):
-            # Login no cluster com o mesmo username e password para todos os clusters
-            login_to_cluster(cluster_name, username, password)
+            executor.submit(process_cluster, cluster_name, namespaces[i], patterns[i], username, password, row_writers[i], **pod_options)
+
+        final_reports = []
+        # O primeiro cluster é entregue enquanto é processado; os demais ficam na fila até chegar a sua vez
+        for row_writer in row_writers:
+            while True:
+                # Antes de esperar pela próxima linha, envia o que já foi gerado
+                if row_writer.rows.empty():
+                    report_writer.flush()
+                kind, value = row_writer.rows.get()
+                if kind == "row":
+                    report_writer.writerecord(*value)
+                elif kind == "error":
+                    raise value
+                else:
+                    final_reports.append(value)
+                    break
 
-            ns_list = namespaces[i].split(',')
-            pattern_list = patterns[i].split(',')
-            for j, ns in enumerate(ns_list):
-                process_pods(cluster_name, ns, pattern_list[j], csv_writer, final_report_f)
+        report_writer.finish("".join(final_reports))
+    finally:
+        # Em caso de erro (ex: cliente desconectou) interrompe os clusters que ainda estão em andamento
+        cancelled.set()
+        executor.shutdown(wait=False)
+
+def write_pods_report(fileobj, clusters_arg, namespaces_arg, patterns_arg, username, password, **report_options):
+    """
+    Escreve o relatório CSV de pods e nodes em fileobj (binário) em streaming: cada linha é enviada
+    assim que o pod é processado e o relatório final é anexado no fim
+    """
+    report_writer = ReportStreamWriter(fileobj)
+    report_writer.writerow(REPORT_HEADER)
+    run_pods_report(report_writer, clusters_arg, namespaces_arg, patterns_arg, username, password, **report_options)
+
+def export_pods_report(output_dir, clusters_arg, namespaces_arg, patterns_arg, username, password, **report_options):
+    """
+    Exporta o relatório em tabelas colunares (pods e nodes) particionadas por data em output_dir
+    """
+    report_writer = ColumnarReportWriter(output_dir)
+    try:
+        run_pods_report(report_writer, clusters_arg, namespaces_arg, patterns_arg, username, password, **report_options)
+    finally:
+        report_writer.close()
 
-            process_nodes(cluster_name, csv_writer, final_report_f)
+    for path in report_writer.paths:
+        print(f"Relatório exportado em: {path}")
+    return report_writer.paths
 
-    append_final_report_to_csv(csv_file, final_report_file_name)
+def generate_pods_report(clusters_arg, namespaces_arg, patterns_arg, username, password, max_workers=DEFAULT_CLUSTER_WORKERS,
+                         csv_file="pods_status.csv", **pod_options):
+    """
+    Gera o relatório de pods e nodes dos clusters no arquivo csv_file
+    """
+    with open(csv_file, mode="wb") as csv_f:
+        write_pods_report(csv_f, clusters_arg, namespaces_arg, patterns_arg, username, password,
+                          max_workers=max_workers, **pod_options)
 
     print(f"Relatório final gerado no CSV: {csv_file}")
     return csv_file
@@ -49,62 +163,164 @@ def test_connectivity_in_pod(cluster, namespace, pod_name, url):
     """
     print(f"Testando conectividade no pod {pod_name} no cluster {cluster} para a URL {url}")
 
-    # Muda para o contexto do cluster especificado
-    run_command(f"oc config use-context {cluster}")
-
-    # Executa o comando curl dentro do pod
+    # Executa o comando curl dentro do pod usando o kubeconfig do cluster (por uma sessão persistente, quando ativadas)
     try:
-        result = run_command(f"oc exec -n {namespace} {pod_name} -- curl -v {url}")
+        result = run_exec_command(cluster, namespace, pod_name, f"curl -v {url}")
         return result
     except RuntimeError as e:
         return f"Erro ao executar curl no pod {pod_name}: {str(e)}"
 
-def collect_logs_from_pods(cluster, namespace, pattern, username, password):
+def probe_connectivity_from_pods(cluster, namespace, pattern, urls, username, password, **probe_options):
     """
-    Coleta os logs de todos os pods que correspondem ao padrão no workload e compacta em um arquivo .tar.gz
+    Testa cada URL a partir de todas as réplicas que correspondem ao padrão e retorna a matriz pods x URLs.
+    As opções extras (max_workers, timeout, container, inventory) são repassadas para run_probe_matrix
+    """
+    cluster = login_to_cluster(cluster, username, password)
+    return run_probe_matrix(cluster, namespace, pattern, urls, **probe_options)
+
+def stream_logs_from_pods(fileobj, cluster, namespace, pattern, username, password, inventory=None, progress=None,
+                          max_workers=DEFAULT_LOG_WORKERS, timeout=DEFAULT_LOG_TIMEOUT, **log_options):
+    """
+    Escreve em fileobj, em streaming, um .tar.gz com os logs de todos os pods que correspondem ao padrão no workload.
+    Cada log é lido para um SpooledTemporaryFile, que fica em memória até LOG_SPOOL_MEMORY bytes e passa para o disco
+    acima disso, com no máximo max_workers × LOGS_AHEAD_PER_WORKER logs lidos à frente da escrita do arquivo compactado.
+    As opções extras (since, tail, previous, container, all_containers) são repassadas para build_pod_log_sources
     """
     # Muda para o contexto do cluster especificado
-    login_to_cluster(cluster, username, password)
+    cluster = login_to_cluster(cluster, username, password)
 
-    # Cria diretório temporário para armazenar os logs
-    log_dir = f"{cluster}_{namespace}_logs"
-    os.makedirs(log_dir, exist_ok=True)
+    # Obtém a lista de pods no namespace (do inventário, quando ativo) que correspondem ao padrão do workload
+    if inventory:
+        pod_items = [pod for pod in inventory.get(cluster, namespace).list("pods") if pod_matches(pod, pattern)]
+    else:
+        pod_items = list_pods(cluster, namespace, pattern)
 
-    # Obtém a lista de pods no namespace que correspondem ao padrão do workload
-    pod_list = run_command(f"oc get pods -n {namespace} -o json")
-    pod_list_json = json.loads(pod_list)
+    if progress:
+        progress.add("clusters_total")
+        progress.add("namespaces_total")
+        progress.add("pods_total", len(pod_items))
 
-    log_files = []
-    for pod in pod_list_json["items"]:
-        pod_name = pod["metadata"]["name"]
-        if pattern not in pod_name:
-            continue
+    write_logs_archive(fileobj, cluster, build_pod_log_sources(namespace, pod_items, **log_options),
+                       max_workers=max_workers, timeout=timeout, progress=progress)
 
-        # Coleta os logs do pod
-        logs = run_command(f"oc logs -n {namespace} {pod_name}")
+    if progress:
+        progress.add("namespaces_done")
+        progress.add("clusters_done")
 
-        # Salva os logs em um arquivo de texto dentro do diretório de logs
-        log_file_path = os.path.join(log_dir, f"{pod_name}.log")
-        with open(log_file_path, "w") as log_file:
-            log_file.write(logs)
-        log_files.append(log_file_path)
+def collect_logs_from_pods(cluster, namespace, pattern, username, password, inventory=None, output_dir=".", progress=None,
+                           **log_options):
+    """
+    Coleta os logs de todos os pods que correspondem ao padrão no workload e compacta em um arquivo .tar.gz
+    """
+    tar_file_path = os.path.join(output_dir, f"{cluster}_{namespace}_logs-{pattern}.tar.gz")
+    with open(tar_file_path, "wb") as tar_file:
+        stream_logs_from_pods(tar_file, cluster, namespace, pattern, username, password, inventory=inventory,
+                              progress=progress, **log_options)
+    return tar_file_path
 
-    # Compacta todos os arquivos de log em um único arquivo .tar.gz
-    tar_file_path = f"{log_dir}-{pattern}.tar.gz"
-    with tarfile.open(tar_file_path, "w:gz") as tar:
-        for log_file in log_files:
-            tar.add(log_file, arcname=os.path.basename(log_file))
+def collect_logs_from_clusters(clusters_arg, namespaces_arg, patterns_arg, username, password, **log_options):
+    """
+    Coleta os logs de cada conjunto cluster/namespace/padrão (mesmo formato de argumentos do relatório),
+    gerando um .tar.gz por namespace
+    """
+    clusters, namespaces, patterns = split_report_args(clusters_arg, namespaces_arg, patterns_arg)
 
-    return tar_file_path
+    tar_files = []
+    for i, cluster_name in enumerate(clusters):
+        for j, ns in enumerate(namespaces[i]):
+            tar_file_path = collect_logs_from_pods(cluster_name, ns, patterns[i][j], username, password, **log_options)
+            print(f"Logs coletados em: {tar_file_path}")
+            tar_files.append(tar_file_path)
+    return tar_files
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Script para coletar informações de pods e nodes em clusters OpenShift.")
     parser.add_argument("-c", "--clusters", required=True, help="Lista de nomes dos clusters, separados por vírgulas (ex: cluster1,cluster2)")
     parser.add_argument("-n", "--namespaces", required=True, help="Lista de namespaces, separados por ponto e vírgula (um conjunto por cluster)")
-    parser.add_argument("-p", "--patterns", required=True, help="Lista de padrões de nomes de pods, separados por ponto e vírgula (um conjunto por cluster)")
-    parser.add_argument("-u", "--username", required=True, help="Username para login em todos os clusters")
-    parser.add_argument("-pw", "--password", required=True, help="Senha para login em todos os clusters")
+    parser.add_argument("-p", "--patterns", required=True, help="Lista de padrões de nomes de pods (ou label selectors como app=nome,tier!=cache), separados por ponto e vírgula "
+                        "(um conjunto por cluster, com os padrões de cada namespace separados por '|')")
+    parser.add_argument("-u", "--username", help="Username para login em todos os clusters (sem ele, usa os contextos já autenticados do kubeconfig)")
+    parser.add_argument("-pw", "--password", help="Senha para login em todos os clusters")
+    parser.add_argument("--error-patterns", default=",".join(DEFAULT_ERROR_PATTERNS), help="Padrões contados como erro nos logs, separados por vírgulas")
+    parser.add_argument("--log-since", help="Considera apenas logs mais recentes que a duração informada (ex: 15m, 1h)")
+    parser.add_argument("--log-tail", type=int, help="Considera apenas as últimas N linhas de log de cada pod")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_CLUSTER_WORKERS, help="Número máximo de clusters processados em paralelo")
+    parser.add_argument("--pod-workers", type=int, default=DEFAULT_POD_WORKERS, help="Número máximo de pods processados em paralelo em cada namespace")
+    parser.add_argument("--command-timeout", type=float, help="Tempo máximo, em segundos, de cada comando executado no cluster")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT, help="Máximo de comandos por segundo enviados a cada cluster (0 desativa)")
+    parser.add_argument("-o", "--output", default="pods_status.csv", help="Arquivo CSV gerado")
+    parser.add_argument("--export-dir", help=f"Em vez do CSV, exporta tabelas de pods e nodes particionadas por data neste diretório ({EXPORT_FORMAT})")
+    parser.add_argument("--state-db", help="Ativa o modo incremental, guardando o estado dos pods neste arquivo SQLite "
+                        "(a contagem de erros passa a ser acumulada desde a criação de cada pod)")
+    parser.add_argument("--backend", choices=COMMAND_BACKENDS, default="oc", help="Executa as consultas pelo binário oc ou diretamente pela API REST do cluster")
+    parser.add_argument("--metrics", action="store_true", help="Ao final, mostra tempo, chamadas, falhas e bytes dos comandos por verbo e por cluster")
+    parser.add_argument("--probe-urls", help="Em vez do relatório, testa as URLs (separadas por vírgulas) a partir de cada pod e mostra a matriz pods x URLs")
+    parser.add_argument("--probe-workers", type=int, default=DEFAULT_PROBE_WORKERS, help="No teste de conectividade, número de execs em paralelo")
+    parser.add_argument("--probe-timeout", type=float, default=DEFAULT_PROBE_TIMEOUT, help="No teste de conectividade, tempo máximo, em segundos, de cada requisição")
+    parser.add_argument("--probe-fail-status", type=int, default=DEFAULT_FAIL_STATUS, help="No teste de conectividade, códigos HTTP a partir deste são contados como falha")
+    parser.add_argument("--probe-rounds", type=int, default=1, help="No teste de conectividade, número de rodadas de testes")
+    parser.add_argument("--probe-interval", type=float, default=1, help="No teste de conectividade, intervalo, em segundos, entre o início de duas rodadas")
+    parser.add_argument("--collect-logs", action="store_true", help="Em vez do relatório, coleta os logs dos pods em um .tar.gz por namespace")
+    parser.add_argument("--previous", action="store_true", help="Na coleta de logs, usa os logs da execução anterior dos containers")
+    parser.add_argument("--container", help="Na coleta de logs ou no teste de conectividade, usa apenas o container informado")
+    parser.add_argument("--all-containers", action="store_true", help="Na coleta de logs, coleta todos os containers de cada pod")
+    parser.add_argument("--log-workers", type=int, default=DEFAULT_LOG_WORKERS, help="Na coleta de logs, número de logs lidos em paralelo")
+    parser.add_argument("--log-timeout", type=float, default=DEFAULT_LOG_TIMEOUT, help="Na coleta de logs, tempo máximo, em segundos, para ler o log de cada container")
     args = parser.parse_args()
+    # No modo incremental a contagem é acumulada a partir do log completo; uma janela só valeria na primeira execução
+    if args.state_db and (args.log_since or args.log_tail is not None):
+        parser.error("--log-since e --log-tail não podem ser usados com --state-db")
+
+    configure_rate_limit(args.rate_limit)
+    configure_backend(args.backend)
+    command_metrics = enable_command_metrics() if args.metrics else None
+
+    if args.probe_urls:
+        clusters, namespaces, patterns = split_report_args(args.clusters, args.namespaces, args.patterns)
+        # As rodadas reaproveitam um shell por pod em vez de abrir um novo 'oc exec' a cada teste
+        enable_exec_sessions(idle_timeout=max(DEFAULT_SESSION_IDLE_TIMEOUT, 2 * args.probe_interval))
+        for probe_round in range(args.probe_rounds):
+            round_started = time.monotonic()
+            if args.probe_rounds > 1:
+                print(f"Rodada {probe_round + 1}/{args.probe_rounds} ({time.strftime('%H:%M:%S')})")
+            for i, cluster_name in enumerate(clusters):
+                for j, ns in enumerate(namespaces[i]):
+                    probe_matrix = probe_connectivity_from_pods(cluster_name, ns, patterns[i][j], args.probe_urls.split(','),
+                                                                args.username, args.password, max_workers=args.probe_workers,
+                                                                timeout=args.probe_timeout, container=args.container,
+                                                                fail_status=args.probe_fail_status)
+                    print(format_probe_matrix(probe_matrix))
+            if probe_round + 1 < args.probe_rounds:
+                time.sleep(max(0, args.probe_interval - (time.monotonic() - round_started)))
+        if command_metrics:
+            print(command_metrics.format_report())
+        raise SystemExit(0)
+
+    if args.collect_logs:
+        try:
+            collect_logs_from_clusters(args.clusters, args.namespaces, args.patterns, args.username, args.password,
+                                       since=args.log_since, tail=args.log_tail, previous=args.previous, container=args.container,
+                                       all_containers=args.all_containers, max_workers=args.log_workers, timeout=args.log_timeout)
+        finally:
+            if command_metrics:
+                print(command_metrics.format_report())
+        raise SystemExit(0)
+
+    state_store = StateStore(args.state_db) if args.state_db else None
 
     # Chama a função com os argumentos fornecidos
-    generate_pods_report(args.clusters, args.namespaces, args.patterns, args.username, args.password)
+    report_options = dict(error_patterns=args.error_patterns.split(','), log_since=args.log_since, log_tail=args.log_tail,
+                          max_workers=args.max_workers, pod_workers=args.pod_workers, command_timeout=args.command_timeout,
+                          state_store=state_store)
+    try:
+        if args.export_dir:
+            export_pods_report(args.export_dir, args.clusters, args.namespaces, args.patterns, args.username, args.password,
+                               **report_options)
+        else:
+            generate_pods_report(args.clusters, args.namespaces, args.patterns, args.username, args.password,
+                                 csv_file=args.output, **report_options)
+    finally:
+        if state_store:
+            state_store.close()
+        if command_metrics:
+            print(command_metrics.format_report())
@@ -1,11 +1,79 @@
+import heapq
+import json
 from command_utils import run_command
+from pod_listing import list_pods
+from pod_processor import get_pod_metrics, compute_pod_resources
+from report_utils import NODE_HEADER
+from quantity_utils import (parse_quantity, parse_quantities, sum_quantities, usage_ratio, to_millicores, to_bytes, format_cpu,
+                            format_memory, format_percent)
 
-def process_nodes(cluster, csv_writer, final_report_file):
+# Quantidade de pods que mais consomem CPU e memória listados em cada node
+TOP_CONSUMERS_PER_NODE = 5
+# Percentual de requests ou limits sobre o allocatable a partir do qual o node entra no relatório final
+NODE_OVERCOMMIT_THRESHOLD = 100
+# Pods finalizados não ocupam recursos do node e ficam fora do detalhamento
+ACTIVE_PODS_SELECTOR = "status.phase!=Succeeded,status.phase!=Failed"
+
+def get_node_allocatable(cluster, timeout=None):
+    """
+    Obtém o allocatable de CPU (cores) e memória (bytes) de todos os nodes com uma única listagem
+    """
+    nodes = json.loads(run_command("oc get --raw '/api/v1/nodes'", cluster=cluster, timeout=timeout))["items"]
+    allocatable = [node["status"].get("allocatable", {}) for node in nodes]
+    cpu_values = parse_quantities([node_allocatable.get("cpu") for node_allocatable in allocatable])
+    memory_values = parse_quantities([node_allocatable.get("memory") for node_allocatable in allocatable])
+    return {node["metadata"]["name"]: (cpu, memory) for node, cpu, memory in zip(nodes, cpu_values, memory_values)}
+
+def build_node_breakdown(pods, pod_resources):
+    """
+    Agrupa os pods pelo node em que estão agendados, somando uso, requests e limits.
+    Containers sem limit não entram na soma de limits do node (como no 'oc describe node')
+    """
+    breakdown = {}
+    for pod in pods:
+        node_name = pod["spec"].get("nodeName")
+        if not node_name:
+            continue
+        pod_key = (pod["metadata"].get("namespace"), pod["metadata"]["name"])
+        resources = pod_resources.get(pod_key)
+        if resources is None:
+            continue
+        node = breakdown.setdefault(node_name, {"pods": 0, "cpu_request": 0.0, "memory_request": 0.0,
+                                                "cpu_limit": 0.0, "memory_limit": 0.0, "consumers": []})
+        node["pods"] += 1
+        node["cpu_request"] += resources["cpu_request"] or 0
+        node["memory_request"] += resources["memory_request"] or 0
+        node["cpu_limit"] += sum_quantities(container["cpu_limit"] for container in resources["containers"]) or 0
+        node["memory_limit"] += sum_quantities(container["memory_limit"] for container in resources["containers"]) or 0
+        node["consumers"].append((f"{pod_key[0]}/{pod_key[1]}", resources["cpu_usage"], resources["memory_usage"]))
+    return breakdown
+
+def get_node_breakdown(cluster, timeout=None):
+    """
+    Cruza uma listagem de pods de todos os namespaces com um único snapshot de métricas de todos os pods,
+    sem comandos por pod. Retorna o detalhamento por node e o allocatable de cada node
+    """
+    pods = list_pods(cluster, None, timeout=timeout, field_selector=ACTIVE_PODS_SELECTOR)
+    pod_resources = compute_pod_resources(pods, get_pod_metrics(cluster, None, timeout=timeout))
+    return build_node_breakdown(pods, pod_resources), get_node_allocatable(cluster, timeout=timeout)
+
+def format_top_consumers(consumers, index, format_value):
+    ranked = heapq.nlargest(TOP_CONSUMERS_PER_NODE, (consumer for consumer in consumers if consumer[index] is not None),
+                            key=lambda consumer: consumer[index])
+    return ", ".join(f"{consumer[0]} ({format_value(consumer[index])})" for consumer in ranked)
+
+def process_nodes(cluster, csv_writer, final_report_file, timeout=None):
     print(f"Processando informacoes dos nodes para o cluster: {cluster}")
-    
-    run_command(f"oc config use-context {cluster}")
-    node_list = run_command("oc adm top nodes --no-headers --use-protocol-buffers")
-    
+
+    node_list = run_command("oc adm top nodes --no-headers --use-protocol-buffers", cluster=cluster, timeout=timeout)
+
+    # Sem permissão para listar pods de todos os namespaces, os nodes são reportados apenas com os totais
+    try:
+        breakdown, allocatable = get_node_breakdown(cluster, timeout=timeout)
+    except (RuntimeError, ValueError, KeyError) as e:
+        print(f"Nao foi possivel detalhar os pods por node no cluster {cluster}: {str(e)}")
+        breakdown, allocatable = {}, {}
+
     for line in node_list.splitlines():
         node_data = line.split()
         node_name = node_data[0]
@@ -17,4 +85,49 @@ def process_nodes(cluster, csv_writer, final_report_file):
         if int(node_cpu_percent.strip('%')) >= 80 or int(node_memory_percent.strip('%')) >= 80:
             final_report_file.write(f"{cluster}|{node_name} -> CPU: {node_cpu_percent}, Memory: {node_memory_percent}\n")
 
-        csv_writer.writerow([cluster, node_name, node_cpu_usage, node_cpu_percent, node_memory_usage, node_memory_percent])
+        row = [cluster, node_name, node_cpu_usage, node_cpu_percent, node_memory_usage, node_memory_percent]
+        # Registro tipado para a exportação colunar, a partir da saída do 'oc adm top' e das somas já calculadas
+        record = {
+            "cluster": cluster, "node_name": node_name,
+            "cpu_usage_millicores": to_millicores(parse_quantity(node_cpu_usage)), "cpu_percent": int(node_cpu_percent.strip('%')),
+            "memory_usage_bytes": to_bytes(parse_quantity(node_memory_usage)), "memory_percent": int(node_memory_percent.strip('%')),
+        }
+        node = breakdown.get(node_name)
+        if node is None:
+            csv_writer.writerecord("nodes", row + ["N/A"] * (len(NODE_HEADER) - len(row)), record)
+            continue
+
+        cpu_allocatable, memory_allocatable = allocatable.get(node_name, (None, None))
+        commitments = {
+            "CPU requests": usage_ratio(node["cpu_request"], cpu_allocatable),
+            "Memory requests": usage_ratio(node["memory_request"], memory_allocatable),
+            "CPU limits": usage_ratio(node["cpu_limit"], cpu_allocatable),
+            "Memory limits": usage_ratio(node["memory_limit"], memory_allocatable),
+        }
+        for commitment, percent in commitments.items():
+            if percent is not None and percent > NODE_OVERCOMMIT_THRESHOLD:
+                final_report_file.write(f"{cluster}|{node_name} -> {commitment}: {percent:.0f}% do allocatable\n")
+
+        top_cpu_pods = format_top_consumers(node["consumers"], 1, format_cpu)
+        top_memory_pods = format_top_consumers(node["consumers"], 2, format_memory)
+        record.update({
+            "cpu_allocatable_millicores": to_millicores(cpu_allocatable), "memory_allocatable_bytes": to_bytes(memory_allocatable),
+            "pods": node["pods"],
+            "cpu_requests_millicores": to_millicores(node["cpu_request"]),
+            "cpu_requests_vs_allocatable_percent": commitments["CPU requests"],
+            "memory_requests_bytes": to_bytes(node["memory_request"]),
+            "memory_requests_vs_allocatable_percent": commitments["Memory requests"],
+            "cpu_limits_millicores": to_millicores(node["cpu_limit"]),
+            "cpu_limits_vs_allocatable_percent": commitments["CPU limits"],
+            "memory_limits_bytes": to_bytes(node["memory_limit"]),
+            "memory_limits_vs_allocatable_percent": commitments["Memory limits"],
+            "top_cpu_pods": top_cpu_pods or None, "top_memory_pods": top_memory_pods or None,
+        })
+        csv_writer.writerecord("nodes", row + [
+            format_cpu(cpu_allocatable), format_memory(memory_allocatable), node["pods"],
+            format_cpu(node["cpu_request"]), format_percent(commitments["CPU requests"]),
+            format_memory(node["memory_request"]), format_percent(commitments["Memory requests"]),
+            format_cpu(node["cpu_limit"]), format_percent(commitments["CPU limits"]),
+            format_memory(node["memory_limit"]), format_percent(commitments["Memory limits"]),
+            top_cpu_pods, top_memory_pods,
+        ], record)
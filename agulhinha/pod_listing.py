@@ -0,0 +1,134 @@
+import json
+import re
+import shlex
+import urllib.parse
+from command_utils import run_command
+
+# Quantidade de pods pedida por página na listagem paginada
+POD_LIST_PAGE_SIZE = 500
+# Requisitos que só existem em label selectors: negação de existência (!tier) e conjuntos (tier in (a,b), tier notin (a))
+SET_SELECTOR_RE = re.compile(r"(^|,)\s*!|\s(in|notin)\s*\(")
+# Um requisito do label selector, no formato aceito pelo servidor
+LABEL_REQUIREMENT_RE = re.compile(
+    r"\s*(?:(?P<absent>!)\s*(?P<absent_key>[\w./-]+)"
+    r"|(?P<key>[\w./-]+)\s*(?:(?P<operator>==|=|!=)\s*(?P<value>[\w.-]*)"
+    r"|\s(?P<set_operator>in|notin)\s*\((?P<values>[^()]*)\))?)\s*"
+)
+
+def is_label_selector(pattern):
+    """
+    Padrões com '=' (ex: app=minha-api,tier!=cache) ou com requisitos de conjunto (ex: tier in (web,api), !canary)
+    são tratados como label selector e filtrados pelo servidor; os demais continuam sendo uma parte do nome do pod
+    """
+    return "=" in pattern or bool(SET_SELECTOR_RE.search(pattern))
+
+def split_label_selector(selector):
+    """
+    Separa os requisitos do selector pelas vírgulas que não estão dentro de um conjunto (ex: tier in (a,b))
+    """
+    requirements = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(selector):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            requirements.append(selector[start:i])
+            start = i + 1
+    requirements.append(selector[start:])
+    return requirements
+
+def matches_label_selector(labels, selector):
+    """
+    Avalia o label selector localmente com a mesma semântica do servidor (=, ==, !=, in, notin, existência e !).
+    Lança ValueError para um selector mal formado
+    """
+    for requirement in split_label_selector(selector):
+        if not requirement.strip():
+            continue
+        match = LABEL_REQUIREMENT_RE.fullmatch(requirement)
+        if not match:
+            raise ValueError(f"Requisito de label selector inválido: '{requirement.strip()}'")
+        if match.group("absent"):
+            if match.group("absent_key") in labels:
+                return False
+            continue
+        key = match.group("key")
+        if match.group("operator") == "!=":
+            if labels.get(key) == match.group("value"):
+                return False
+        elif match.group("operator"):
+            if labels.get(key) != match.group("value"):
+                return False
+        elif match.group("set_operator"):
+            values = {value.strip() for value in match.group("values").split(",")}
+            if (labels.get(key) in values) != (match.group("set_operator") == "in"):
+                return False
+        elif key not in labels:
+            return False
+    return True
+
+def pod_matches(pod, pattern):
+    if is_label_selector(pattern):
+        return matches_label_selector(pod["metadata"].get("labels", {}), pattern)
+    return pattern in pod["metadata"]["name"]
+
+def project_pod(pod):
+    """
+    Mantém apenas os campos do pod usados pelos relatórios e pela coleta de logs
+    """
+    metadata = pod["metadata"]
+    spec = pod.get("spec", {})
+    status = pod.get("status", {})
+    return {
+        "metadata": {
+            "name": metadata["name"],
+            "namespace": metadata.get("namespace"),
+            "uid": metadata.get("uid"),
+            "resourceVersion": metadata.get("resourceVersion"),
+            "creationTimestamp": metadata.get("creationTimestamp"),
+            "labels": metadata.get("labels", {}),
+            "ownerReferences": metadata.get("ownerReferences", []),
+        },
+        "spec": {
+            "nodeName": spec.get("nodeName"),
+            "containers": [
+                {"name": container["name"], "image": container.get("image", ""), "resources": container.get("resources", {})}
+                for container in spec.get("containers", [])
+            ],
+        },
+        "status": {
+            "phase": status.get("phase"),
+            "containerStatuses": [
+                {"name": container_status["name"], "restartCount": container_status.get("restartCount", 0)}
+                for container_status in status.get("containerStatuses", [])
+            ],
+        },
+    }
+
+def list_pods(cluster, namespace, pattern="", timeout=None, page_size=POD_LIST_PAGE_SIZE, field_selector=None):
+    """
+    Lista os pods do namespace (ou de todos os namespaces, com namespace=None) que correspondem ao padrão,
+    página por página (limit/continue). Label e field selectors são enviados ao servidor e cada página é
+    reduzida aos campos usados antes da próxima ser buscada, então a memória cresce com os pods selecionados
+    e não com o namespace
+    """
+    params = {"limit": page_size}
+    if pattern and is_label_selector(pattern):
+        params["labelSelector"] = pattern
+    if field_selector:
+        params["fieldSelector"] = field_selector
+    base_path = f"/api/v1/namespaces/{urllib.parse.quote(namespace, safe='')}/pods" if namespace else "/api/v1/pods"
+
+    pods = []
+    while True:
+        path = f"{base_path}?{urllib.parse.urlencode(params)}"
+        page = json.loads(run_command(f"oc get --raw {shlex.quote(path)}", cluster=cluster, timeout=timeout))
+        pods.extend(project_pod(pod) for pod in page["items"] if pod_matches(pod, pattern))
+
+        continue_token = page.get("metadata", {}).get("continue")
+        if not continue_token:
+            return pods
+        params["continue"] = continue_token
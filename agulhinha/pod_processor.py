@@ -1,110 +1,325 @@
 import json
+import shlex
 import time
-from datetime import datetime
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from command_utils import run_command
+from log_utils import count_new_log_errors
+from quantity_utils import (parse_quantities, sum_quantities, usage_ratio, to_millicores, to_bytes, format_cpu, format_memory,
+                            format_percent)
+from pod_listing import list_pods, pod_matches
 
-def find_deployment_for_pod(pod, namespace):
-    owner_references = pod["metadata"].get("ownerReferences", [])
-    for owner in owner_references:
+# Número padrão de pods processados em paralelo em cada namespace
+DEFAULT_POD_WORKERS = 8
+# Percentual de uso sobre o limit a partir do qual o container entra no relatório final
+USAGE_ALERT_THRESHOLD = 80
+
+# Controladores intermediarios e o workload que normalmente os possui
+OWNER_CONTROLLERS = {
+    "ReplicaSet": "replicasets",
+    "ReplicationController": "replicationcontrollers",
+}
+
+def get_controller_owner(resource):
+    for owner in resource["metadata"].get("ownerReferences", []):
         if owner.get("controller", False):
-            owner_kind = owner["kind"]
-            owner_name = owner["name"]
-            if owner_kind == "ReplicaSet":
-                # Get the ReplicaSet and find its owner
-                rs_json = run_command(f"oc get replicaset {owner_name} -n {namespace} -o json")
-                rs = json.loads(rs_json)
-                rs_owner_references = rs["metadata"].get("ownerReferences", [])
-                for rs_owner in rs_owner_references:
-                    if rs_owner.get("controller", False):
-                        rs_owner_kind = rs_owner["kind"]
-                        rs_owner_name = rs_owner["name"]
-                        if rs_owner_kind == "Deployment":
-                            return rs_owner_name
-            elif owner_kind == "Deployment":
-                return owner_name
+            return owner["kind"], owner["name"]
     return None
 
-def process_pods(cluster, namespace, pattern, csv_writer, final_report_file):
+def index_owners(owner_index, kind, resources):
+    for resource in resources:
+        owner = get_controller_owner(resource)
+        if owner is None and kind == "ReplicationController":
+            # ReplicationControllers antigos do OpenShift so referenciam o DeploymentConfig por anotacao
+            dc_name = resource["metadata"].get("annotations", {}).get("openshift.io/deployment-config.name")
+            if dc_name:
+                owner = ("DeploymentConfig", dc_name)
+        if owner:
+            owner_index[(kind, resource["metadata"]["name"])] = owner
+
+def build_owner_index(cluster, namespace, timeout=None, namespace_inventory=None):
+    """
+    Lista uma única vez os ReplicaSets e ReplicationControllers do namespace (ou os lê do inventário)
+    e monta um índice (tipo, nome) -> (tipo, nome) do workload dono (Deployment, DeploymentConfig, ...)
+    """
+    owner_index = {}
+    for kind, resource_name in OWNER_CONTROLLERS.items():
+        if namespace_inventory:
+            index_owners(owner_index, kind, namespace_inventory.list(resource_name))
+            continue
+        try:
+            resource_list = json.loads(run_command(f"oc get {resource_name} -n {namespace} -o json", cluster=cluster, timeout=timeout))
+        except RuntimeError as e:
+            print(f"Nao foi possivel listar {resource_name} do namespace {namespace}: {str(e)}")
+            continue
+        index_owners(owner_index, kind, resource_list["items"])
+    return owner_index
+
+def find_workload_for_pod(pod, owner_index):
+    """
+    Resolve o workload (Deployment, DeploymentConfig, StatefulSet, ...) do pod a partir do índice de donos
+    """
+    owner = get_controller_owner(pod)
+    if owner is None:
+        return None
+    # Sobe a cadeia de donos (ex: Pod -> ReplicaSet -> Deployment) sem novas chamadas ao cluster
+    while owner in owner_index:
+        owner = owner_index[owner]
+    return owner
+
+def index_pod_metrics(metric_items):
+    """
+    Indexa os itens da API de métricas por (namespace, pod) -> {container: (cpu em cores, memória em bytes)}.
+    Todos os valores são convertidos em lote
+    """
+    entries = [(item["metadata"].get("namespace"), item["metadata"]["name"], container)
+               for item in metric_items for container in item.get("containers", [])]
+    cpu_values = parse_quantities([container["usage"].get("cpu") for _, _, container in entries])
+    memory_values = parse_quantities([container["usage"].get("memory") for _, _, container in entries])
+
+    pod_metrics = {}
+    for (namespace, pod_name, container), cpu, memory in zip(entries, cpu_values, memory_values):
+        pod_metrics.setdefault((namespace, pod_name), {})[container["name"]] = (cpu, memory)
+    return pod_metrics
+
+def get_pod_metrics(cluster, namespace, timeout=None):
+    """
+    Obtém as métricas por container de todos os pods do namespace (ou do cluster, com namespace=None)
+    com uma única chamada à API de métricas (a mesma usada pelo 'oc adm top pods')
+    """
+    if namespace:
+        path = f"/apis/metrics.k8s.io/v1beta1/namespaces/{urllib.parse.quote(namespace, safe='')}/pods"
+    else:
+        path = "/apis/metrics.k8s.io/v1beta1/pods"
+    try:
+        metrics = json.loads(run_command(f"oc get --raw {shlex.quote(path)}", cluster=cluster, timeout=timeout))
+    except (RuntimeError, ValueError) as e:
+        print(f"Nao foi possivel obter as metricas dos pods do namespace {namespace or 'todos'}: {str(e)}")
+        return {}
+    return index_pod_metrics(metrics.get("items", []))
+
+def compute_pod_resources(pods, pod_metrics):
+    """
+    Calcula, em lote para todos os pods (indexados por (namespace, pod)), o uso, os requests e limits somados de todos os containers
+    e os percentuais de uso sobre request e limit de cada container. As colunas de percentual do pod
+    mostram o container mais próximo do seu request/limit
+    """
+    containers = [(pod, container) for pod in pods for container in pod["spec"]["containers"]]
+    resources = [container.get("resources", {}) for _, container in containers]
+    cpu_requests = parse_quantities([resource.get("requests", {}).get("cpu") for resource in resources])
+    memory_requests = parse_quantities([resource.get("requests", {}).get("memory") for resource in resources])
+    cpu_limits = parse_quantities([resource.get("limits", {}).get("cpu") for resource in resources])
+    memory_limits = parse_quantities([resource.get("limits", {}).get("memory") for resource in resources])
+
+    pod_resources = {}
+    for (pod, container), cpu_request, memory_request, cpu_limit, memory_limit in zip(
+            containers, cpu_requests, memory_requests, cpu_limits, memory_limits):
+        pod_key = (pod["metadata"].get("namespace"), pod["metadata"]["name"])
+        pod_usage = pod_metrics.get(pod_key)
+        cpu_usage, memory_usage = (pod_usage or {}).get(container["name"], (None, None))
+        entry = pod_resources.setdefault(pod_key, {"has_metrics": pod_usage is not None, "containers": []})
+        entry["containers"].append({
+            "name": container["name"],
+            "cpu_usage": cpu_usage, "memory_usage": memory_usage,
+            "cpu_request": cpu_request, "memory_request": memory_request,
+            "cpu_limit": cpu_limit, "memory_limit": memory_limit,
+            "cpu_vs_request": usage_ratio(cpu_usage, cpu_request),
+            "memory_vs_request": usage_ratio(memory_usage, memory_request),
+            "cpu_vs_limit": usage_ratio(cpu_usage, cpu_limit),
+            "memory_vs_limit": usage_ratio(memory_usage, memory_limit),
+        })
+
+    for entry in pod_resources.values():
+        pod_containers = entry["containers"]
+        for field in ("cpu_usage", "memory_usage", "cpu_request", "memory_request"):
+            entry[field] = sum_quantities(container[field] for container in pod_containers)
+        # Basta um container sem limit para o pod não ter limite total
+        for field in ("cpu_limit", "memory_limit"):
+            limits = [container[field] for container in pod_containers]
+            entry[field] = sum(limits) if None not in limits else None
+        for field in ("cpu_vs_request", "memory_vs_request", "cpu_vs_limit", "memory_vs_limit"):
+            entry[field] = max((container[field] for container in pod_containers if container[field] is not None), default=None)
+        if not entry["has_metrics"]:
+            entry["cpu_usage"] = entry["memory_usage"] = None
+    return pod_resources
+
+def process_pod(cluster, namespace, pod, pod_resources, owner_index, hpa_targets, current_time,
+                error_patterns=None, log_since=None, log_tail=None, command_timeout=None, previous_state=None):
+    """
+    Processa um único pod e retorna a linha do CSV, o mesmo registro com valores tipados, as linhas do relatório final e o novo estado
+    do pod para o modo incremental. Quando previous_state corresponde ao mesmo resourceVersion,
+    o workload é reaproveitado e apenas os logs gerados após o último checkpoint são lidos
+    """
+    final_report_lines = []
+    pod_name = pod["metadata"]["name"]
+    resource_version = pod["metadata"].get("resourceVersion")
+    unchanged = previous_state is not None and previous_state["resource_version"] == resource_version
+
+    pod_status = pod["status"]["phase"]
+    creation_time = pod["metadata"]["creationTimestamp"]
+    creation_time_epoch = datetime.strptime(creation_time, "%Y-%m-%dT%H:%M:%SZ").timestamp()
+    time_diff = current_time - creation_time_epoch
+    recent_change = "Yes" if time_diff < 86400 else "No"
+
+    new_state = None
+    try:
+        if unchanged:
+            # Só as linhas com horário posterior à última linha contada na execução anterior
+            error_counts, log_checkpoint = count_new_log_errors(cluster, namespace, pod_name, previous_state["log_checkpoint"],
+                                                                patterns=error_patterns, timeout=command_timeout)
+            error_count = previous_state["error_count"] + sum(error_counts.values())
+        else:
+            error_counts, log_checkpoint = count_new_log_errors(cluster, namespace, pod_name, patterns=error_patterns, since=log_since,
+                                                                tail=log_tail, timeout=command_timeout)
+            error_count = sum(error_counts.values())
+    except RuntimeError as e:
+        # Um pod com logs inacessiveis ou lentos demais nao deve interromper o relatorio
+        print(f"Nao foi possivel ler os logs do pod {pod_name}: {str(e)}")
+        error_count = "N/A"
+
+    # Uso, requests e limits somados de todos os containers; pods sem metricas (ex: recem criados ou finalizados) sao reportados como N/A
+    resources = pod_resources[(pod["metadata"].get("namespace"), pod_name)]
+    for container in resources["containers"]:
+        for field, resource_name in (("cpu_vs_limit", "CPU"), ("memory_vs_limit", "Memory")):
+            if container[field] is not None and container[field] >= USAGE_ALERT_THRESHOLD:
+                final_report_lines.append(f"{cluster}|{namespace}|{pod_name}|{container['name']} -> {resource_name} {container[field]:.0f}% do limit\n")
+
+    containers = pod["spec"]["containers"]
+
+    # Extract the container image tag
+    image = containers[0]["image"]
+    if ':' in image:
+        tag = image.split(':')[-1]
+    else:
+        tag = 'latest'
+
+    # Find the owning workload (Deployment, DeploymentConfig, StatefulSet, ...)
+    if unchanged:
+        workload = previous_state["workload"]
+    else:
+        workload = find_workload_for_pod(pod, owner_index)
+    if workload:
+        # Check if there is an HPA targeting this workload
+        hpa_info = hpa_targets.get(workload, None)
+    else:
+        hpa_info = None
+
+    hpa_enabled = "No"
+    hpa_min_replicas = hpa_max_replicas = hpa_current_replicas = hpa_cpu_target = hpa_cpu_current = "N/A"
+
+    if hpa_info:
+        hpa_enabled = "Yes"
+        hpa_min_replicas = hpa_info["spec"].get("minReplicas", "N/A")
+        hpa_max_replicas = hpa_info["spec"].get("maxReplicas", "N/A")
+        hpa_current_replicas = hpa_info["status"].get("currentReplicas", "N/A")
+        hpa_cpu_target = hpa_info["spec"].get("targetCPUUtilizationPercentage", "N/A")
+        hpa_cpu_current = hpa_info["status"].get("currentCPUUtilizationPercentage", "N/A")
+        if hpa_cpu_current != "N/A" and int(hpa_cpu_current) >= 80:
+            final_report_lines.append(f"{cluster}|{namespace}|{pod_name} -> {hpa_cpu_current}%\n")
+
+    if pod_status != "Running":
+        final_report_lines.append(f"{cluster}|{namespace}|{pod_name} -> {pod_status}\n")
+
+    restart_count = pod["status"]["containerStatuses"][0]["restartCount"]
+    if restart_count > 0:
+        final_report_lines.append(f"{cluster}|{namespace}|{pod_name} -> {restart_count} reinicializacoes\n")
+
+    row = [
+        cluster, namespace, pod_name, pod_status, creation_time, recent_change, error_count,
+        format_cpu(resources["cpu_usage"]), format_memory(resources["memory_usage"]),
+        format_cpu(resources["cpu_request"]), format_memory(resources["memory_request"]),
+        format_cpu(resources["cpu_limit"]), format_memory(resources["memory_limit"]), tag,
+        format_percent(resources["cpu_vs_limit"]), format_percent(resources["memory_vs_limit"]),
+        hpa_enabled, hpa_min_replicas, hpa_max_replicas, hpa_current_replicas,
+        hpa_cpu_target, hpa_cpu_current, restart_count,
+        format_percent(resources["cpu_vs_request"]), format_percent(resources["memory_vs_request"])
+    ]
+
+    def optional_int(value):
+        return None if value == "N/A" else int(value)
+
+    record = {
+        "cluster": cluster, "namespace": namespace, "pod_name": pod_name, "status": pod_status,
+        "creation_time": datetime.strptime(creation_time, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc),
+        "recent_change": recent_change == "Yes", "error_count": optional_int(error_count),
+        "cpu_usage_millicores": to_millicores(resources["cpu_usage"]), "memory_usage_bytes": to_bytes(resources["memory_usage"]),
+        "cpu_request_millicores": to_millicores(resources["cpu_request"]), "memory_request_bytes": to_bytes(resources["memory_request"]),
+        "cpu_limit_millicores": to_millicores(resources["cpu_limit"]), "memory_limit_bytes": to_bytes(resources["memory_limit"]),
+        "tag": tag,
+        "cpu_usage_vs_limit_percent": resources["cpu_vs_limit"], "memory_usage_vs_limit_percent": resources["memory_vs_limit"],
+        "hpa_enabled": hpa_enabled == "Yes", "hpa_min_replicas": optional_int(hpa_min_replicas),
+        "hpa_max_replicas": optional_int(hpa_max_replicas), "hpa_current_replicas": optional_int(hpa_current_replicas),
+        "hpa_cpu_target_percent": optional_int(hpa_cpu_target), "hpa_cpu_current_percent": optional_int(hpa_cpu_current),
+        "restart_count": restart_count,
+        "cpu_usage_vs_request_percent": resources["cpu_vs_request"], "memory_usage_vs_request_percent": resources["memory_vs_request"],
+    }
+
+    if error_count != "N/A" and resource_version:
+        new_state = {"pod_name": pod_name, "resource_version": resource_version, "workload": workload,
+                     "error_count": error_count, "log_checkpoint": log_checkpoint or ""}
+    return row, record, final_report_lines, new_state
+
+def process_pods(cluster, namespace, pattern, csv_writer, final_report_file, error_patterns=None, log_since=None, log_tail=None,
+                 pod_workers=DEFAULT_POD_WORKERS, command_timeout=None, state_store=None, inventory=None, progress=None):
     print(f"Processando cluster: {cluster}, namespace: {namespace}, padrao: {pattern}")
-    
-    run_command(f"oc config use-context {cluster}")
-    hpa_list = run_command(f"oc get hpa -n {namespace} -o json")
-    hpa_list_json = json.loads(hpa_list)
+
+    # Com o inventario ativo, pods e HPAs sao lidos do cache mantido pelos watches
+    namespace_inventory = inventory.get(cluster, namespace, timeout=command_timeout) if inventory else None
+    if namespace_inventory:
+        hpa_items = namespace_inventory.list("hpa")
+        pod_items = namespace_inventory.list("pods")
+    else:
+        hpa_items = json.loads(run_command(f"oc get hpa -n {namespace} -o json", cluster=cluster, timeout=command_timeout))["items"]
+        pod_items = list_pods(cluster, namespace, pattern, timeout=command_timeout)
     current_time = time.time()
-    pod_list = run_command(f"oc get pods -n {namespace} -o json")
-    pod_list_json = json.loads(pod_list)
+    pod_metrics = get_pod_metrics(cluster, namespace, timeout=command_timeout)
 
     # Build a mapping from (kind, name) to HPA
     hpa_targets = {}
-    for hpa in hpa_list_json["items"]:
+    for hpa in hpa_items:
         scale_target_ref = hpa["spec"]["scaleTargetRef"]
         target_kind = scale_target_ref["kind"]
         target_name = scale_target_ref["name"]
         hpa_targets[(target_kind, target_name)] = hpa
 
-    for pod in pod_list_json["items"]:
-        pod_name = pod["metadata"]["name"]
-        if pattern not in pod_name:
-            continue
+    pods = [pod for pod in pod_items if pod_matches(pod, pattern)]
+    pod_resources = compute_pod_resources(pods, pod_metrics)
 
-        pod_status = pod["status"]["phase"]
-        creation_time = pod["metadata"]["creationTimestamp"]
-        creation_time_epoch = datetime.strptime(creation_time, "%Y-%m-%dT%H:%M:%SZ").timestamp()
-        time_diff = current_time - creation_time_epoch
-        recent_change = "Yes" if time_diff < 86400 else "No"
-
-        logs = run_command(f"oc logs -n {namespace} {pod_name}")
-        error_count = logs.count("ERRO")
-
-        resource_usage = run_command(f"oc adm top pod {pod_name} -n {namespace} --no-headers --use-protocol-buffers")
-        resource_usage_data = resource_usage.split()
-        cpu_usage = resource_usage_data[1]
-        memory_usage = resource_usage_data[2]
-
-        containers = pod["spec"]["containers"]
-        cpu_request = containers[0]["resources"].get("requests", {}).get("cpu", "N/A")
-        memory_request = containers[0]["resources"].get("requests", {}).get("memory", "N/A")
-        cpu_limit = containers[0]["resources"].get("limits", {}).get("cpu", "N/A")
-        memory_limit = containers[0]["resources"].get("limits", {}).get("memory", "N/A")
-
-        # Extract the container image tag
-        image = containers[0]["image"]
-        if ':' in image:
-            tag = image.split(':')[-1]
-        else:
-            tag = 'latest'
+    # No modo incremental, pods com o mesmo resourceVersion da execucao anterior reaproveitam o estado salvo
+    previous_states = state_store.load_namespace(cluster, namespace, pattern) if state_store else {}
+    def get_previous_state(pod):
+        return previous_states.get(pod["metadata"].get("uid"))
 
-        # Find the Deployment name
-        deployment_name = find_deployment_for_pod(pod, namespace)
-        if deployment_name:
-            # Check if there is an HPA targeting this deployment
-            hpa_info = hpa_targets.get(("Deployment", deployment_name), None)
-        else:
-            hpa_info = None
-
-        hpa_enabled = "No"
-        hpa_min_replicas = hpa_max_replicas = hpa_current_replicas = hpa_cpu_target = hpa_cpu_current = "N/A"
-
-        if hpa_info:
-            hpa_enabled = "Yes"
-            hpa_min_replicas = hpa_info["spec"].get("minReplicas", "N/A")
-            hpa_max_replicas = hpa_info["spec"].get("maxReplicas", "N/A")
-            hpa_current_replicas = hpa_info["status"].get("currentReplicas", "N/A")
-            hpa_cpu_target = hpa_info["spec"].get("targetCPUUtilizationPercentage", "N/A")
-            hpa_cpu_current = hpa_info["status"].get("currentCPUUtilizationPercentage", "N/A")
-            if hpa_cpu_current != "N/A" and int(hpa_cpu_current) >= 80:
-                final_report_file.write(f"{cluster}|{namespace}|{pod_name} -> {hpa_cpu_current}%\n")
-
-        if pod_status != "Running":
-            final_report_file.write(f"{cluster}|{namespace}|{pod_name} -> {pod_status}\n")
-
-        restart_count = pod["status"]["containerStatuses"][0]["restartCount"]
-        if restart_count > 0:
-            final_report_file.write(f"{cluster}|{namespace}|{pod_name} -> {restart_count} reinicializacoes\n")
-
-        csv_writer.writerow([
-            cluster, namespace, pod_name, pod_status, creation_time, recent_change, error_count,
-            cpu_usage, memory_usage, cpu_request, memory_request, cpu_limit, memory_limit,tag,
-            "N/A", "N/A", hpa_enabled, hpa_min_replicas, hpa_max_replicas, hpa_current_replicas,
-            hpa_cpu_target, hpa_cpu_current, restart_count
-        ])
+    # O indice de donos so e necessario para pods novos ou alterados
+    if any(get_previous_state(pod) is None or get_previous_state(pod)["resource_version"] != pod["metadata"].get("resourceVersion")
+           for pod in pods):
+        owner_index = build_owner_index(cluster, namespace, timeout=command_timeout, namespace_inventory=namespace_inventory)
+    else:
+        owner_index = {}
+
+    if progress:
+        progress.add("pods_total", len(pods))
+
+    def run_pod(pod):
+        result = process_pod(cluster, namespace, pod, pod_resources, owner_index, hpa_targets, current_time,
+                             error_patterns=error_patterns, log_since=log_since, log_tail=log_tail,
+                             command_timeout=command_timeout, previous_state=get_previous_state(pod))
+        if progress:
+            progress.add("pods_done")
+        return result
+
+    pod_states = {}
+    # Os pods sao processados em paralelo, mas executor.map devolve os resultados na ordem original
+    with ThreadPoolExecutor(max_workers=max(1, pod_workers)) as executor:
+        results = executor.map(run_pod, pods)
+        for pod, (row, record, final_report_lines, new_state) in zip(pods, results):
+            final_report_file.writelines(final_report_lines)
+            csv_writer.writerecord("pods", row, record)
+            if new_state:
+                pod_states[pod["metadata"]["uid"]] = new_state
+
+    if state_store:
+        # O estado é separado por padrão: só os pods do mesmo padrão que não existem mais são removidos
+        live_uids = {pod["metadata"].get("uid") for pod in pods}
+        state_store.save_namespace(cluster, namespace, pattern, pod_states, live_uids)
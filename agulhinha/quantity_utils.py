@@ -0,0 +1,66 @@
+import re
+
+# Sufixos de quantidades do Kubernetes (ex: 250m, 512Mi, 1G) e seus multiplicadores
+QUANTITY_SUFFIXES = {
+    "n": 1e-9, "u": 1e-6, "m": 1e-3, "": 1,
+    "k": 1e3, "M": 1e6, "G": 1e9, "T": 1e12, "P": 1e15, "E": 1e18,
+    "Ki": 2 ** 10, "Mi": 2 ** 20, "Gi": 2 ** 30, "Ti": 2 ** 40, "Pi": 2 ** 50, "Ei": 2 ** 60,
+}
+
+QUANTITY_RE = re.compile(r"^([+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)(n|u|m|k|M|G|T|P|E|Ki|Mi|Gi|Ti|Pi|Ei)?$")
+
+def parse_quantity(value):
+    """
+    Converte uma quantidade do Kubernetes para a unidade base (cores para CPU, bytes para memória).
+    Retorna None para valores ausentes ou inválidos (ex: "N/A")
+    """
+    if value is None:
+        return None
+    match = QUANTITY_RE.match(str(value).strip())
+    if not match:
+        return None
+    number, suffix = match.groups()
+    return float(number) * QUANTITY_SUFFIXES[suffix or ""]
+
+def parse_quantities(values):
+    """
+    Converte uma lista de quantidades de uma vez. Os mesmos valores se repetem em quase todos os pods
+    (ex: 100m, 512Mi), então cada texto distinto é analisado uma única vez
+    """
+    parsed = {}
+    result = []
+    for value in values:
+        if value not in parsed:
+            parsed[value] = parse_quantity(value)
+        result.append(parsed[value])
+    return result
+
+def sum_quantities(values):
+    """
+    Soma quantidades já convertidas, ignorando as ausentes. Retorna None se nenhuma estiver presente
+    """
+    present = [value for value in values if value is not None]
+    return sum(present) if present else None
+
+def usage_ratio(usage, reference):
+    """
+    Percentual de usage sobre reference (request ou limit), ou None quando algum dos dois não existe
+    """
+    if usage is None or not reference:
+        return None
+    return usage * 100 / reference
+
+def to_millicores(cores):
+    return None if cores is None else round(cores * 1000)
+
+def to_bytes(memory_bytes):
+    return None if memory_bytes is None else round(memory_bytes)
+
+def format_cpu(cores):
+    return "N/A" if cores is None else f"{round(cores * 1000)}m"
+
+def format_memory(memory_bytes):
+    return "N/A" if memory_bytes is None else f"{round(memory_bytes / 2 ** 20)}Mi"
+
+def format_percent(percent):
+    return "N/A" if percent is None else f"{percent:.1f}%"
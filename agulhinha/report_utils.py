@@ -1,4 +1,82 @@
-def append_final_report_to_csv(csv_file, final_report_file_name):
-    with open(final_report_file_name, "r") as final_report_f, open(csv_file, "a", newline='') as csv_f:
-        csv_f.write("\nRelatorio Final:\n")
-        csv_f.write(final_report_f.read())
+import csv
+import io
+import queue
+
+# Cabeçalho das linhas de pods do relatório (colunas novas entram no final, para não deslocar as existentes)
+REPORT_HEADER = ["Cluster", "Namespace", "Pod Name", "Status", "Creation Time", "Recent Change", "Error Count",
+                 "CPU Usage", "Memory Usage", "CPU Request", "Memory Request", "CPU Limit", "Memory Limit", "Tag",
+                 "CPU Usage vs Limit", "Memory Usage vs Limit", "HPA Enabled", "HPA Min Replicas",
+                 "HPA Max Replicas", "HPA Current Replicas", "HPA CPU Target", "HPA CPU Current", "Restart Count",
+                 "CPU Usage vs Request", "Memory Usage vs Request"]
+# Colunas das linhas de nodes (gravadas no CSV sem cabeçalho, após os pods de cada cluster)
+NODE_HEADER = ["Cluster", "Node Name", "CPU Usage", "CPU Percent", "Memory Usage", "Memory Percent",
+               "CPU Allocatable", "Memory Allocatable", "Pods", "CPU Requests", "CPU Requests vs Allocatable",
+               "Memory Requests", "Memory Requests vs Allocatable", "CPU Limits", "CPU Limits vs Allocatable",
+               "Memory Limits", "Memory Limits vs Allocatable", "Top CPU Pods", "Top Memory Pods"]
+# Quantidade de texto acumulada antes de enviar o relatório para o destino
+REPORT_FLUSH_SIZE = 64 * 1024
+
+class ReportCancelled(Exception):
+    pass
+
+class QueueRowWriter:
+    """
+    Usado no lugar do csv.writer pelas threads de cada cluster: as linhas vão para uma fila que é
+    consumida, na ordem dos clusters, por quem grava o relatório
+    """
+    def __init__(self, cancelled):
+        self.rows = queue.Queue()
+        self.cancelled = cancelled
+
+    def writerecord(self, table, row, record):
+        """
+        Recebe uma linha da tabela "pods" ou "nodes": row com os valores formatados para o CSV
+        e record com os mesmos valores tipados, para a exportação colunar
+        """
+        # Interrompe o cluster quando o relatório foi abortado (ex: o cliente desconectou)
+        if self.cancelled.is_set():
+            raise ReportCancelled()
+        self.rows.put(("row", (table, row, record)))
+
+    def finish(self, final_report):
+        self.rows.put(("end", final_report))
+
+    def fail(self, error):
+        self.rows.put(("error", error))
+
+class ReportStreamWriter:
+    """
+    Grava o relatório CSV (separado por ';') em um arquivo binário, agrupando a saída em blocos
+    de até REPORT_FLUSH_SIZE caracteres
+    """
+    def __init__(self, fileobj, encoding="utf-8"):
+        self.fileobj = fileobj
+        self.encoding = encoding
+        self.buffer = io.StringIO()
+        self.csv_writer = csv.writer(self.buffer, delimiter=';')
+
+    def writerow(self, row):
+        self.csv_writer.writerow(row)
+        if self.buffer.tell() >= REPORT_FLUSH_SIZE:
+            self.flush()
+
+    def writerecord(self, table, row, record):
+        self.writerow(row)
+
+    def write(self, text):
+        self.buffer.write(text)
+        if self.buffer.tell() >= REPORT_FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        data = self.buffer.getvalue()
+        if data:
+            self.fileobj.write(data.encode(self.encoding))
+            self.buffer.seek(0)
+            self.buffer.truncate()
+        self.fileobj.flush()
+
+    def finish(self, final_report):
+        self.write("\nRelatorio Final:\n")
+        self.write(final_report)
+        self.flush()
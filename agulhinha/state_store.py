@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Arquivo padrão do estado usado pelo modo incremental
+DEFAULT_STATE_DB = "agulhinha_state.db"
+
+class StateStore:
+    """
+    Estado local do modo incremental: guarda, por UID do pod e padrão do relatório, o resourceVersion visto na última
+    execução, o workload resolvido, a contagem de erros acumulada desde a criação do pod e o horário da última linha de log já contada
+    """
+    def __init__(self, path=DEFAULT_STATE_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            # Estados gravados por versões sem o padrão não podem ser atribuídos a um padrão e são descartados
+            # (a próxima execução lê os logs completos novamente)
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(pod_state)")]
+            if columns and "pattern" not in columns:
+                self.connection.execute("DROP TABLE pod_state")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS pod_state (
+                    uid TEXT NOT NULL,
+                    cluster TEXT NOT NULL,
+                    namespace TEXT NOT NULL,
+                    pattern TEXT NOT NULL,
+                    pod_name TEXT NOT NULL,
+                    resource_version TEXT NOT NULL,
+                    workload TEXT,
+                    error_count INTEGER NOT NULL,
+                    log_checkpoint TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (uid, pattern)
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS pod_state_pattern ON pod_state (cluster, namespace, pattern)")
+
+    def load_namespace(self, cluster, namespace, pattern):
+        """
+        Retorna o estado salvo dos pods do namespace processados com o padrão, indexado pelo UID
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT uid, resource_version, workload, error_count, log_checkpoint FROM pod_state "
+                "WHERE cluster = ? AND namespace = ? AND pattern = ?",
+                (str(cluster), namespace, pattern)
+            ).fetchall()
+        states = {}
+        for uid, resource_version, workload, error_count, log_checkpoint in rows:
+            states[uid] = {
+                "resource_version": resource_version,
+                "workload": tuple(json.loads(workload)) if workload else None,
+                "error_count": error_count,
+                "log_checkpoint": log_checkpoint,
+            }
+        return states
+
+    def save_namespace(self, cluster, namespace, pattern, pod_states, live_uids):
+        """
+        Grava o estado dos pods processados com o padrão e remove os pods do padrão que não existem mais.
+        live_uids são os UIDs de todos os pods que correspondem ao padrão, inclusive os que não tiveram estado gravado
+        """
+        now = time.time()
+        cluster = str(cluster)
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pod_state VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (uid, cluster, namespace, pattern, state["pod_name"], state["resource_version"],
+                     json.dumps(state["workload"]) if state["workload"] else None,
+                     state["error_count"], state["log_checkpoint"], now)
+                    for uid, state in pod_states.items()
+                ]
+            )
+            stored_uids = [row[0] for row in self.connection.execute(
+                "SELECT uid FROM pod_state WHERE cluster = ? AND namespace = ? AND pattern = ?", (cluster, namespace, pattern))]
+            removed_uids = [(uid, pattern) for uid in stored_uids if uid not in live_uids]
+            self.connection.executemany("DELETE FROM pod_state WHERE uid = ? AND pattern = ?", removed_uids)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,139 @@
+import json
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from api_client import (register_api_client, unregister_api_client, run_api_command, stream_api_command, parse_oc_command,
+                        build_logs_params)
+
+CLUSTER = "cluster-de-teste"
+TOKEN = "sha256~token-de-teste"
+LOG_LINES = [f"linha {i} {'ERRO' if i % 3 == 0 else 'ok'}\n" for i in range(50)]
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """
+    API mínima: responde /api/v1/nodes, os logs de pod-a e 404 para o restante, com keep-alive
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        self.server.requests.append({
+            "path": url.path,
+            "params": dict(urllib.parse.parse_qsl(url.query)),
+            "authorization": self.headers.get("Authorization"),
+            "client_port": self.client_address[1],
+        })
+        if url.path == "/api/v1/nodes":
+            self.send_body(200, json.dumps({"items": [{"metadata": {"name": "node1"}}]}).encode())
+        elif url.path == "/api/v1/namespaces/ns1/pods/pod-a/log":
+            # Logs enviados em partes (chunked), como no streaming da API
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for line in LOG_LINES:
+                data = line.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_body(404, json.dumps({"kind": "Status", "message": f"{url.path} not found"}).encode())
+
+    def send_body(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class ApiClientTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeApiHandler)
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests.clear()
+        register_api_client(CLUSTER, f"http://127.0.0.1:{self.server.server_address[1]}", TOKEN)
+
+    def tearDown(self):
+        unregister_api_client(CLUSTER)
+
+    def test_get_raw(self):
+        output = run_api_command(CLUSTER, "oc get --raw '/api/v1/nodes'", timeout=5)
+        self.assertEqual(json.loads(output)["items"][0]["metadata"]["name"], "node1")
+        self.assertEqual(self.server.requests[0]["authorization"], f"Bearer {TOKEN}")
+
+    def test_logs_streaming_with_since_and_tail(self):
+        chunks = list(stream_api_command(CLUSTER, "oc logs -n ns1 pod-a -c main --since=1h30m --tail=50", timeout=5, chunk_size=16))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks).decode(), "".join(LOG_LINES))
+        request = self.server.requests[0]
+        self.assertEqual(request["path"], "/api/v1/namespaces/ns1/pods/pod-a/log")
+        self.assertEqual(request["params"], {"container": "main", "sinceSeconds": "5400", "tailLines": "50"})
+
+    def test_logs_with_since_time(self):
+        output = run_api_command(CLUSTER, "oc logs -n ns1 pod-a --since-time=2024-01-01T00:00:00Z", timeout=5)
+        self.assertEqual(output, "".join(LOG_LINES))
+        self.assertEqual(self.server.requests[0]["params"], {"sinceTime": "2024-01-01T00:00:00Z"})
+
+    def test_client_error(self):
+        with self.assertRaises(RuntimeError) as error:
+            run_api_command(CLUSTER, "oc get pods missing -n ns1 -o json", timeout=5)
+        self.assertIn("status 404", str(error.exception))
+        self.assertIn("/api/v1/namespaces/ns1/pods/missing not found", str(error.exception))
+
+    def test_connection_reuse(self):
+        for _ in range(3):
+            run_api_command(CLUSTER, "oc get --raw '/api/v1/nodes'", timeout=5)
+        # Uma resposta de erro e um log lido até o fim também devolvem a conexão ao pool
+        with self.assertRaises(RuntimeError):
+            run_api_command(CLUSTER, "oc get --raw '/api/v1/missing'", timeout=5)
+        list(stream_api_command(CLUSTER, "oc logs -n ns1 pod-a", timeout=5))
+        run_api_command(CLUSTER, "oc get --raw '/api/v1/nodes'", timeout=5)
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertEqual(len({request["client_port"] for request in self.server.requests}), 1)
+
+    def test_unsupported_commands_fall_back_to_oc(self):
+        self.assertIsNone(run_api_command(CLUSTER, "oc exec -n ns1 pod-a -- ls", timeout=5))
+        self.assertIsNone(stream_api_command(CLUSTER, "oc logs -n ns1 pod-a --since=1d", timeout=5))
+        self.assertIsNone(run_api_command(CLUSTER, "oc logs -n ns1 pod-a --since=1d", timeout=5))
+        self.assertIsNone(run_api_command("cluster-sem-cliente", "oc get --raw '/api/v1/nodes'", timeout=5))
+        self.assertEqual(self.server.requests, [])
+
+class ParseOcCommandTest(unittest.TestCase):
+    def test_get_and_raw(self):
+        self.assertEqual(parse_oc_command("oc get pods -n ns1 -l app=a,tier!=b -o json"),
+                         {"verb": "get", "resource": "pods", "name": None,
+                          "options": {"namespace": "ns1", "labelSelector": "app=a,tier!=b", "output": "json"}})
+        self.assertEqual(parse_oc_command("oc get rs app-abc -n ns1 -o json")["resource"], "replicasets")
+        self.assertEqual(parse_oc_command("oc get --raw '/api/v1/pods?limit=500'")["path"], "/api/v1/pods?limit=500")
+
+    def test_logs_and_top(self):
+        request = parse_oc_command("oc logs -n ns1 pod-a --previous --tail=10")
+        self.assertEqual(request, {"verb": "logs", "name": "pod-a", "options": {"namespace": "ns1", "previous": True, "tailLines": "10"}})
+        self.assertEqual(parse_oc_command("oc adm top pods -n ns1 --no-headers")["verb"], "top")
+
+    def test_unsupported(self):
+        for command in ("oc get pods -n ns1", "oc get configmaps -n ns1 -o json", "oc adm top pods -n ns1",
+                        "oc logs -n ns1 pod-a -f", "oc exec pod-a -- ls", "kubectl get pods -o json", "oc get pods -o 'json"):
+            self.assertIsNone(parse_oc_command(command), command)
+
+    def test_build_logs_params(self):
+        self.assertEqual(build_logs_params({"container": "main", "previous": True, "since": "15m", "tailLines": "5"}),
+                         {"container": "main", "previous": "true", "tailLines": "5", "sinceSeconds": 900})
+        self.assertEqual(build_logs_params({}), {})
+        self.assertIsNone(build_logs_params({"since": "1d"}))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import random
+import unittest
+from log_utils import count_patterns_in_stream, normalize_log_timestamp, strip_log_timestamps
+
+def split_randomly(data, rng, max_chunk_size):
+    """
+    Divide o conteúdo em blocos de tamanhos aleatórios (inclusive blocos vazios)
+    """
+    chunks = []
+    position = 0
+    while position < len(data):
+        size = rng.randint(0, max_chunk_size)
+        chunks.append(data[position:position + size])
+        position += size
+    return chunks
+
+class CountPatternsInStreamTest(unittest.TestCase):
+    def assert_counts_match_whole_stream(self, data, patterns, rng, max_chunk_size=8):
+        expected = {pattern: data.count(pattern.encode("utf-8")) for pattern in patterns}
+        for _ in range(200):
+            chunks = split_randomly(data, rng, max_chunk_size)
+            self.assertEqual(count_patterns_in_stream(chunks, patterns), expected, chunks)
+
+    def test_single_chunk(self):
+        data = b"ERRO x\nException y\nERRO z\n"
+        self.assertEqual(count_patterns_in_stream([data], ["ERRO", "Exception", "OOMKilled"]),
+                         {"ERRO": 2, "Exception": 1, "OOMKilled": 0})
+
+    def test_occurrence_across_chunks(self):
+        self.assertEqual(count_patterns_in_stream([b"linha E", b"R", b"RO final"], ["ERRO"]), {"ERRO": 1})
+
+    def test_self_overlapping_patterns(self):
+        # A contagem de 'aa' em 'aaa' é 1 (sem sobreposição), mesmo que os blocos sejam divididos no meio
+        self.assertEqual(count_patterns_in_stream([b"a", b"aa"], ["aa"]), {"aa": 1})
+        self.assertEqual(count_patterns_in_stream([b"aaa", b"a"], ["aa"]), {"aa": 2})
+        rng = random.Random(1)
+        for _ in range(20):
+            data = bytes(rng.choice(b"ab") for _ in range(rng.randint(0, 60)))
+            self.assert_counts_match_whole_stream(data, ["aa", "aba", "abab", "b"], rng)
+
+    def test_random_logs_and_chunk_splits(self):
+        rng = random.Random(2)
+        words = ["ok", "ERRO", "ERROR", "Exception", "OOMKilled", "\n", " ", "ERR", "O"]
+        for _ in range(20):
+            data = "".join(rng.choice(words) for _ in range(rng.randint(0, 80))).encode("utf-8")
+            self.assert_counts_match_whole_stream(data, ["ERRO", "Exception", "OOMKilled"], rng, max_chunk_size=16)
+
+    def test_multibyte_patterns(self):
+        rng = random.Random(3)
+        data = "falha ão ãoão\nerro ção ão".encode("utf-8")
+        self.assert_counts_match_whole_stream(data, ["ão", "ção"], rng)
+
+    def test_repeated_and_empty_patterns(self):
+        data = b"ERRO ERRO"
+        self.assertEqual(count_patterns_in_stream([b"ERRO E", b"RRO"], ["ERRO", "ERRO"]), {"ERRO": 2})
+        self.assertEqual(count_patterns_in_stream([b"ERRO E", b"RRO"], [""]), {"": data.count(b"")})
+
+class StripLogTimestampsTest(unittest.TestCase):
+    LOG = (b"2024-01-01T00:00:00.5Z ERRO a\n"
+           b"2024-01-01T00:00:00.500000001Z ERRO b\n"
+           b"2024-01-01T00:00:01Z ok\n")
+
+    def test_normalize(self):
+        self.assertEqual(normalize_log_timestamp("2024-01-01T00:00:00.5Z"), "2024-01-01T00:00:00.500000000Z")
+        self.assertEqual(normalize_log_timestamp("2024-01-01T00:00:00Z"), "2024-01-01T00:00:00.000000000Z")
+        self.assertIsNone(normalize_log_timestamp("ontem"))
+
+    def test_strips_timestamps_and_records_last_line(self):
+        consumed = {}
+        rng = random.Random(4)
+        lines = list(strip_log_timestamps(split_randomly(self.LOG, rng, 8), consumed=consumed))
+        self.assertEqual(b"".join(lines), b"ERRO a\nERRO b\nok\n")
+        self.assertEqual(consumed["timestamp"], "2024-01-01T00:00:01.000000000Z")
+
+    def test_resume_skips_lines_already_counted(self):
+        # Retomando do horário da primeira linha, ela não é contada de novo, mas a linha seguinte do mesmo segundo é
+        consumed = {"timestamp": "2024-01-01T00:00:00.500000000Z"}
+        chunks = strip_log_timestamps([self.LOG], after=consumed["timestamp"], consumed=consumed)
+        self.assertEqual(count_patterns_in_stream(chunks, ["ERRO"]), {"ERRO": 1})
+        self.assertEqual(consumed["timestamp"], "2024-01-01T00:00:01.000000000Z")
+
+        consumed = {"timestamp": "2024-01-01T00:00:01.000000000Z"}
+        self.assertEqual(list(strip_log_timestamps([self.LOG], after=consumed["timestamp"], consumed=consumed)), [])
+        self.assertEqual(consumed["timestamp"], "2024-01-01T00:00:01.000000000Z")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from pod_listing import is_label_selector, matches_label_selector, split_label_selector
+
+LABELS = {"app": "api", "tier": "web"}
+
+class LabelSelectorTest(unittest.TestCase):
+    def test_is_label_selector(self):
+        for pattern in ("app=api", "tier!=cache", "tier in (web,api)", "app notin (x)", "!canary", "app=api,!canary"):
+            self.assertTrue(is_label_selector(pattern), pattern)
+        for pattern in ("api", "minha-api-web", "login"):
+            self.assertFalse(is_label_selector(pattern), pattern)
+
+    def test_split_keeps_sets_together(self):
+        self.assertEqual(split_label_selector("app=api,tier in (web,cache),!canary"), ["app=api", "tier in (web,cache)", "!canary"])
+
+    def test_matches_like_the_server(self):
+        cases = {
+            "app=api": True, "app==api": True, "app=worker": False,
+            "app!=worker": True, "app!=api": False, "missing!=x": True,
+            "app=api,tier in (web,cache)": True, "app=api,tier in (cache)": False, "missing in (x)": False,
+            "tier notin (cache, db)": True, "tier notin (web)": False, "missing notin (x)": True,
+            "app": True, "missing": False, "!missing": True, "!app": False,
+        }
+        for selector, expected in cases.items():
+            self.assertEqual(matches_label_selector(LABELS, selector), expected, selector)
+
+    def test_invalid_selector(self):
+        for selector in ("app=a b", "tier in (web", "app=api,(x)"):
+            with self.assertRaises(ValueError):
+                matches_label_selector(LABELS, selector)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from quantity_utils import (parse_quantity, parse_quantities, sum_quantities, usage_ratio, to_millicores, to_bytes, format_cpu,
+                            format_memory, format_percent)
+
+class ParseQuantityTest(unittest.TestCase):
+    def test_cpu_and_memory(self):
+        self.assertEqual(parse_quantity("250m"), 0.25)
+        self.assertEqual(parse_quantity("2"), 2)
+        self.assertAlmostEqual(parse_quantity("1500000n"), 0.0015)
+        self.assertEqual(parse_quantity("512Mi"), 512 * 2 ** 20)
+        self.assertEqual(parse_quantity("1G"), 1e9)
+        self.assertEqual(parse_quantity("1E"), 1e18)
+        self.assertEqual(parse_quantity(" 1.5Gi "), 1.5 * 2 ** 30)
+
+    def test_decimal_forms(self):
+        self.assertEqual(parse_quantity("1."), 1)
+        self.assertEqual(parse_quantity(".5"), 0.5)
+        self.assertEqual(parse_quantity("+1.5"), 1.5)
+        self.assertEqual(parse_quantity("1e3"), 1000)
+        self.assertEqual(parse_quantity("1.5e-3k"), 1.5)
+
+    def test_invalid_values_return_none(self):
+        for value in (None, "", "N/A", ".", "1.2.3", "..5", "+", "e3", "1e", "10mi", "5Kb", "1 m"):
+            self.assertIsNone(parse_quantity(value), value)
+
+    def test_parse_quantities_reuses_results(self):
+        self.assertEqual(parse_quantities(["100m", "100m", None, "x", "1Ki"]), [0.1, 0.1, None, None, 1024])
+
+class QuantityHelpersTest(unittest.TestCase):
+    def test_sum_and_ratio(self):
+        self.assertEqual(sum_quantities([0.1, None, 0.2]), 0.1 + 0.2)
+        self.assertIsNone(sum_quantities([None, None]))
+        self.assertEqual(usage_ratio(0.25, 0.5), 50)
+        self.assertIsNone(usage_ratio(None, 0.5))
+        self.assertIsNone(usage_ratio(0.25, 0))
+        self.assertIsNone(usage_ratio(0.25, None))
+
+    def test_conversions(self):
+        self.assertEqual(to_millicores(0.0015), 2)
+        self.assertEqual(to_bytes(1.6), 2)
+        self.assertIsNone(to_millicores(None))
+        self.assertIsNone(to_bytes(None))
+
+    def test_format(self):
+        self.assertEqual(format_cpu(0.25), "250m")
+        self.assertEqual(format_memory(512 * 2 ** 20), "512Mi")
+        self.assertEqual(format_memory(1.5 * 2 ** 20), "2Mi")
+        self.assertEqual(format_percent(87.26), "87.3%")
+        for formatter in (format_cpu, format_memory, format_percent):
+            self.assertEqual(formatter(None), "N/A")
+
+if __name__ == "__main__":
+    unittest.main()
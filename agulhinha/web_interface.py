@@ -1,13 +1,64 @@
+import argparse
+import json
 import os
+import shutil
+import threading
 import uuid
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import urllib.parse
 import subprocess
-from main import test_connectivity_in_pod, login_to_cluster, collect_logs_from_pods, generate_pods_report
+from main import (test_connectivity_in_pod, login_to_cluster, collect_logs_from_pods, stream_logs_from_pods, generate_pods_report,
+                  write_pods_report, split_report_args, probe_connectivity_from_pods)
+from connectivity import format_seconds, DEFAULT_PROBE_TIMEOUT
+from connectivity_monitor import ConnectivityMonitor, DEFAULT_MONITOR_INTERVAL, DEFAULT_MONITOR_HISTORY, MONITOR_WINDOWS
+from inventory import InventoryManager
+from jobs import JobManager, DEFAULT_JOB_WORKERS
+from command_metrics import enable_command_metrics
+from exec_sessions import enable_exec_sessions, DEFAULT_SESSION_IDLE_TIMEOUT
+from cluster_utils import enable_user_kubeconfigs, forget_credentials
+from api_client import parse_duration
 
 sessions = {}
+# O servidor atende cada requisição em uma thread, então o acesso às sessões é protegido por lock
+sessions_lock = threading.Lock()
+# Inventário mantido por watches; quando ativo, relatórios e coleta de logs leem pods e HPAs do cache
+inventory = None
+# Fila de jobs em segundo plano para relatórios e coletas de logs
+job_manager = JobManager()
+# Métricas dos comandos enviados aos clusters, expostas em /metrics
+command_metrics = None
+# Monitor que testa periodicamente os pares pod/URL cadastrados em /monitor
+connectivity_monitor = ConnectivityMonitor()
+
+class ChunkedWriter:
+    """
+    Objeto de arquivo que envia cada escrita como um bloco de Transfer-Encoding: chunked
+    """
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, data):
+        if data:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + bytes(data) + b"\r\n")
+        return len(data)
+
+    def flush(self):
+        self.wfile.flush()
+
+    def close(self):
+        # Bloco vazio que indica o fim da resposta
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
 
 class WebInterface(BaseHTTPRequestHandler):
+    # HTTP/1.1 é necessário para enviar downloads com Transfer-Encoding: chunked
+    protocol_version = 'HTTP/1.1'
+
+    def end_headers(self):
+        # Nem todas as respostas informam Content-Length, então a conexão é encerrada ao final de cada uma
+        self.send_header('Connection', 'close')
+        super().end_headers()
 
     def do_GET(self):
         session = self.get_session()
@@ -18,6 +69,12 @@ class WebInterface(BaseHTTPRequestHandler):
                 self.show_main_page(session)
         elif self.path == '/logout':
             self.handle_logout()
+        elif self.path == '/metrics':
+            self.show_metrics()
+        elif self.path.startswith('/jobs/') and session is not None:
+            self.handle_job_request(session)
+        elif self.path == '/monitor' and session is not None:
+            self.show_monitor_page(session)
         else:
             # Se a rota não for reconhecida, redireciona para a página principal
             self.send_response(302)
@@ -39,6 +96,12 @@ class WebInterface(BaseHTTPRequestHandler):
                     self.execute_script(session)
                 elif self.path == '/test-connectivity':
                     self.test_connectivity(session)
+                elif self.path == '/probe-connectivity':
+                    self.probe_connectivity(session)
+                elif self.path == '/monitor/add':
+                    self.add_monitor_target(session)
+                elif self.path == '/monitor/remove':
+                    self.remove_monitor_target(session)
                 elif self.path == '/collect-logs':
                     self.collect_logs(session)
                 else:
@@ -114,7 +177,8 @@ class WebInterface(BaseHTTPRequestHandler):
             # Cria um ID de sessão único
             session_id = str(uuid.uuid4())
             # Armazena as credenciais na sessão
-            sessions[session_id] = {'username': username, 'password': password}
+            with sessions_lock:
+                sessions[session_id] = {'username': username, 'password': password}
 
             # Envia um cookie com o ID de sessão
             self.send_response(302)
@@ -133,7 +197,8 @@ class WebInterface(BaseHTTPRequestHandler):
             for cookie in cookies:
                 if 'session_id' in cookie:
                     session_id = cookie.split('=')[1].strip()
-                    session = sessions.get(session_id)
+                    with sessions_lock:
+                        session = sessions.get(session_id)
                     if session:
                         return session
         return None
@@ -251,7 +316,7 @@ class WebInterface(BaseHTTPRequestHandler):
         <body>
             <div class="container">
                 <div class="logout">
-                    <a href="/logout">Logout</a>
+                    <a href="/monitor">Monitor de conectividade</a> | <a href="/logout">Logout</a>
                 </div>
                 <h2>Bem-vindo, {username}</h2>
                 
@@ -263,9 +328,11 @@ class WebInterface(BaseHTTPRequestHandler):
                     <label for="namespaces">Namespaces (separados por ponto e vírgula):</label>
                     <input type="text" id="namespaces" name="namespaces" required>
 
-                    <label for="patterns">Padrões de Pods (separados por ponto e vírgula):</label>
+                    <label for="patterns">Padrões de Pods ou label selectors (separados por ponto e vírgula; '|' entre os namespaces de um cluster):</label>
                     <input type="text" id="patterns" name="patterns" required>
 
+                    <label><input type="checkbox" name="background" value="1"> Executar em segundo plano</label>
+
                     <input type="submit" value="Executar">
                 </form>
 
@@ -286,6 +353,26 @@ class WebInterface(BaseHTTPRequestHandler):
                     <input type="submit" value="Testar Conectividade">
                 </form>
 
+                <form method="POST" action="/probe-connectivity">
+                    <h3>Matriz de conectividade (todas as réplicas x URLs)</h3>
+                    <label for="probe_cluster">Cluster:</label>
+                    <input type="text" id="probe_cluster" name="cluster" required>
+
+                    <label for="probe_namespace">Namespace:</label>
+                    <input type="text" id="probe_namespace" name="namespace" required>
+
+                    <label for="probe_pattern">Padrão de Pods (Workload):</label>
+                    <input type="text" id="probe_pattern" name="pattern" required>
+
+                    <label for="urls">URLs (separadas por vírgulas):</label>
+                    <input type="text" id="urls" name="urls" required>
+
+                    <label for="probe_timeout">Timeout por requisição em segundos (opcional):</label>
+                    <input type="text" id="probe_timeout" name="timeout">
+
+                    <input type="submit" value="Testar Réplicas">
+                </form>
+
                 <form method="POST" action="/collect-logs">
                     <h3>Coletar logs do workload</h3>
                     <label for="cluster">Cluster:</label>
@@ -297,6 +384,19 @@ class WebInterface(BaseHTTPRequestHandler):
                     <label for="pattern">Padrão de Pods (Workload):</label>
                     <input type="text" id="pattern" name="pattern" required>
 
+                    <label for="since">Janela de tempo (ex: 15m, 1h - opcional):</label>
+                    <input type="text" id="since" name="since">
+
+                    <label for="tail">Últimas N linhas (opcional):</label>
+                    <input type="text" id="tail" name="tail">
+
+                    <label for="container">Container (opcional):</label>
+                    <input type="text" id="container" name="container">
+
+                    <label><input type="checkbox" name="all_containers" value="1"> Todos os containers</label>
+                    <label><input type="checkbox" name="previous" value="1"> Logs da execução anterior (--previous)</label>
+                    <label><input type="checkbox" name="background" value="1"> Executar em segundo plano</label>
+
                     <input type="submit" value="Coletar Logs">
                 </form>
             </div>
@@ -314,8 +414,18 @@ class WebInterface(BaseHTTPRequestHandler):
                 if 'session_id' in cookie:
                     session_id = cookie.split('=')[1].strip()
                     break
-        if session_id and session_id in sessions:
-            del sessions[session_id]
+        if session_id:
+            with sessions_lock:
+                session = sessions.pop(session_id, None)
+                # Os logins nos clusters são descartados quando a última sessão do usuário termina
+                username = session['username'] if session else None
+                if username and any(other['username'] == username for other in sessions.values()):
+                    username = None
+            if username:
+                forget_credentials(username)
+                connectivity_monitor.remove_user_targets(username)
+                if inventory:
+                    inventory.forget_user(username)
         # Limpa o cookie de sessão
         self.send_response(302)
         self.send_header('Location', '/')
@@ -344,34 +454,39 @@ class WebInterface(BaseHTTPRequestHandler):
             return
     
         try:
-            # Chama a função generate_pods_report diretamente
-            csv_file = generate_pods_report(clusters, namespaces, patterns, username, password)
-    
-            # Verifica se o arquivo CSV foi gerado
-            if os.path.exists(csv_file):
-                # Envia o arquivo CSV para download
-                self.send_response(200)
-                self.send_header('Content-Type', 'text/csv')
-                self.send_header('Content-Disposition', f'attachment; filename="{os.path.basename(csv_file)}"')
-                self.end_headers()
-    
-                # Lê e envia o conteúdo do arquivo CSV
-                with open(csv_file, 'rb') as file:
-                    self.wfile.write(file.read())
-            else:
-                # Caso o arquivo CSV não tenha sido gerado
-                self.send_response(500)
-                self.send_header('Content-type', 'text/html; charset=utf-8')
-                self.end_headers()
-                mensagem = "<h2>Erro: Arquivo CSV não foi gerado.</h2>"
-                self.wfile.write(mensagem.encode('utf-8'))
-    
-        except Exception as e:
-            self.send_response(500)
+            split_report_args(clusters, namespaces, patterns)
+        except ValueError as e:
+            self.send_response(400)
             self.send_header('Content-type', 'text/html; charset=utf-8')
             self.end_headers()
-            mensagem = f"<h2>Erro ao executar o script:</h2><p>{str(e)}</p>"
-            self.wfile.write(mensagem.encode('utf-8'))
+            self.wfile.write(str(e).encode('utf-8'))
+            return
+
+        if params.get('background', [''])[0]:
+            # Em segundo plano o relatório é gravado em arquivo; o navegador acompanha o progresso pela página do job
+            def run_report(job):
+                return generate_pods_report(clusters, namespaces, patterns, username, password, inventory=inventory,
+                                            csv_file=os.path.join(job.work_dir, "pods_status.csv"), progress=job.progress)
+
+            job = job_manager.submit("report", username, (clusters, namespaces, patterns), run_report,
+                                     "pods_status.csv", "text/csv")
+            self.redirect_to_job(job)
+            return
+
+        # Download direto: cada linha é enviada assim que o pod é processado, sem gravar o CSV em disco
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('Content-Disposition', 'attachment; filename="pods_status.csv"')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        chunked_writer = ChunkedWriter(self.wfile)
+        try:
+            write_pods_report(chunked_writer, clusters, namespaces, patterns, username, password, inventory=inventory)
+        except Exception as e:
+            # Os cabeçalhos já foram enviados; o erro só pode ser registrado e o download interrompido
+            print(f"Erro ao gerar o relatório de {clusters}: {str(e)}")
+            return
+        chunked_writer.close()
 
     # Função para testar conectividade em um pod
     def test_connectivity(self, session):
@@ -395,7 +510,7 @@ class WebInterface(BaseHTTPRequestHandler):
             return
 
         # Conecta ao cluster antes de realizar o teste
-        login_to_cluster(cluster, username, password)
+        cluster = login_to_cluster(cluster, username, password)
 
         # Executa o teste de conectividade no pod
         result = test_connectivity_in_pod(cluster, namespace, pod_name, url)
@@ -407,6 +522,102 @@ class WebInterface(BaseHTTPRequestHandler):
         self.wfile.write(b"<h2>Resultado do Teste de Conectividade:</h2>")
         self.wfile.write(bytes(f"<pre>{result}</pre>", "utf8"))
 
+    # Função para testar várias URLs a partir de todas as réplicas de um workload
+    def probe_connectivity(self, session):
+        username = session['username']
+        password = session['password']
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+        params = urllib.parse.parse_qs(post_data.decode('utf-8'))
+
+        cluster = params.get('cluster', [''])[0]
+        namespace = params.get('namespace', [''])[0]
+        pattern = params.get('pattern', [''])[0]
+        urls = [url.strip() for url in params.get('urls', [''])[0].split(',') if url.strip()]
+        timeout = params.get('timeout', [''])[0] or str(DEFAULT_PROBE_TIMEOUT)
+
+        # Verifica se todos os campos foram preenchidos
+        if not all([cluster, namespace, pattern, urls]) or not timeout.isdigit():
+            self.send_response(400)
+            self.send_header('Content-type', 'text/html')
+            self.end_headers()
+            self.wfile.write(b"Todos os campos sao obrigatorios e o timeout deve ser um numero inteiro!")
+            return
+
+        try:
+            probe_matrix = probe_connectivity_from_pods(cluster, namespace, pattern, urls, username, password,
+                                                        timeout=int(timeout), inventory=inventory)
+        except RuntimeError as e:
+            self.send_response(500)
+            self.send_header('Content-type', 'text/html; charset=utf-8')
+            self.end_headers()
+            self.wfile.write(f"<h2>Erro ao listar os pods:</h2><pre>{escape(str(e))}</pre>".encode('utf-8'))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(self.render_probe_matrix(probe_matrix).encode('utf-8'))
+
+    def render_probe_matrix(self, probe_matrix):
+        urls = probe_matrix['urls']
+        header = "".join(f"<th>{escape(url)}</th>" for url in urls)
+        rows = []
+        for pod_name in probe_matrix['pods']:
+            cells = []
+            for url in urls:
+                result = probe_matrix['matrix'][(pod_name, url)]
+                if result['ok']:
+                    title = (f"DNS {format_seconds(result['dns'])} | connect {format_seconds(result['connect'])} | "
+                             f"TLS {format_seconds(result['tls'])} | TTFB {format_seconds(result['ttfb'])}")
+                    cells.append(f'<td class="ok" title="{title}">{result["http_code"]} - {format_seconds(result["total"])}</td>')
+                else:
+                    cells.append(f'<td class="fail">{escape(result["error"])}</td>')
+            rows.append(f"<tr><td>{escape(pod_name)}</td>{''.join(cells)}</tr>")
+
+        summary_rows = []
+        for url, summary in probe_matrix['summary'].items():
+            summary_rows.append(
+                f"<tr><td>{escape(url)}</td><td>{summary['failures']}/{summary['count']} ({summary['http_errors']} HTTP)</td>"
+                f"<td>{format_seconds(summary['p50'])}</td><td>{format_seconds(summary['p95'])}</td><td>{format_seconds(summary['p99'])}</td>"
+                f"<td>{format_seconds(summary['avg_dns'])}</td><td>{format_seconds(summary['avg_connect'])}</td>"
+                f"<td>{format_seconds(summary['avg_tls'])}</td><td>{format_seconds(summary['avg_ttfb'])}</td></tr>")
+
+        return f'''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Matriz de conectividade - OpenShift Tool Interface</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; background-color: #f2f2f2; }}
+                .container {{ width: 90%; margin: auto; padding: 20px; background: #fff; border-radius: 5px; }}
+                table {{ border-collapse: collapse; margin-bottom: 20px; }}
+                th, td {{ border: 1px solid #ccc; padding: 6px 10px; text-align: left; }}
+                .ok {{ background-color: #d4edda; }}
+                .fail {{ background-color: #f8d7da; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <h2>Matriz de conectividade {escape(probe_matrix['cluster'])}/{escape(probe_matrix['namespace'])}</h2>
+                <p>{len(probe_matrix['pods'])} pods x {len(urls)} URLs. Passe o mouse sobre uma célula para ver as fases da requisição.</p>
+                <table>
+                    <tr><th>Pod</th>{header}</tr>
+                    {"".join(rows)}
+                </table>
+                <h3>Resumo por URL</h3>
+                <table>
+                    <tr><th>URL</th><th>Falhas</th><th>p50</th><th>p95</th><th>p99</th>
+                        <th>DNS médio</th><th>Connect médio</th><th>TLS médio</th><th>TTFB médio</th></tr>
+                    {"".join(summary_rows)}
+                </table>
+                <p><a href="/">Voltar</a></p>
+            </div>
+        </body>
+        </html>
+        '''
+
     # Função para coletar logs dos pods de um workload e compactá-los
     def collect_logs(self, session):
         username = session['username']
@@ -427,31 +638,296 @@ class WebInterface(BaseHTTPRequestHandler):
             self.wfile.write(b"Todos os campos sao obrigatorios!")
             return
 
-        try:
-            # Coleta e compacta os logs dos pods
-            tar_file_path = collect_logs_from_pods(cluster, namespace, pattern, username, password)
-
-            # Envia o arquivo .tar.gz para download
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/gzip')
-            self.send_header(f'Content-Disposition', f'attachment; filename="{os.path.basename(tar_file_path)}"')
+        # Opções da coleta: janela de tempo/linhas, execução anterior e seleção de containers
+        log_options = {
+            'since': params.get('since', [''])[0] or None,
+            'tail': params.get('tail', [''])[0] or None,
+            'previous': bool(params.get('previous', [''])[0]),
+            'container': params.get('container', [''])[0] or None,
+            'all_containers': bool(params.get('all_containers', [''])[0]),
+        }
+        if log_options['tail'] is not None and not log_options['tail'].isdigit():
+            self.send_response(400)
+            self.send_header('Content-type', 'text/html')
+            self.end_headers()
+            self.wfile.write(b"O campo tail deve ser um numero inteiro!")
+            return
+        if log_options['since'] is not None and parse_duration(log_options['since']) is None:
+            self.send_response(400)
+            self.send_header('Content-type', 'text/html')
             self.end_headers()
+            self.wfile.write(b"O campo janela de tempo deve ser uma duracao como 15m, 1h ou 1h30m!")
+            return
+
+        filename = f"{cluster}_{namespace}_logs-{pattern}.tar.gz"
+        if params.get('background', [''])[0]:
+            def run_log_collection(job):
+                return collect_logs_from_pods(cluster, namespace, pattern, username, password, inventory=inventory,
+                                              output_dir=job.work_dir, progress=job.progress, **log_options)
 
-            # Lê e envia o conteúdo do arquivo tar.gz
-            with open(tar_file_path, 'rb') as tar_file:
-                self.wfile.write(tar_file.read())
+            job = job_manager.submit("logs", username, (cluster, namespace, pattern, tuple(sorted(log_options.items()))), run_log_collection,
+                                     filename, "application/gzip")
+            self.redirect_to_job(job)
+            return
 
+        # Download direto: os logs são compactados e enviados à medida que são lidos dos pods
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/gzip')
+        self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        chunked_writer = ChunkedWriter(self.wfile)
+        try:
+            stream_logs_from_pods(chunked_writer, cluster, namespace, pattern, username, password, inventory=inventory, **log_options)
         except Exception as e:
-            self.send_response(500)
+            # Os cabeçalhos já foram enviados; o erro só pode ser registrado e o download interrompido
+            print(f"Erro ao coletar logs do workload {pattern} em {cluster}/{namespace}: {str(e)}")
+            return
+        chunked_writer.close()
+
+    # Cadastra um par pod/URL no monitor de conectividade
+    def add_monitor_target(self, session):
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+        params = urllib.parse.parse_qs(post_data.decode('utf-8'))
+
+        cluster = params.get('cluster', [''])[0]
+        namespace = params.get('namespace', [''])[0]
+        pod_name = params.get('pod_name', [''])[0]
+        url = params.get('url', [''])[0]
+        container = params.get('container', [''])[0] or None
+
+        if not all([cluster, namespace, pod_name, url]):
+            self.send_response(400)
             self.send_header('Content-type', 'text/html')
             self.end_headers()
-            self.wfile.write(bytes(f"<h2>Erro ao coletar logs:</h2><p>{str(e)}</p>", "utf8"))
+            self.wfile.write(b"Todos os campos sao obrigatorios!")
+            return
+
+        # Os testes do monitor usam o kubeconfig do usuário no cluster, que precisa estar autenticado
+        cluster = login_to_cluster(cluster, session['username'], session['password'])
+        connectivity_monitor.add_target(cluster, namespace, pod_name, url, container=container, owner=session['username'])
+        self.redirect_to_monitor()
+
+    def remove_monitor_target(self, session):
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+        params = urllib.parse.parse_qs(post_data.decode('utf-8'))
+        # Como nos jobs, pares de outros usuários são tratados como inexistentes
+        if not connectivity_monitor.remove_target(params.get('id', [''])[0], owner=session['username']):
+            self.send_response(404)
+            self.send_header('Content-type', 'text/html; charset=utf-8')
+            self.end_headers()
+            self.wfile.write("<h2>Par não encontrado.</h2>".encode('utf-8'))
+            return
+        self.redirect_to_monitor()
 
-def run(server_class=HTTPServer, handler_class=WebInterface, port=4545):
+    def redirect_to_monitor(self):
+        self.send_response(303)
+        self.send_header('Location', '/monitor')
+        self.end_headers()
+
+    # Página do monitor: último resultado, percentis e taxa de erro por janela de cada par, recarregada a cada rodada
+    def show_monitor_page(self, session):
+        rows = []
+        for target in connectivity_monitor.status(owner=session['username']):
+            last_result = target['last_result']
+            if last_result is None:
+                last_cell = '<td>-</td>'
+            elif last_result['ok']:
+                last_cell = f'<td class="ok">{last_result["http_code"]} - {format_seconds(last_result["total"])}</td>'
+            else:
+                last_cell = f'<td class="fail">{escape(last_result["error"])}</td>'
+            window_cells = []
+            for window, stats in target['windows']:
+                error_rate = "-" if stats['error_rate'] is None else f"{stats['error_rate'] * 100:.1f}%"
+                window_cells.append(f"<td>{stats['count']}</td><td>{error_rate}</td><td>{format_seconds(stats['p50'])}</td>"
+                                    f"<td>{format_seconds(stats['p95'])}</td><td>{format_seconds(stats['p99'])}</td>")
+            pod_label = target['pod'] + (f" ({target['container']})" if target['container'] else "")
+            rows.append(f"<tr><td>{escape(target['cluster'])}/{escape(target['namespace'])}</td><td>{escape(pod_label)}</td>"
+                        f"<td>{escape(target['url'])}</td>{last_cell}{''.join(window_cells)}"
+                        f"<td><form method=\"POST\" action=\"/monitor/remove\"><input type=\"hidden\" name=\"id\" value=\"{target['id']}\">"
+                        f"<input type=\"submit\" value=\"Remover\"></form></td></tr>")
+
+        window_headers = "".join(f'<th colspan="5">{"Todo o histórico" if window is None else "Último minuto" if window == 60 else f"Últimos {window // 60} min"}</th>'
+                                 for window in MONITOR_WINDOWS)
+        stat_headers = "<th>Testes</th><th>Erros</th><th>p50</th><th>p95</th><th>p99</th>" * len(MONITOR_WINDOWS)
+
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.end_headers()
+        html = f'''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <meta http-equiv="refresh" content="{max(1, int(connectivity_monitor.interval))}">
+            <title>Monitor de conectividade - OpenShift Tool Interface</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; background-color: #f2f2f2; }}
+                .container {{ width: 90%; margin: auto; padding: 20px; background: #fff; border-radius: 5px; }}
+                table {{ border-collapse: collapse; margin-bottom: 20px; }}
+                th, td {{ border: 1px solid #ccc; padding: 6px 10px; text-align: left; }}
+                td form {{ margin: 0; }}
+                .ok {{ background-color: #d4edda; }}
+                .fail {{ background-color: #f8d7da; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <h2>Monitor de conectividade</h2>
+                <p>Testes a cada {connectivity_monitor.interval:g}s, guardando os últimos {connectivity_monitor.history_size} resultados de cada par.</p>
+                <table>
+                    <tr><th rowspan="2">Cluster/Namespace</th><th rowspan="2">Pod</th><th rowspan="2">URL</th><th rowspan="2">Último teste</th>
+                        {window_headers}<th rowspan="2"></th></tr>
+                    <tr>{stat_headers}</tr>
+                    {"".join(rows)}
+                </table>
+                <form method="POST" action="/monitor/add">
+                    <h3>Adicionar par pod/URL</h3>
+                    <label>Cluster: <input type="text" name="cluster" required></label>
+                    <label>Namespace: <input type="text" name="namespace" required></label>
+                    <label>Pod: <input type="text" name="pod_name" required></label>
+                    <label>Container (opcional): <input type="text" name="container"></label>
+                    <label>URL: <input type="text" name="url" required></label>
+                    <input type="submit" value="Adicionar">
+                </form>
+                <p><a href="/">Voltar</a></p>
+            </div>
+        </body>
+        </html>
+        '''
+        self.wfile.write(html.encode('utf-8'))
+
+    # Métricas no formato do Prometheus; a rota não exige login para poder ser coletada automaticamente
+    def show_metrics(self):
+        if command_metrics is None:
+            # As métricas só são coletadas quando o servidor é iniciado por run()
+            body = "Metricas nao habilitadas.\n".encode('utf-8')
+            self.send_response(503)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        body = command_metrics.format_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def redirect_to_job(self, job):
+        self.send_response(303)
+        self.send_header('Location', f'/jobs/{job.id}')
+        self.end_headers()
+
+    # Rotas /jobs/<id>, /jobs/<id>/status e /jobs/<id>/download
+    def handle_job_request(self, session):
+        parts = self.path.strip('/').split('/')
+        job = job_manager.get(parts[1], session['username']) if len(parts) >= 2 else None
+        if job is None:
+            self.send_response(404)
+            self.send_header('Content-type', 'text/html; charset=utf-8')
+            self.end_headers()
+            self.wfile.write("<h2>Job não encontrado.</h2>".encode('utf-8'))
+        elif len(parts) == 2:
+            self.show_job_page(job)
+        elif parts[2] == 'status':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(json.dumps(job.to_dict()).encode('utf-8'))
+        elif parts[2] == 'download' and job.status == 'done':
+            self.send_response(200)
+            self.send_header('Content-Type', job.content_type)
+            self.send_header('Content-Disposition', f'attachment; filename="{job.filename}"')
+            self.send_header('Content-Length', str(os.path.getsize(job.result_path)))
+            self.end_headers()
+            # Envia o arquivo em blocos, sem carregá-lo inteiro em memória
+            with open(job.result_path, 'rb') as result_file:
+                shutil.copyfileobj(result_file, self.wfile)
+        else:
+            self.send_response(302)
+            self.send_header('Location', f'/jobs/{job.id}')
+            self.end_headers()
+
+    # Página que acompanha o progresso do job consultando /jobs/<id>/status
+    def show_job_page(self, job):
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.end_headers()
+        html = f'''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Job {job.id} - OpenShift Tool Interface</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; background-color: #f2f2f2; }}
+                .container {{ width: 80%; margin: auto; padding: 20px; background: #fff; border-radius: 5px; }}
+                .error {{ color: red; }}
+            </style>
+            <script>
+                function poll() {{
+                    fetch('/jobs/{job.id}/status').then(r => r.json()).then(job => {{
+                        const p = job.progress;
+                        document.getElementById('status').textContent = job.status;
+                        document.getElementById('progress').textContent =
+                            `Clusters: ${{p.clusters_done}}/${{p.clusters_total}} | ` +
+                            `Namespaces: ${{p.namespaces_done}}/${{p.namespaces_total}} | ` +
+                            `Pods: ${{p.pods_done}}/${{p.pods_total}}`;
+                        if (job.status === 'done') {{
+                            document.getElementById('result').innerHTML = `<a href="${{job.download}}">Baixar resultado</a>`;
+                        }} else if (job.status === 'failed') {{
+                            document.getElementById('result').innerHTML = `<p class="error">Erro: ${{job.error}}</p>`;
+                        }} else {{
+                            setTimeout(poll, 2000);
+                        }}
+                    }});
+                }}
+                window.onload = poll;
+            </script>
+        </head>
+        <body>
+            <div class="container">
+                <h2>Job {job.kind}</h2>
+                <p>Status: <strong id="status">{job.status}</strong></p>
+                <p id="progress"></p>
+                <div id="result"></div>
+                <p><a href="/">Voltar</a></p>
+            </div>
+        </body>
+        </html>
+        '''
+        self.wfile.write(html.encode('utf-8'))
+
+def run(server_class=ThreadingHTTPServer, handler_class=WebInterface, port=4545, use_inventory=False, job_workers=DEFAULT_JOB_WORKERS,
+        monitor_interval=DEFAULT_MONITOR_INTERVAL, monitor_history=DEFAULT_MONITOR_HISTORY):
+    global inventory, job_manager, command_metrics, connectivity_monitor
+    job_manager = JobManager(max_workers=job_workers)
+    command_metrics = enable_command_metrics()
+    # Cada usuário usa o próprio kubeconfig em cada cluster, sem sobrescrever o token dos demais
+    enable_user_kubeconfigs()
+    # Testes de conectividade repetidos no mesmo pod reaproveitam o shell aberto pelo 'oc exec'
+    enable_exec_sessions(idle_timeout=max(DEFAULT_SESSION_IDLE_TIMEOUT, 2 * monitor_interval))
+    connectivity_monitor = ConnectivityMonitor(interval=monitor_interval, history_size=monitor_history)
+    connectivity_monitor.start()
+    if use_inventory:
+        inventory = InventoryManager()
     server_address = ('', port)
     httpd = server_class(server_address, handler_class)
     print(f'Servidor web iniciado na porta {port}...')
     httpd.serve_forever()
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Interface web para as ferramentas de OpenShift.")
+    parser.add_argument("--port", type=int, default=4545, help="Porta do servidor web")
+    parser.add_argument("--inventory", action="store_true", help="Mantém pods e HPAs em cache por watches em vez de listar o cluster a cada requisição")
+    parser.add_argument("--job-workers", type=int, default=DEFAULT_JOB_WORKERS, help="Número máximo de relatórios e coletas de logs executados ao mesmo tempo")
+    parser.add_argument("--monitor-interval", type=float, default=DEFAULT_MONITOR_INTERVAL, help="Intervalo, em segundos, entre os testes do monitor de conectividade")
+    parser.add_argument("--monitor-history", type=int, default=DEFAULT_MONITOR_HISTORY, help="Resultados guardados por par pod/URL no monitor de conectividade")
+    args = parser.parse_args()
+    run(port=args.port, use_inventory=args.inventory, job_workers=args.job_workers, monitor_interval=args.monitor_interval,
+        monitor_history=args.monitor_history)
@@ -0,0 +1,141 @@
+import os
+import runpy
+import socket
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+TRACEROUTE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "traceroute")
+
+class Layer:
+    """
+    Substituto mínimo das camadas do scapy: IP(...) / ICMP(...) gera um pacote com os campos das duas camadas
+    """
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+        self.icmp = None
+
+    def __truediv__(self, other):
+        self.icmp = other
+        return self
+
+class SimulatedNetwork:
+    """
+    Responde aos pacotes do sr como a rede responderia: o roteador do TTL (ou o destino, a partir do último salto)
+    responde com RTT de 1 ms por salto, mais o atraso extra configurado para o destino
+    """
+    def __init__(self, routes, extra_delay=None):
+        self.routes = routes
+        self.extra_delay = extra_delay or {}
+        self.calls = []
+
+    def sr(self, packets, timeout, inter, verbose):
+        self.calls.append({"packets": packets, "timeout": timeout, "inter": inter})
+        answered = []
+        for packet in packets:
+            hops = self.routes.get(packet.dst)
+            if not hops:
+                continue
+            packet.sent_time = 100.0
+            source = hops[min(packet.ttl, len(hops)) - 1]
+            delay = 0.001 * packet.ttl + self.extra_delay.get(packet.dst, 0)
+            answered.append((packet, types.SimpleNamespace(src=source, time=100.0 + delay)))
+        return answered, []
+
+def load_traceroute():
+    scapy = types.ModuleType("scapy")
+    scapy_all = types.ModuleType("scapy.all")
+    scapy_all.IP = scapy_all.ICMP = Layer
+    scapy_all.sr = scapy_all.sr1 = scapy_all.conf = None
+    with mock.patch.dict(sys.modules, {"scapy": scapy, "scapy.all": scapy_all}):
+        return runpy.run_path(TRACEROUTE_PATH, run_name="traceroute")
+
+ROUTES = {
+    "10.0.0.9": ["192.168.0.1", "10.1.1.1", "10.0.0.9"],
+    "10.0.0.8": ["192.168.0.1", "10.1.1.1", "10.0.0.8"],
+}
+ADDRESSES = {"a": "10.0.0.9", "b": "10.0.0.8", "c": "10.0.0.7"}
+
+def resolve(target):
+    if target in ADDRESSES:
+        return ADDRESSES[target]
+    raise socket.gaierror(f"{target} desconhecido")
+
+class BatchTracerouteTest(unittest.TestCase):
+    def setUp(self):
+        self.traceroute = load_traceroute()
+        resolver = mock.patch.object(socket, "gethostbyname", resolve)
+        resolver.start()
+        self.addCleanup(resolver.stop)
+
+    def run_batch(self, network, targets, **options):
+        self.traceroute["batch_traceroute"].__globals__["sr"] = network.sr
+        return self.traceroute["batch_traceroute"](targets, max_hops=5, **options)
+
+    def test_simulated_responder(self):
+        network = SimulatedNetwork(ROUTES)
+        with mock.patch("sys.stderr"):
+            traces = self.run_batch(network, ["a", "b", "c", "desconhecido"])
+        by_target = {trace["target"]: trace for trace in traces}
+
+        trace = by_target["a"]
+        self.assertTrue(trace["reached"])
+        self.assertEqual([hop["addresses"] for hop in trace["hops"]], [["192.168.0.1"], ["10.1.1.1"], ["10.0.0.9"]])
+        self.assertEqual([hop["lost"] for hop in trace["hops"]], [0, 0, 0])
+        self.assertAlmostEqual(trace["hops"][2]["avg"], 3.0)
+        # Sem resposta do destino, todos os TTLs aparecem como perdidos
+        self.assertFalse(by_target["c"]["reached"])
+        self.assertEqual([hop["lost"] for hop in by_target["c"]["hops"]], [3] * 5)
+        self.assertEqual(by_target["desconhecido"], {"target": "desconhecido", "address": None, "reached": False, "hops": []})
+
+        # Um único lote, com pausa entre os pacotes por padrão
+        self.assertEqual(len(network.calls), 1)
+        self.assertEqual(network.calls[0]["inter"], self.traceroute["DEFAULT_PACKET_INTERVAL"])
+        self.assertGreater(network.calls[0]["inter"], 0)
+
+    def test_sequence_numbers_never_wrap(self):
+        network = SimulatedNetwork(ROUTES)
+        traceroute = self.traceroute
+        targets = [f"10.{i // 250}.{i % 250}.1" for i in range(800)]
+        with mock.patch.object(socket, "gethostbyname", lambda target: target):
+            traceroute["batch_traceroute"].__globals__["sr"] = network.sr
+            traces = traceroute["batch_traceroute"](targets, max_hops=30, probes=3, inter=0)
+
+        self.assertEqual(len(traces), 800)
+        self.assertGreater(len(network.calls), 1)
+        self.assertEqual(sum(len(call["packets"]) for call in network.calls), 800 * 30 * 3)
+        for call in network.calls:
+            seqs = [packet.icmp.seq for packet in call["packets"]]
+            self.assertLessEqual(len(seqs), traceroute["MAX_BATCH_PROBES"])
+            self.assertEqual(len(set(seqs)), len(seqs))
+            self.assertTrue(all(0 < seq <= 0xFFFF for seq in seqs))
+            self.assertEqual(call["inter"], 0)
+
+    def test_build_probes_rejects_oversized_batches(self):
+        with self.assertRaises(ValueError):
+            self.traceroute["build_probes"]([f"10.0.0.{i}" for i in range(800)], max_hops=30, probes=3)
+
+    def test_stored_rounds_report_changes(self):
+        traceroute = self.traceroute
+        with tempfile.TemporaryDirectory() as directory:
+            store = traceroute["TraceStore"](os.path.join(directory, "runs.db"))
+            try:
+                first = self.run_batch(SimulatedNetwork(ROUTES), ["a", "b"])
+                store.save_traces(first, 1000.0)
+                changed_routes = dict(ROUTES, **{"10.0.0.9": ["192.168.0.1", "10.2.2.2", "10.0.0.9"]})
+                second = self.run_batch(SimulatedNetwork(changed_routes, extra_delay={"10.0.0.8": 0.05}), ["a", "b"])
+                baselines = store.load_baselines(["a", "b"])
+            finally:
+                store.close()
+
+        changes_a = traceroute["diff_traces"](baselines["a"], [t for t in second if t["target"] == "a"][0])
+        self.assertEqual([(change["ttl"], change["before"], change["after"]) for change in changes_a],
+                         [(2, ["10.1.1.1"], ["10.2.2.2"])])
+        changes_b = traceroute["diff_traces"](baselines["b"], [t for t in second if t["target"] == "b"][0])
+        self.assertEqual([(change["ttl"], change["kind"]) for change in changes_b],
+                         [(ttl, "regressão de RTT") for ttl in (1, 2, 3)])
+
+if __name__ == "__main__":
+    unittest.main()